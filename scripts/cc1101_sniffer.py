@@ -2,29 +2,69 @@
 
 # cc1101_sniffer.py
 # Listens for packets on a specified Sub-GHz frequency using CC1101.
+# Version 2: the RX FIFO is read in bursts as it fills (woken by GDO0 when wired) and the
+# radio stays in RX between packets; an RX FIFO overflow is flushed and counted explicitly.
+# --scan hops across Sub-GHz bands using per-channel FREQ/FSCAL values computed once at start.
+# --pcapng streams packets as PCAP-NG (one interface per frequency); text lines become optional.
+# --bus also publishes every packet to proxnet_bus.py (stored in the packets table).
+# SPI, FIFO and output metrics are snapshotted for web_ui.py's /metrics (see proxnet_metrics.py).
 
-import spidev
 import time
 import sys
 import signal # To handle Ctrl+C gracefully
+import json
+import os
+import argparse
+from pathlib import Path
 
-print("Starting CC1101 Sniffer...")
+from pcapng_writer import PcapngWriter, LINKTYPE_CC1101, CC1101_HEADER
+from proxnet_bus import BusPublisher
+from proxnet_metrics import Metrics, Histogram
 
 # --- Configuration ---
 SPI_BUS = 0
 SPI_DEVICE = 0 # CE0 (Pi Pin 24)
 SPI_SPEED = 500000 # Use speed that worked
 SPI_MODE = 1 # Use mode that worked
+GDO0_PIN = None # BCM GPIO wired to CC1101 GDO0 (e.g. 25); None = poll RXBYTES
+GDO0_TIMEOUT = 0.5   # Longest wait for a GDO0 edge before re-checking the FIFO anyway
+MAX_POLL_INTERVAL = 0.005 # Upper bound on any idle wait, well under the time the FIFO takes to fill
+STATS_INTERVAL = 10.0 # Seconds between throughput/overflow reports
+XTAL_HZ = 26e6
+LOG_DIR = Path.home() / "proxnet" / "logs"
+SCAN_BANDS = {            # MHz; common remote/sensor frequencies per ISM band
+    '315': [303.875, 310.0, 315.0, 318.0],
+    '433': [433.42, 433.92, 434.42],
+    '868': [868.3, 868.35, 868.95, 869.85],
+    '915': [902.3, 906.4, 915.0, 920.0],
+}
+SCAN_DWELL = 0.050        # Seconds listened per frequency per visit
+SCAN_SETTLE = 0.0005      # RX settling time after a hop before RSSI is meaningful
+SCAN_POLL_INTERVAL = 0.001
+SCAN_PACKET_LEN = 30      # Shorter frames while scanning so one completes within a dwell (+2 status = FIFO threshold)
+SCAN_RSSI_THRESHOLD = -85.0 # dBm; a visit whose peak RSSI reaches this counts as active
+SCAN_REPORT_FILE = LOG_DIR / "cc1101_scan.json"
+CAPTURE_PREFIX = LOG_DIR / "cc1101_capture" # --pcapng segments: cc1101_capture_<timestamp>.pcapng
+SCAN_REPORT_INTERVAL = 5.0
+CAL_TIMEOUT = 0.01        # Longest wait for an SCAL calibration (~0.7 ms typical)
 
 # --- CC1101 Commands (Strobes) ---
 SRES = 0x30 # Reset chip
 SIDLE = 0x36 # Go to IDLE state
 SRX = 0x34 # Enable RX
 SFRX = 0x3A # Flush RX FIFO
+SCAL = 0x33 # Calibrate frequency synthesizer
+
+# --- SPI Header Bits ---
+READ_SINGLE = 0x80
+READ_BURST = 0xC0 # Status registers (0x30-0x3D) can only be read with the burst bit set
+WRITE_BURST = 0x40
 
 # --- CC1101 Registers ---
 REG_IOCFG0 = 0x02
 REG_FIFOTHR = 0x03
+REG_PKTLEN = 0x06
+REG_PKTCTRL1 = 0x07
 REG_PKTCTRL0 = 0x08
 REG_FSCTRL1 = 0x0B
 REG_FREQ2 = 0x0D
@@ -38,119 +78,544 @@ REG_MCSM1 = 0x17
 REG_MCSM0 = 0x18
 REG_FOCCFG = 0x19
 REG_AGCCTRL2 = 0x1B
-REG_WORCTRL = 0x1E
+REG_WORCTRL = 0x20
 REG_FREND0 = 0x22
-REG_FSCAL3 = 0x25
-REG_FSCAL1 = 0x27
-REG_FSCAL0 = 0x29
+REG_FSCAL3 = 0x23
+REG_FSCAL2 = 0x24
+REG_FSCAL1 = 0x25
+REG_FSCAL0 = 0x26
 REG_TEST2 = 0x2C
 REG_TEST1 = 0x2D
 REG_TEST0 = 0x2E
 REG_PATABLE = 0x3E
+REG_RXFIFO = 0x3F
+
+# Register reset values 0x00 (IOCFG2) .. 0x2E (TEST0), the base of the configuration image
+RESET_IMAGE = [
+    0x29, 0x2E, 0x3F, 0x07, 0xD3, 0x91, 0xFF, 0x04, 0x45, 0x00, 0x00, 0x0F, 0x00, 0x1E, 0xC4, 0xEC,
+    0x8C, 0x22, 0x02, 0x22, 0xF8, 0x47, 0x07, 0x30, 0x04, 0x36, 0x6C, 0x03, 0x40, 0x91, 0x87, 0x6B,
+    0xF8, 0x56, 0x10, 0xA9, 0x0A, 0x20, 0x0D, 0x41, 0x00, 0x59, 0x7F, 0x3F, 0x88, 0x31, 0x0B,
+]
 
-# --- Configuration Values (Example: 433.92MHz, ASK/OOK, ~4.8kBaud) ---
-FREQ_BYTES = [0x10, 0xB0, 0x71] # For 433.919830 MHz
+# --- Configuration Values (Example: 433.92MHz, ASK/OOK, ~10kBaud) ---
+FREQ_MHZ = 433.92
+PACKET_LEN = 0xFF # Fixed-length packets (PKTCTRL0 = 0x00); no sync word, so RX is a continuous stream
+APPEND_STATUS = True # PKTCTRL1 = 0x04: RSSI and LQI bytes follow every packet in the FIFO
+FIFO_THRESHOLD = 32 # RX bytes for FIFOTHR = 0x47 (FIFO_THR = 7)
 CONFIG_REGS = [
     (REG_FSCTRL1, 0x06), (REG_MDMCFG4, 0x58), (REG_MDMCFG3, 0x93),
     (REG_MDMCFG2, 0x30), (REG_DEVIATN, 0x15), (REG_MCSM1,   0x0C),
     (REG_MCSM0,   0x18), (REG_FOCCFG,  0x14), (REG_AGCCTRL2,0x43),
     (REG_WORCTRL, 0xFB), (REG_FREND0,  0x11), (REG_FSCAL3,  0xE9),
     (REG_FSCAL1,  0x2A), (REG_FSCAL0,  0x1F), (REG_TEST2,   0x81),
-    (REG_TEST1,   0x35), (REG_TEST0,   0x09), (REG_IOCFG0,  0x06),
-    (REG_FIFOTHR, 0x47), (REG_PKTCTRL0,0x00),
+    (REG_TEST1,   0x35), (REG_TEST0,   0x09),
+    # GDO0 asserts at the RX FIFO threshold or at end of packet, de-asserts when the FIFO is empty
+    (REG_IOCFG0,  0x01),
+    (REG_FIFOTHR, 0x47), (REG_PKTLEN, PACKET_LEN), (REG_PKTCTRL1, 0x04), (REG_PKTCTRL0,0x00),
 ]
+# Scanning retunes with cached FSCAL values, so automatic calibration on IDLE->RX is turned off
+SCAN_CONFIG_REGS = CONFIG_REGS + [(REG_MCSM0, 0x08), (REG_PKTLEN, SCAN_PACKET_LEN)]
 # Status Registers
-STATUS_RXBYTES = 0x3B | 0x80
+STATUS_RSSI = 0x34
+STATUS_MARCSTATE = 0x35
+MARCSTATE_IDLE = 0x01
+STATUS_RXBYTES = 0x3B
+RXBYTES_OVERFLOW = 0x80
+RXBYTES_COUNT = 0x7F
+
+# --- Optional Hardware Imports ---
+try:
+    import spidev
+except ImportError:
+    spidev = None # Reported in main(); CC1101/PacketReceiver also work with a simulated SPI object
+
+try:
+    import RPi.GPIO as GPIO
+except ImportError:
+    GPIO = None
+
+# --- Radio Access ---
+class CC1101:
+    """Register-level access to a CC1101 over an object with spidev's xfer2()."""
+
+    def __init__(self, spi):
+        self.spi = spi
+        self.transactions = 0 # SPI transactions (one per xfer2 call)
+
+    def _xfer(self, data):
+        self.transactions += 1
+        return self.spi.xfer2(data)
+
+    def strobe(self, strobe_cmd):
+        return self._xfer([strobe_cmd, 0x00])[0]
+
+    def write_register(self, reg_address, value):
+        self._xfer([reg_address, value])
+
+    def read_register(self, reg_address):
+        return self._xfer([reg_address | READ_SINGLE, 0x00])[1]
+
+    def read_status(self, reg_address):
+        return self._xfer([reg_address | READ_BURST, 0x00])[1]
+
+    def read_burst(self, start_address, num_bytes):
+        return self._xfer([start_address | READ_BURST] + [0x00] * num_bytes)[1:]
+
+    def write_burst(self, start_address, values):
+        self._xfer([start_address | WRITE_BURST] + list(values))
+
+    def rx_bytes(self):
+        """RXBYTES, read until two reads agree (the counter can be sampled mid-update, see the CC1101 errata)."""
+        value = self.read_status(STATUS_RXBYTES)
+        while True:
+            again = self.read_status(STATUS_RXBYTES)
+            if again == value:
+                return value
+            value = again
+
+    def configure(self, image):
+        """Writes the whole 0x00-0x2E register image in one burst transaction."""
+        self.write_burst(0x00, image)
+
+    def calibrate(self, freq):
+        """Tunes to FREQ2..0 bytes `freq`, runs SCAL and returns the resulting FSCAL3..1."""
+        self.strobe(SIDLE)
+        self.write_burst(REG_FREQ2, freq)
+        self.strobe(SCAL)
+        deadline = time.monotonic() + CAL_TIMEOUT
+        while self.read_status(STATUS_MARCSTATE) & 0x1F != MARCSTATE_IDLE:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Calibration timed out for FREQ {bytes(freq).hex().upper()}")
+        return bytes(self.read_burst(REG_FSCAL3, 3))
+
+    def retune(self, channel):
+        """Hops to a calibrated channel: new FREQ bytes and cached FSCAL3..1, no SCAL."""
+        self.strobe(SIDLE)
+        self.strobe(SFRX) # Bytes from the previous frequency are meaningless here
+        self.write_burst(REG_FREQ2, channel['freq'])
+        self.write_burst(REG_FSCAL3, channel['fscal'])
+        self.strobe(SRX)
+
+# --- Register Tables ---
+def freq_bytes(mhz, xtal_hz=XTAL_HZ):
+    """FREQ2/FREQ1/FREQ0 for a carrier in MHz: f_carrier * 2^16 / f_xosc."""
+    word = round(mhz * 1e6 * 2 ** 16 / xtal_hz)
+    return bytes([(word >> 16) & 0xFF, (word >> 8) & 0xFF, word & 0xFF])
+
+FREQ_BYTES = freq_bytes(FREQ_MHZ)
+
+def config_image(freq=FREQ_BYTES, config_regs=CONFIG_REGS):
+    image = list(RESET_IMAGE)
+    image[REG_FREQ2:REG_FREQ0 + 1] = freq
+    for reg, value in config_regs:
+        image[reg] = value
+    return image
+
+def valid_frequency(mhz):
+    return 300 <= mhz <= 348 or 387 <= mhz <= 464 or 779 <= mhz <= 928
+
+def parse_frequencies(bands=None, freqs=None):
+    """Band names ('315,433') and/or explicit MHz values -> sorted unique list of valid frequencies."""
+    selected = set()
+    for band in filter(None, (bands or '').split(',')):
+        if band not in SCAN_BANDS:
+            raise ValueError(f"Unknown band '{band}', expected one of {', '.join(SCAN_BANDS)}")
+        selected.update(SCAN_BANDS[band])
+    for value in filter(None, (freqs or '').split(',')):
+        mhz = float(value)
+        if not valid_frequency(mhz):
+            raise ValueError(f"{mhz} MHz is outside the CC1101 bands (300-348, 387-464, 779-928 MHz)")
+        selected.add(mhz)
+    return sorted(selected)
+
+def build_channel_table(radio, frequencies):
+    """Precomputes FREQ bytes and calibrates once per frequency; the hop loop only replays these."""
+    return [{'mhz': mhz, 'freq': freq_bytes(mhz), 'fscal': radio.calibrate(freq_bytes(mhz))} for mhz in frequencies]
+
+def data_rate(config_regs=CONFIG_REGS, xtal_hz=26e6):
+    """Data rate in baud from MDMCFG4/MDMCFG3 (DRATE_E, DRATE_M)."""
+    regs = dict(config_regs)
+    drate_e = regs[REG_MDMCFG4] & 0x0F
+    drate_m = regs[REG_MDMCFG3]
+    return (256 + drate_m) * 2 ** drate_e * xtal_hz / 2 ** 28
+
+def rssi_dbm(raw):
+    """Converts the appended RSSI status byte to dBm."""
+    return (raw - 256 if raw >= 128 else raw) / 2 - 74
+
+# --- Receive Path ---
+class RxStats:
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+        self.reads = 0         # Burst reads of the RX FIFO
+        self.overflows = 0     # RX FIFO overflows recovered from
+        self.dropped_bytes = 0 # Bytes lost to overflows (FIFO contents plus the partial packet)
+        self.read_latency = Histogram() # RX FIFO burst read
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.last_packets = 0
+
+    def maybe_report(self):
+        now = time.monotonic()
+        if now - self.last_report < STATS_INTERVAL:
+            return
+        rate = (self.packets - self.last_packets) / (now - self.last_report)
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] STATS: {self.packets} packets ({rate:.1f}/s), "
+              f"{self.bytes} bytes in {self.reads} reads, {self.overflows} overflows, "
+              f"{self.dropped_bytes} bytes dropped")
+        self.last_report, self.last_packets = now, self.packets
+
+    def register_metrics(self, metrics, radio):
+        metrics.counter('packets_total', "Packets assembled from the RX FIFO", lambda: self.packets)
+        metrics.counter('fifo_read_bytes_total', "Bytes read from the RX FIFO", lambda: self.bytes)
+        metrics.counter('fifo_reads_total', "Burst reads of the RX FIFO", lambda: self.reads)
+        metrics.counter('fifo_overflows_total', "RX FIFO overflows recovered from", lambda: self.overflows)
+        metrics.counter('fifo_dropped_bytes_total', "Bytes lost to RX FIFO overflows", lambda: self.dropped_bytes)
+        metrics.counter('spi_transactions_total', "SPI transactions issued to the radio", lambda: radio.transactions)
+        metrics.histogram('fifo_read_seconds', "Time for one RX FIFO burst read", self.read_latency)
+
+class PacketReceiver:
+    """Assembles fixed-length packets from RX FIFO burst reads, leaving the radio in RX.
+
+    Each service() call reads whatever the FIFO holds in one burst. While a
+    packet is still arriving the last byte is left in the FIFO, because
+    draining it mid-packet can corrupt the FIFO pointers (CC1101 errata).
+    MCSM1 keeps the radio in RX after a packet, so nothing is flushed between
+    packets. An overflow (RXBYTES bit 7) is the only case that flushes:
+    the FIFO and the partial packet are counted as dropped, then SFRX/SRX
+    restart reception straight away.
+    """
+
+    def __init__(self, radio, stats, packet_len=PACKET_LEN, append_status=APPEND_STATUS):
+        self.radio = radio
+        self.stats = stats
+        self.packet_len = packet_len
+        self.append_status = append_status
+        self.frame_len = packet_len + (2 if append_status else 0)
+        self.partial = bytearray()
+        self.holding = False # True while a byte was deliberately left in the FIFO mid-packet
+
+    def start(self):
+        self.radio.strobe(SIDLE)
+        self.radio.strobe(SFRX)
+        self.radio.strobe(SRX)
+        self.reset()
 
-# --- SPI Setup ---
-spi = spidev.SpiDev()
-spi_active = False
+    def reset(self):
+        """Forgets a partly assembled packet, e.g. after the radio was retuned."""
+        self.partial.clear()
+        self.holding = False
+
+    def recover_overflow(self, rx_bytes):
+        self.stats.overflows += 1
+        self.stats.dropped_bytes += (rx_bytes & RXBYTES_COUNT) + len(self.partial)
+        self.radio.strobe(SFRX) # Valid in RXFIFO_OVERFLOW state; the radio drops to IDLE
+        self.radio.strobe(SRX)
+        self.partial.clear()
+        self.holding = False
+
+    def service(self):
+        """Reads pending FIFO bytes; returns completed packets as (payload, rssi_dbm, lqi)."""
+        rx_bytes = self.radio.rx_bytes()
+        if rx_bytes & RXBYTES_OVERFLOW:
+            self.recover_overflow(rx_bytes)
+            return []
+        available = rx_bytes & RXBYTES_COUNT
+        need = self.frame_len - len(self.partial)
+        count = need if available >= need else available - 1
+        self.holding = 0 < available < need
+        if count <= 0:
+            return []
+        started = time.perf_counter_ns()
+        self.partial += bytes(self.radio.read_burst(REG_RXFIFO, count))
+        self.stats.read_latency.observe_ns(started)
+        self.stats.reads += 1
+        self.stats.bytes += count
+        if len(self.partial) < self.frame_len:
+            return []
+        frame = bytes(self.partial)
+        self.partial.clear()
+        self.stats.packets += 1
+        if self.append_status:
+            return [(frame[:self.packet_len], rssi_dbm(frame[-2]), frame[-1] & 0x7F)]
+        return [(frame, None, None)]
+
+# --- Frequency Scan ---
+class FrequencyScanner:
+    """Hops across a precomputed channel table, keeping a per-frequency activity map.
+
+    Each visit retunes with cached register values (see CC1101.retune), lets
+    the receiver settle, then samples RSSI and services the FIFO until the
+    dwell ends. A visit counts as active when its peak RSSI reaches
+    SCAN_RSSI_THRESHOLD. The clock and sleep are injected so the loop can
+    run against a simulated SPI object.
+    """
+
+    def __init__(self, radio, receiver, channels, dwell=SCAN_DWELL, on_packet=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.radio = radio
+        self.receiver = receiver
+        self.channels = channels
+        self.dwell = dwell
+        self.on_packet = on_packet
+        self.clock = clock
+        self.sleep = sleep
+        self.sweeps = 0
+        self.hops = 0
+        self.hop_time = 0.0
+        self.activity = {ch['mhz']: {'visits': 0, 'active': 0, 'packets': 0, 'rssi_max': None, 'rssi_sum': 0.0,
+                                     'samples': 0, 'last_active': None} for ch in channels}
+
+    def hop(self, channel):
+        started = time.perf_counter()
+        self.radio.retune(channel)
+        self.hop_time += time.perf_counter() - started
+        self.hops += 1
+        self.receiver.reset()
+
+    def visit(self, channel):
+        self.hop(channel)
+        entry = self.activity[channel['mhz']]
+        deadline = self.clock() + self.dwell
+        self.sleep(SCAN_SETTLE)
+        peak = None
+        while True:
+            for packet in self.receiver.service():
+                entry['packets'] += 1
+                if self.on_packet:
+                    self.on_packet(channel['mhz'], *packet)
+            rssi = rssi_dbm(self.radio.read_status(STATUS_RSSI))
+            peak = rssi if peak is None else max(peak, rssi)
+            entry['rssi_sum'] += rssi
+            entry['samples'] += 1
+            if self.clock() >= deadline:
+                break
+            self.sleep(SCAN_POLL_INTERVAL)
+        entry['visits'] += 1
+        entry['rssi_max'] = peak if entry['rssi_max'] is None else max(entry['rssi_max'], peak)
+        if peak >= SCAN_RSSI_THRESHOLD:
+            entry['active'] += 1
+            entry['last_active'] = time.time()
+
+    def sweep(self):
+        for channel in self.channels:
+            self.visit(channel)
+        self.sweeps += 1
+
+    def report(self):
+        return {
+            'updated': time.time(),
+            'sweeps': self.sweeps,
+            'mean_hop_us': round(self.hop_time / self.hops * 1e6, 1) if self.hops else None,
+            'frequencies': [{'mhz': mhz, 'visits': e['visits'], 'active': e['active'], 'packets': e['packets'],
+                             'rssi_max': e['rssi_max'], 'last_active': e['last_active'],
+                             'rssi_mean': round(e['rssi_sum'] / e['samples'], 1) if e['samples'] else None}
+                            for mhz, e in self.activity.items()],
+        }
+
+    def write_report(self, path=SCAN_REPORT_FILE):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(f"{path}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump(self.report(), f)
+        os.replace(tmp, path) # Readers never see a half-written file
+
+class Gdo0Waiter:
+    """Blocks until the FIFO is worth reading: GDO0 high, or a paced poll without the pin."""
+
+    def __init__(self, pin, refill_time):
+        self.pin = pin if GPIO is not None else None
+        # Time for FIFO_THRESHOLD more bytes to arrive; also covers the held-back
+        # byte case, where GDO0 stays high even though nothing new is readable yet.
+        self.refill_time = min(refill_time, MAX_POLL_INTERVAL)
+        if self.pin is not None:
+            GPIO.setmode(GPIO.BCM)
+            GPIO.setup(self.pin, GPIO.IN)
+
+    def wait(self, holding):
+        if self.pin is None or holding:
+            time.sleep(self.refill_time)
+        elif not GPIO.input(self.pin):
+            GPIO.wait_for_edge(self.pin, GPIO.RISING, timeout=int(GDO0_TIMEOUT * 1000))
+
+    def close(self):
+        if self.pin is not None:
+            GPIO.cleanup(self.pin)
 
 # --- Signal Handler ---
 def cleanup(signum, frame):
-    global spi_active
+    # Raise so main()'s finally block can idle the radio and close SPI
     print("\nCaught signal, cleaning up...")
-    if spi_active:
-        try:
-            spi_strobe(SIDLE)
-            time.sleep(0.1)
-            spi.close()
-            spi_active = False
-            print("SPI closed.")
-        except Exception as e:
-            print(f"Error during SPI cleanup: {e}")
-    sys.exit(0)
-
-signal.signal(signal.SIGINT, cleanup)
-signal.signal(signal.SIGTERM, cleanup)
-
-# --- Helper Functions ---
-def spi_strobe(strobe_cmd):
-    response = spi.xfer2([strobe_cmd, 0x00])
-    return response[0]
-
-def spi_write_register(reg_address, value):
-    spi.xfer2([reg_address, value])
-
-def spi_read_register(reg_address):
-    read_address = reg_address | 0x80
-    response = spi.xfer2([read_address, 0x00])
-    return response[1]
-
-def spi_read_burst(start_address, num_bytes):
-    read_address = start_address | 0xC0
-    command = [read_address] + [0x00] * num_bytes
-    response = spi.xfer2(command)
-    return response[1:]
+    raise SystemExit(0)
 
 # --- Main Logic ---
-try:
-    print(f"Opening SPI {SPI_BUS}.{SPI_DEVICE}...")
-    spi.open(SPI_BUS, SPI_DEVICE)
-    spi.max_speed_hz = SPI_SPEED
-    spi.mode = SPI_MODE
-    spi_active = True
-    print("SPI opened.")
-
-    print("Resetting CC1101...")
-    spi_strobe(SRES)
-    time.sleep(0.1)
-
-    print("Configuring CC1101 registers...")
-    spi_write_register(REG_FREQ2, FREQ_BYTES[0])
-    spi_write_register(REG_FREQ1, FREQ_BYTES[1])
-    spi_write_register(REG_FREQ0, FREQ_BYTES[2])
-    print(f"Frequency set to approx 433.92 MHz.")
-    for reg, value in CONFIG_REGS:
-        spi_write_register(reg, value)
-    print("Configuration registers written.")
-
-    print("Flushing RX FIFO...")
-    spi_strobe(SIDLE); time.sleep(0.05)
-    spi_strobe(SFRX); time.sleep(0.05)
-    print("Entering RX mode...")
-    spi_strobe(SRX); time.sleep(0.05)
+def print_packet(mhz, payload, rssi, lqi):
+    timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+    print(f"[{timestamp}] PKT ({mhz:.3f} MHz, {len(payload)} bytes, RSSI {rssi:.1f} dBm, LQI {lqi}): {payload.hex().upper()}")
+
+class PacketOutput:
+    """Sends received packets to the PCAP-NG stream, the ingestion bus and/or the text log."""
+
+    def __init__(self, text=True, pcapng_prefix=None, bus=False):
+        self.text = text
+        self.pcap = PcapngWriter(pcapng_prefix) if pcapng_prefix else None
+        self.bus = BusPublisher('cc1101') if bus else None
 
+    def emit(self, mhz, payload, rssi, lqi):
+        ts_ns = time.time_ns()
+        if self.bus:
+            self.bus.publish_cc1101(ts_ns // 1000, mhz, rssi, lqi, payload)
+        if self.pcap:
+            interface = self.pcap.interface(mhz, LINKTYPE_CC1101, f"cc1101-{mhz:.3f}MHz", f"CC1101 {mhz:.3f} MHz OOK")
+            header = CC1101_HEADER.pack(max(-128, min(127, round(rssi))), lqi)
+            self.pcap.write(interface, ts_ns, header + payload)
+        if self.text:
+            print_packet(mhz, payload, rssi, lqi)
+
+    def register_metrics(self, metrics):
+        if self.bus:
+            self.bus.register_metrics(metrics)
+        if self.pcap:
+            metrics.counter('capture_records_total', "Packets written to PCAP-NG", lambda: self.pcap.packets)
+
+    def maybe_flush(self):
+        if self.bus:
+            self.bus.maybe_flush()
+        if self.pcap:
+            self.pcap.maybe_flush()
+
+    def close(self):
+        if self.bus:
+            self.bus.close()
+            print(f"Bus: {self.bus.published} packets published, {self.bus.dropped} dropped.")
+        if self.pcap:
+            self.pcap.close()
+            print(f"PCAP-NG: {self.pcap.packets} packets in {self.pcap.segments} segment(s), last {self.pcap.path}")
+
+def run_scan(radio, stats, frequencies, dwell, output, metrics):
+    print(f"Calibrating {len(frequencies)} frequencies...")
+    channels = build_channel_table(radio, frequencies)
+    receiver = PacketReceiver(radio, stats, packet_len=SCAN_PACKET_LEN)
+
+    def on_packet(mhz, payload, rssi, lqi):
+        if rssi >= SCAN_RSSI_THRESHOLD: # Without a sync word most frames are demodulated noise
+            output.emit(mhz, payload, rssi, lqi)
+
+    scanner = FrequencyScanner(radio, receiver, channels, dwell, on_packet)
     print("-" * 30)
-    print("Listening for packets... Press Ctrl+C to stop.")
+    print(f"Scanning {', '.join(f'{mhz:g}' for mhz in frequencies)} MHz, dwell {dwell * 1000:g} ms")
+    print(f"Activity map: {SCAN_REPORT_FILE}")
     print("-" * 30)
-
-    packet_count = 0
+    last_report = time.monotonic()
     while True:
-        rx_bytes = spi_read_register(STATUS_RXBYTES) & 0x7F
-        if rx_bytes > 0:
-            received_data = spi_read_burst(0x3F, rx_bytes) # RXFIFO address
-            timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-            hex_payload = bytes(received_data).hex().upper()
-            packet_count += 1
-            print(f"[{timestamp}] PKT {packet_count} ({rx_bytes} bytes): {hex_payload}")
-
-            # Flush and re-enter RX
-            spi_strobe(SIDLE); time.sleep(0.01)
-            spi_strobe(SFRX); time.sleep(0.01)
-            spi_strobe(SRX)
-        time.sleep(0.05)
-
-except Exception as e:
-    print(f"\nAn error occurred: {e}", file=sys.stderr)
-    cleanup(None, None)
+        scanner.sweep()
+        stats.maybe_report()
+        output.maybe_flush()
+        metrics.maybe_write()
+        if time.monotonic() - last_report >= SCAN_REPORT_INTERVAL:
+            scanner.write_report()
+            last_report = time.monotonic()
+            active = [f"{e['mhz']:g}" for e in scanner.report()['frequencies'] if e['active']]
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] SCAN: {scanner.sweeps} sweeps, "
+                  f"mean hop {scanner.report()['mean_hop_us']} us, active: {', '.join(active) or 'none'}")
+
+def main(gdo0_pin=GDO0_PIN, frequencies=None, dwell=SCAN_DWELL, text=True, pcapng_prefix=None, bus=False):
+    if spidev is None:
+        print("CRITICAL ERROR: spidev library not found.", file=sys.stderr)
+        sys.exit(1)
+    signal.signal(signal.SIGINT, cleanup)
+    signal.signal(signal.SIGTERM, cleanup)
+    print("Starting CC1101 Sniffer...")
+
+    spi = spidev.SpiDev()
+    spi_active = False
+    waiter = None
+    output = None
+    stats = RxStats()
+    metrics = Metrics('cc1101')
+    try:
+        print(f"Opening SPI {SPI_BUS}.{SPI_DEVICE}...")
+        spi.open(SPI_BUS, SPI_DEVICE)
+        spi.max_speed_hz = SPI_SPEED
+        spi.mode = SPI_MODE
+        spi_active = True
+        print("SPI opened.")
+        radio = CC1101(spi)
+        stats.register_metrics(metrics, radio)
+
+        print("Resetting CC1101...")
+        radio.strobe(SRES)
+        time.sleep(0.1)
+
+        print("Configuring CC1101 registers...")
+        radio.configure(config_image(config_regs=SCAN_CONFIG_REGS if frequencies else CONFIG_REGS))
+        print("Configuration registers written.")
+        output = PacketOutput(text, pcapng_prefix, bus)
+        output.register_metrics(metrics)
+        if pcapng_prefix:
+            print(f"Capture file: {pcapng_prefix}_<timestamp>.pcapng (rotating)")
+        if frequencies:
+            run_scan(radio, stats, frequencies, dwell, output, metrics)
+        print(f"Frequency set to approx {FREQ_MHZ} MHz.")
+
+        baud = data_rate()
+        waiter = Gdo0Waiter(gdo0_pin, FIFO_THRESHOLD * 8 / baud)
+        receiver = PacketReceiver(radio, stats)
+        receiver.start()
+
+        print("-" * 30)
+        print(f"Data rate ~{baud:.0f} baud, {receiver.frame_len}-byte FIFO frames")
+        print(f"Wake source: {'GDO0 on GPIO ' + str(waiter.pin) if waiter.pin is not None else 'RXBYTES polling'}")
+        print("Listening for packets... Press Ctrl+C to stop.")
+        print("-" * 30)
+
+        while True:
+            packets = receiver.service()
+            for payload, rssi, lqi in packets:
+                output.emit(FREQ_MHZ, payload, rssi, lqi)
+            if not packets:
+                waiter.wait(receiver.holding) # A completed packet may already be followed by the next one
+            stats.maybe_report()
+            output.maybe_flush()
+            metrics.maybe_write()
+
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"\nAn error occurred: {e}", file=sys.stderr)
+    finally:
+        print(f"Received {stats.packets} packets, {stats.overflows} overflows, {stats.dropped_bytes} bytes dropped.")
+        if spi_active:
+            try:
+                spi.xfer2([SIDLE, 0x00])
+                spi.close()
+                print("SPI closed.")
+            except Exception as e:
+                print(f"Error during SPI cleanup: {e}")
+        if waiter:
+            waiter.close()
+        if output:
+            output.close()
+        metrics.write() # Final counts for /metrics
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ProxNet CC1101 Sub-GHz sniffer")
+    parser.add_argument("--gdo0-pin", type=int, default=GDO0_PIN, help="BCM GPIO wired to GDO0 (default: poll RXBYTES)")
+    parser.add_argument("--scan", action="store_true", help=f"Hop across frequencies instead of listening on {FREQ_MHZ} MHz")
+    parser.add_argument("--bands", help="Scan bands: any of 315,433,868,915 (default: all, unless --freqs is given)")
+    parser.add_argument("--freqs", help="Extra scan frequencies in MHz, e.g. 433.92,434.15")
+    parser.add_argument("--dwell-ms", type=float, default=SCAN_DWELL * 1000, help="Dwell per frequency in ms")
+    parser.add_argument("--pcapng", action="store_true", help=f"Write rotating PCAP-NG segments ({CAPTURE_PREFIX}_<timestamp>.pcapng)")
+    parser.add_argument("--text", action="store_true", help="With --pcapng, still print every packet as a text line")
+    parser.add_argument("--bus", action="store_true", help="Also publish every packet to the proxnet_bus.py ingestion bus")
+    args = parser.parse_args()
+    frequencies = None
+    if args.scan:
+        try:
+            bands = args.bands if args.bands is not None or args.freqs else ','.join(SCAN_BANDS)
+            frequencies = parse_frequencies(bands, args.freqs)
+        except ValueError as e:
+            parser.error(str(e))
+    main(gdo0_pin=args.gdo0_pin, frequencies=frequencies, dwell=args.dwell_ms / 1000,
+         text=args.text or not args.pcapng, pcapng_prefix=CAPTURE_PREFIX if args.pcapng else None, bus=args.bus)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+# esb_decoder.py
+# Recovers Enhanced ShockBurst frames from promiscuous nRF24 captures (CRC off, fixed 32-byte payload).
+# The radio hands over 32 bytes that start somewhere inside the air frame, so every bit
+# offset and address width (3-5 bytes) is tried and kept only if the frame's CRC16 checks.
+# All candidates of a batch are checked together with NumPy rather than bit by bit in Python.
+#
+# ESB air frame, MSB first:
+#   preamble 8 | address 24-40 | PCF 9 (length 6, PID 2, NO_ACK 1) | payload 0-32 bytes | CRC 16
+# The CRC is CRC-16/CCITT (poly 0x1021, init 0xFFFF) over the address, PCF and payload bits.
+#
+# Usage:
+#   python3 esb_decoder.py ~/proxnet/logs/nrf24_capture_<timestamp>.bin
+#   python3 esb_decoder.py --bench
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from nrf24_sniffer import CAPTURE_HEADER, CAPTURE_MAGIC, RECORD, PAYLOAD_SIZE
+
+# --- Configuration ---
+ADDRESS_WIDTHS = (3, 4, 5)
+MAX_ESB_PAYLOAD = 32
+MIN_PAYLOAD = 1   # Empty (ACK-style) frames pass the CRC by chance too often on noise to be worth reporting
+BATCH_SIZE = 1024 # Captures per NumPy pass; bounds the CRC history to ~12 MB
+BENCH_COUNT = 20000
+BENCH_PYTHON_COUNT = 200 # The pure-Python reference is far slower, so it only gets a sample
+
+CAPTURE_BITS = PAYLOAD_SIZE * 8
+CRC_POLY = 0x1021
+CRC_INIT = 0xFFFF
+PCF_BITS = 9
+CRC_BITS = 16
+MIN_FRAME_BITS = ADDRESS_WIDTHS[0] * 8 + PCF_BITS + CRC_BITS
+MAX_OFFSET = CAPTURE_BITS - MIN_FRAME_BITS # Last bit position a frame can start at
+
+# Capture file records (see nrf24_sniffer.RECORD) as a NumPy view
+CAPTURE_DTYPE = np.dtype({
+    'names': ['ts_ns', 'channel', 'pipe', 'length', 'payload'],
+    'formats': ['<u8', 'u1', 'u1', 'u1', ('u1', PAYLOAD_SIZE)],
+    'offsets': [0, 8, 9, 10, 11],
+    'itemsize': RECORD.size,
+})
+
+def _crc_table():
+    table = np.zeros(256, dtype=np.uint16)
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = (crc << 1) ^ CRC_POLY if crc & 0x8000 else crc << 1
+        table[byte] = crc & 0xFFFF
+    return table
+
+CRC_TABLE = _crc_table()
+
+# --- Vectorized Decoder ---
+def _bit_windows(payloads, width):
+    """Byte (bits 0-7) and 16-bit word starting at every bit position, zero padded to `width` positions."""
+    padded = np.zeros((len(payloads), PAYLOAD_SIZE + 2), dtype=np.uint32)
+    padded[:, :PAYLOAD_SIZE] = payloads
+    w24 = (padded[:, :-2] << 16) | (padded[:, 1:-1] << 8) | padded[:, 2:]
+    shifts = np.arange(8, dtype=np.uint32)
+    words = (w24[:, :, None] >> (8 - shifts)).reshape(len(payloads), CAPTURE_BITS) & 0xFFFF
+    word_at = np.zeros((len(payloads), width), dtype=np.uint16)
+    word_at[:, :CAPTURE_BITS] = words
+    return (word_at >> 8).astype(np.uint8), word_at
+
+def _decode_chunk(payloads, max_offset, min_payload):
+    n = len(payloads)
+    offsets = np.arange(max_offset + 1)
+    rows = np.arange(n)[:, None]
+    # Frames cover 8*K + 1 bits (address + first 8 PCF bits + payload = K bytes,
+    # then one trailing bit), so the CRC register is advanced a byte at a time
+    max_bytes = (CAPTURE_BITS - 1 - CRC_BITS) // 8
+    byte_at, word_at = _bit_windows(payloads, len(offsets) + 8 * max_bytes + CRC_BITS)
+    bits = (byte_at >> 7).astype(np.uint16) # Bit p is the top bit of the byte starting there
+
+    # The register only depends on where the frame starts and how many bytes it
+    # covers, so one pass per offset serves every address width. Offsets are
+    # consecutive bit positions, so each step reads one contiguous slice.
+    history = np.empty((max_bytes, n, len(offsets)), dtype=np.uint16)
+    crc = np.full((n, len(offsets)), CRC_INIT, dtype=np.uint16)
+    for k in range(max_bytes):
+        crc = (crc << 8) ^ CRC_TABLE[(crc >> 8) ^ byte_at[:, 8 * k:8 * k + len(offsets)]]
+        history[k] = crc
+
+    hits = []
+    for width in ADDRESS_WIDTHS:
+        pcf = byte_at[:, 8 * width:8 * width + len(offsets)]
+        length = (pcf >> 2).astype(np.int64)
+        whole = width + 1 + length
+        end = offsets + 8 * whole + 1 # First bit of the CRC field
+        valid = (length <= MAX_ESB_PAYLOAD) & (length >= min_payload) & (end + CRC_BITS <= CAPTURE_BITS)
+        reg = history[np.minimum(whole, max_bytes) - 1, rows, offsets]
+        tail = bits[rows, np.minimum(end - 1, bits.shape[1] - 1)]
+        feedback = ((reg >> 15) ^ tail) & 1
+        reg = (reg << 1) ^ (feedback * CRC_POLY).astype(np.uint16)
+        expected = word_at[rows, np.minimum(end, word_at.shape[1] - 1)]
+        for row, offset in zip(*np.nonzero(valid & (reg == expected))):
+            start = offset + 8 * width + PCF_BITS
+            size = length[row, offset]
+            hits.append({
+                'index': int(row),
+                'offset': int(offset),
+                'address': bytes(byte_at[row, offset:offset + 8 * width:8]),
+                'length': int(size),
+                'pid': int(pcf[row, offset] & 0x03),
+                'no_ack': int(bits[row, offset + 8 * width + 8]),
+                'payload': bytes(byte_at[row, start:start + 8 * size:8]),
+            })
+    return hits
+
+def decode_batch(payloads, max_offset=MAX_OFFSET, min_payload=MIN_PAYLOAD, batch_size=BATCH_SIZE):
+    """Finds every CRC-valid ESB frame in a batch of raw 32-byte captures.
+
+    `payloads` is an (N, 32) uint8 array (or anything np.asarray can turn into
+    one). Returns dicts with the capture `index`, the bit `offset` the frame
+    starts at, the over-the-air `address` bytes, the PCF fields (`length`,
+    `pid`, `no_ack`) and the `payload`, ordered by index then offset. With
+    ~600 candidates per capture a 16-bit CRC still lets roughly one noise
+    capture in a few hundred through, so treat single hits on an address
+    with suspicion.
+    """
+    payloads = np.ascontiguousarray(payloads, dtype=np.uint8).reshape(-1, PAYLOAD_SIZE)
+    max_offset = min(max_offset, MAX_OFFSET)
+    hits = []
+    for start in range(0, len(payloads), batch_size):
+        for hit in _decode_chunk(payloads[start:start + batch_size], max_offset, min_payload):
+            hit['index'] += start
+            hits.append(hit)
+    hits.sort(key=lambda h: (h['index'], h['offset']))
+    return hits
+
+# --- Reference Implementation ---
+def crc16_bits(bits):
+    crc = CRC_INIT
+    for bit in bits:
+        feedback = ((crc >> 15) ^ bit) & 1
+        crc = ((crc << 1) & 0xFFFF) ^ (CRC_POLY if feedback else 0)
+    return crc
+
+def _bits_value(bits):
+    value = 0
+    for bit in bits:
+        value = (value << 1) | bit
+    return value
+
+def decode_one(payload, max_offset=MAX_OFFSET, min_payload=MIN_PAYLOAD):
+    """Pure-Python bit-by-bit search over one capture; same output as decode_batch() (index 0)."""
+    bits = [(byte >> (7 - i)) & 1 for byte in payload for i in range(8)]
+    hits = []
+    for offset in range(min(max_offset, MAX_OFFSET) + 1):
+        for width in ADDRESS_WIDTHS:
+            pcf_pos = offset + 8 * width
+            if pcf_pos + PCF_BITS > CAPTURE_BITS:
+                continue
+            length = _bits_value(bits[pcf_pos:pcf_pos + 6])
+            end = pcf_pos + PCF_BITS + 8 * length
+            if length > MAX_ESB_PAYLOAD or length < min_payload or end + CRC_BITS > CAPTURE_BITS:
+                continue
+            if crc16_bits(bits[offset:end]) != _bits_value(bits[end:end + CRC_BITS]):
+                continue
+            start = pcf_pos + PCF_BITS
+            hits.append({
+                'index': 0,
+                'offset': offset,
+                'address': bytes(_bits_value(bits[p:p + 8]) for p in range(offset, pcf_pos, 8)),
+                'length': length,
+                'pid': _bits_value(bits[pcf_pos + 6:pcf_pos + 8]),
+                'no_ack': bits[pcf_pos + 8],
+                'payload': bytes(_bits_value(bits[p:p + 8]) for p in range(start, end, 8)),
+            })
+    return hits
+
+def encode_frame(address, payload, pid=0, no_ack=0):
+    """ESB frame bits (address through CRC, no preamble) as a list of 0/1."""
+    bits = [(byte >> (7 - i)) & 1 for byte in address for i in range(8)]
+    bits += [(len(payload) >> (5 - i)) & 1 for i in range(6)] + [(pid >> 1) & 1, pid & 1, no_ack & 1]
+    bits += [(byte >> (7 - i)) & 1 for byte in payload for i in range(8)]
+    crc = crc16_bits(bits)
+    return bits + [(crc >> (15 - i)) & 1 for i in range(CRC_BITS)]
+
+# --- Capture Files ---
+def load_capture(path):
+    """Reads an nrf24_sniffer capture into a record array; ts_ns is mapped to wall-clock time."""
+    with open(path, 'rb') as f:
+        magic, mono_ns, wall_ns = CAPTURE_HEADER.unpack(f.read(CAPTURE_HEADER.size))
+        if magic != CAPTURE_MAGIC:
+            raise ValueError(f"{path} is not an nRF24 capture file")
+        data = f.read()
+    records = np.frombuffer(data, dtype=CAPTURE_DTYPE, count=len(data) // RECORD.size).copy()
+    records['ts_ns'] += np.uint64(wall_ns) - np.uint64(mono_ns)
+    return records
+
+def format_hit(hit, record=None):
+    prefix = ""
+    if record is not None:
+        prefix = f"[{record['ts_ns'] / 1e9:.6f}] CH {record['channel']} "
+    return (f"{prefix}@{hit['offset']} ADDR {hit['address'].hex().upper()} LEN {hit['length']} "
+            f"PID {hit['pid']} NO_ACK {hit['no_ack']}: {hit['payload'].hex().upper()}")
+
+def decode_file(path, as_json=False, max_offset=MAX_OFFSET, min_payload=MIN_PAYLOAD):
+    records = load_capture(path)
+    started = time.perf_counter()
+    hits = decode_batch(records['payload'], max_offset, min_payload)
+    elapsed = time.perf_counter() - started
+    for hit in hits:
+        record = records[hit['index']]
+        if as_json:
+            print(json.dumps({
+                'ts_ns': int(record['ts_ns']), 'channel': int(record['channel']), 'offset': hit['offset'],
+                'address': hit['address'].hex(), 'length': hit['length'], 'pid': hit['pid'],
+                'no_ack': hit['no_ack'], 'payload': hit['payload'].hex(),
+            }))
+        else:
+            print(format_hit(hit, record))
+    addresses = {hit['address'] for hit in hits}
+    print(f"{len(records)} captures, {len(hits)} frames from {len(addresses)} address(es) "
+          f"in {elapsed:.2f}s ({len(records) / max(elapsed, 1e-9):.0f} captures/s)", file=sys.stderr)
+
+# --- Benchmark ---
+def synthetic_captures(count, frame_ratio=0.5, seed=1):
+    """Random 32-byte captures, `frame_ratio` of them with one ESB frame at a random bit offset.
+
+    Returns (payloads, truth) where truth maps capture index -> (offset, address, payload).
+    """
+    rng = random.Random(seed)
+    payloads = np.frombuffer(rng.randbytes(count * PAYLOAD_SIZE), dtype=np.uint8).reshape(count, PAYLOAD_SIZE).copy()
+    truth = {}
+    for index in range(count):
+        if rng.random() >= frame_ratio:
+            continue
+        address = rng.randbytes(rng.choice(ADDRESS_WIDTHS))
+        payload = rng.randbytes(rng.randint(max(MIN_PAYLOAD, 1), 16))
+        frame = encode_frame(address, payload, rng.randrange(4), rng.randrange(2))
+        offset = rng.randrange(CAPTURE_BITS - len(frame) + 1)
+        bits = np.unpackbits(payloads[index])
+        bits[offset:offset + len(frame)] = frame
+        payloads[index] = np.packbits(bits)
+        truth[index] = (offset, address, payload)
+    return payloads, truth
+
+def bench(count=BENCH_COUNT):
+    payloads, truth = synthetic_captures(count)
+    print(f"Synthetic set: {count} captures, {len(truth)} with an embedded ESB frame")
+
+    started = time.perf_counter()
+    hits = decode_batch(payloads)
+    elapsed = time.perf_counter() - started
+    found = {(h['index'], h['offset'], h['address'], h['payload']) for h in hits}
+    recovered = sum((i, *t) in found for i, t in truth.items())
+    false_hits = len(hits) - recovered
+    print(f"NumPy:  {count / elapsed:10.0f} captures/s, {recovered / elapsed:10.0f} frames/s "
+          f"({elapsed:.2f}s, recovered {recovered}/{len(truth)}, {false_hits} chance CRC matches)")
+
+    sample = min(BENCH_PYTHON_COUNT, count)
+    started = time.perf_counter()
+    slow = [decode_one(payloads[i].tobytes()) for i in range(sample)]
+    py_elapsed = time.perf_counter() - started
+    agree = all(
+        [(h['offset'], h['address'], h['payload']) for h in slow[i]]
+        == [(h['offset'], h['address'], h['payload']) for h in hits if h['index'] == i]
+        for i in range(sample)
+    )
+    print(f"Python: {sample / py_elapsed:10.0f} captures/s ({sample} captures, "
+          f"{'matches' if agree else 'DIFFERS FROM'} NumPy) -> {py_elapsed / sample * count / elapsed:.0f}x speedup")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recover ESB frames from promiscuous nRF24 captures")
+    parser.add_argument("capture", nargs="?", type=Path, help="nrf24_sniffer.py binary capture file")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per frame")
+    parser.add_argument("--max-offset", type=int, default=MAX_OFFSET, help="Last bit offset to try (smaller is faster)")
+    parser.add_argument("--min-payload", type=int, default=MIN_PAYLOAD, help="Ignore frames with shorter payloads")
+    parser.add_argument("--bench", action="store_true", help="Benchmark on synthetic captures")
+    parser.add_argument("--count", type=int, default=BENCH_COUNT, help="Synthetic captures for --bench")
+    args = parser.parse_args()
+    if args.bench:
+        bench(args.count)
+    elif args.capture:
+        decode_file(args.capture, args.json, args.max_offset, args.min_payload)
+    else:
+        parser.error("give a capture file or --bench")
@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 
 # esp32_logger.py
-# Version 3: Handles RFID, NFC, BTClassic, and BLE JSON messages.
+# Version 3: Handles RFID, NFC, BTClassic, and BLE JSON messages
+# (or the equivalent binary frames from esp32_wire.py, auto-detected).
+# --bus publishes the messages to proxnet_bus.py, which owns the DB and CSV, instead.
+# Serial, decode and DB stage metrics are snapshotted for web_ui.py's /metrics (see proxnet_metrics.py).
 # Listens on Pi's GPIO serial port /dev/ttyS0
 
 import serial
@@ -9,157 +12,657 @@ import json
 import time
 import sqlite3
 import csv
+import gzip
+import io
 import os
+import shutil
+import queue
+import signal
+import threading
+import itertools
+from collections import OrderedDict
+import argparse
 from pathlib import Path
+import proxnet_db
+from esp32_wire import FrameDecoder
+from proxnet_bus import BusPublisher
+from proxnet_metrics import Metrics, Histogram, SIZE_BUCKETS
 
 # --- Configuration ---
 SERIAL_PORT = '/dev/ttyS0' # Use Pi's GPIO serial
 BAUD_RATE = 115200
+SERIAL_READ_TIMEOUT = 1.0 # Longest idle wait per read; only bounds how late periodic flushes run
+MAX_LINE_LENGTH = 4096    # Partial lines longer than this are treated as noise and discarded
 PROJECT_DIR = Path.home() / "proxnet"
 LOG_DIR = PROJECT_DIR / "logs"
 DB_FILE = LOG_DIR / "proxnet_log.db"
 CSV_FILE = LOG_DIR / "proxnet_log.csv"
+DB_QUEUE_SIZE = 10000     # Max rows waiting for the writer before we start dropping
+DB_BATCH_SIZE = 500       # Commit once this many rows are pending...
+DB_COMMIT_INTERVAL = 1.0  # ...or this many seconds after the first pending row
+AGGREGATE_TYPES = ('BTClassic', 'BLE') # Module types collapsed into summary rows (unless --raw)
+AGGREGATE_MAX_DEVICES = 4096  # Devices tracked at once; least recently seen is evicted first
+AGGREGATE_INTERVAL = 60.0     # Seconds before a device that keeps being seen gets a new summary row
+AGGREGATE_RSSI_DELTA = 10     # dB away from the last reported RSSI that counts as a material change
+ROLLUP_FLUSH_INTERVAL = 5.0   # Seconds between RSSI rollup upserts (partial buckets merge in SQL)
 
 # --- Ensure log directory exists ---
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 
-# --- Database Setup (Updated Schema) ---
+# --- Database Setup (shared schema in proxnet_db.py) ---
 def setup_database():
     """Creates/Updates the SQLite table."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    # Add new columns if they don't exist (handles upgrading from old schema)
-    try:
-        cursor.execute("ALTER TABLE scans ADD COLUMN mac TEXT")
-    except sqlite3.OperationalError: pass # Column likely already exists
-    try:
-        cursor.execute("ALTER TABLE scans ADD COLUMN name TEXT")
-    except sqlite3.OperationalError: pass
-    try:
-        cursor.execute("ALTER TABLE scans ADD COLUMN rssi INTEGER")
-    except sqlite3.OperationalError: pass
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS scans (
-            timestamp TEXT NOT NULL,
-            module_type TEXT,
-            protocol TEXT,
-            uid TEXT,
-            uid_len INTEGER,
-            mac TEXT,       -- Added for BT/BLE
-            name TEXT,      -- Added for BT/BLE
-            rssi INTEGER    -- Added for BT/BLE
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    proxnet_db.setup_database(DB_FILE)
     print(f"Database initialized/verified at: {DB_FILE}")
 
-def log_to_db(timestamp, data):
-    """Logs scan data (RFID/NFC/BT/BLE) to SQLite."""
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO scans (timestamp, module_type, protocol, uid, uid_len, mac, name, rssi)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            timestamp,
-            data.get('type', 'Unknown'),
-            data.get('protocol', None),
-            data.get('uid', None),
-            data.get('uid_len', None),
-            data.get('mac', None),
-            data.get('name', None),
-            data.get('rssi', None)
-        ))
-        conn.commit()
-        conn.close()
-    except sqlite3.Error as e:
-        print(f"[{timestamp}] DB_ERROR: Failed to log to SQLite - {e}")
+def scan_row(ts_us, timestamp, data, stats=None):
+    """Builds the scans table row for one RFID/NFC/BT/BLE message.
+
+    `stats` is a Sighting summarising several sightings; a lone sighting
+    counts as one.
+    """
+    rssi = data.get('rssi', None)
+    if stats is None:
+        summary = (1, ts_us, rssi, rssi, rssi)
+    else:
+        summary = (stats.count, stats.first_seen_us, stats.rssi_min, stats.rssi_max, stats.rssi_mean)
+    return (
+        ts_us,
+        timestamp,
+        data.get('type', 'Unknown'),
+        data.get('protocol', None),
+        data.get('uid', None),
+        data.get('uid_len', None),
+        data.get('mac', None),
+        data.get('name', None),
+        rssi
+    ) + summary
+
+# --- Database Writer (single connection, group commit) ---
+_STOP = object() # Queue sentinel telling the writer to flush and exit
+
+class DBWriter(threading.Thread):
+    """Owns the only SQLite connection and writes queued rows in batches.
+
+    Rows are committed with executemany once DB_BATCH_SIZE rows are pending or
+    DB_COMMIT_INTERVAL seconds after the first pending row, whichever is first,
+    so the SD card sees one fsync per batch instead of one per scan. Each row
+    is queued with its statement (scan insert by default), and consecutive rows
+    for the same statement share one executemany.
+    """
+
+    def __init__(self, db_file=DB_FILE, batch_size=DB_BATCH_SIZE,
+                 commit_interval=DB_COMMIT_INTERVAL, queue_size=DB_QUEUE_SIZE):
+        super().__init__(name="db-writer", daemon=True)
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.commits = 0
+        self.commit_latency = Histogram() # executemany + COMMIT per batch
+        self.batch_rows = Histogram(SIZE_BUCKETS)
+
+    def submit(self, row, sql=proxnet_db.INSERT_SCAN_SQL):
+        """Queues one row; drops it (and counts the drop) if the writer is backed up."""
+        try:
+            self.queue.put_nowait((sql, row)) # Never stall the serial loop or bus intake on a slow commit
+        except queue.Full:
+            self.rows_dropped += 1
+            if self.rows_dropped == 1 or self.rows_dropped % 1000 == 0:
+                print(f"DB_WARN: Writer queue full, {self.rows_dropped} row(s) dropped so far")
+
+    def close(self, timeout=4.0):
+        """Flushes pending rows and stops the writer thread."""
+        if not self.is_alive():
+            return
+        self.queue.put(_STOP)
+        self.join(timeout)
+
+    def register_metrics(self, metrics):
+        metrics.counter('db_rows_written_total', "Rows committed to SQLite", lambda: self.rows_written)
+        metrics.counter('db_rows_dropped_total', "Rows dropped because the writer queue was full", lambda: self.rows_dropped)
+        metrics.counter('db_commits_total', "SQLite transactions committed", lambda: self.commits)
+        metrics.gauge('db_queue_depth', "Rows waiting for the DB writer", self.queue.qsize)
+        metrics.histogram('db_commit_seconds', "Time to insert and commit one batch", self.commit_latency)
+        metrics.histogram('db_batch_rows', "Rows per committed batch", self.batch_rows)
+
+    def _commit(self, conn, batch):
+        started = time.perf_counter_ns()
+        try:
+            with conn:
+                for sql, items in itertools.groupby(batch, key=lambda item: item[0]):
+                    conn.executemany(sql, [row for _, row in items])
+            self.rows_written += len(batch)
+            self.commits += 1
+            self.commit_latency.observe_ns(started)
+            self.batch_rows.observe(len(batch))
+        except sqlite3.Error as e:
+            print(f"DB_ERROR: Failed to write {len(batch)} row(s) to SQLite - {e}")
+
+    def run(self):
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL") # WAL keeps this crash-safe, skips most fsyncs
+        batch = []
+        deadline = None
+        try:
+            while True:
+                # Block indefinitely while idle; only wake for the commit deadline once rows are pending.
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+                if item is _STOP:
+                    break
+                if item is not None:
+                    batch.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.commit_interval
+                    if len(batch) < self.batch_size and time.monotonic() < deadline:
+                        continue
+                if batch:
+                    self._commit(conn, batch)
+                    batch = []
+                deadline = None
+            # Drain anything queued behind the stop sentinel
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    batch.append(item)
+            if batch:
+                self._commit(conn, batch)
+        finally:
+            conn.close()
 
 # --- CSV Setup (Updated Headers) ---
-CSV_FIELDNAMES = ['timestamp', 'module_type', 'protocol', 'uid', 'uid_len', 'mac', 'name', 'rssi']
+CSV_FIELDNAMES = ['timestamp', 'module_type', 'protocol', 'uid', 'uid_len', 'mac', 'name', 'rssi',
+                  'seen_count', 'first_seen_us', 'rssi_min', 'rssi_max', 'rssi_mean']
+
+CSV_BUFFER_SIZE = 64 * 1024           # Bytes buffered in memory between flushes
+CSV_FLUSH_INTERVAL = 5.0              # Seconds between flushes while rows are pending
+CSV_ROTATE_BYTES = 50 * 1024 * 1024   # Start a new segment past this size (0 = never)
+CSV_ROTATE_DAILY = True               # Also start a new segment at local midnight
+CSV_GZIP_ROTATED = True               # Compress closed segments in the background
+
+def next_midnight(now=None):
+    """Epoch seconds of the next local midnight after `now`."""
+    t = time.localtime(now)
+    return time.mktime((t.tm_year, t.tm_mon, t.tm_mday + 1, 0, 0, 0, 0, 0, -1))
 
-def log_to_csv(timestamp, data):
-    """Appends scan data to the CSV file."""
-    file_exists = CSV_FILE.is_file()
+def gzip_file(path):
+    """Compresses `path` to `path`.gz and removes the original."""
     try:
-        with open(CSV_FILE, 'a', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES)
-
-            if not file_exists or os.path.getsize(CSV_FILE) == 0:
-                writer.writeheader() # Write header if file is new or empty
-
-            row_data = {
-                'timestamp': timestamp,
-                'module_type': data.get('type', 'Unknown'),
-                'protocol': data.get('protocol', ''),
-                'uid': data.get('uid', ''),
-                'uid_len': data.get('uid_len', ''),
-                'mac': data.get('mac', ''),
-                'name': data.get('name', ''),
-                'rssi': data.get('rssi', '')
-            }
-            writer.writerow(row_data)
-    except IOError as e:
-        print(f"[{timestamp}] CSV_ERROR: Failed to log to CSV - {e}")
+        with open(path, 'rb') as src, gzip.open(f"{path}.gz", 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.remove(path)
+    except OSError as e:
+        print(f"CSV_ERROR: Failed to compress {path} - {e}")
+
+class CSVSink:
+    """Keeps proxnet_log.csv open and buffered, rotating it by size and/or day.
+
+    The active segment is always CSV_FILE; closed segments are renamed to
+    proxnet_log-YYYYmmdd-HHMMSS.csv (optionally gzipped). The header is only
+    written when a new, empty segment is opened.
+    """
+
+    def __init__(self, path=CSV_FILE, max_bytes=CSV_ROTATE_BYTES, daily=CSV_ROTATE_DAILY,
+                 gzip_rotated=CSV_GZIP_ROTATED, flush_interval=CSV_FLUSH_INTERVAL):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.daily = daily
+        self.gzip_rotated = gzip_rotated
+        self.flush_interval = flush_interval
+        self.file = None
+        self.size = 0
+        self.rollover_at = None
+        self.dirty = False
+        self.last_flush = time.monotonic()
+        # Rows are formatted into a reusable string buffer so we can count bytes
+        # without asking the file for its position (which would force a flush).
+        self._line = io.StringIO()
+        self._csv = csv.writer(self._line)
+        self._open()
+
+    def _format(self, values):
+        self._line.seek(0)
+        self._line.truncate()
+        self._csv.writerow(values)
+        return self._line.getvalue().encode('utf-8')
+
+    def _open(self):
+        if self._header_changed():
+            self._rotate_closed()
+        self.file = open(self.path, 'ab', buffering=CSV_BUFFER_SIZE)
+        self.size = self.file.tell()
+        if self.daily:
+            # An existing segment from an earlier day gets rolled over on the first write
+            started = os.path.getmtime(self.path) if self.size else time.time()
+            self.rollover_at = next_midnight(started)
+        if self.size == 0:
+            self._write(self._format(CSV_FIELDNAMES))
+
+    def _write(self, data):
+        self.file.write(data)
+        self.size += len(data)
+        self.dirty = True
+
+    def _header_changed(self):
+        # Segments written before a column change are closed rather than appended to
+        try:
+            with open(self.path, 'rb') as f:
+                first = f.readline()
+        except FileNotFoundError:
+            return False
+        return bool(first) and first != self._format(CSV_FIELDNAMES)
+
+    def _rotate(self):
+        self.file.close()
+        self._rotate_closed()
+        self._open()
+
+    def _rotate_closed(self):
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        rotated = self.path.with_name(f"{self.path.stem}-{stamp}{self.path.suffix}")
+        n = 1
+        while rotated.exists() or Path(f"{rotated}.gz").exists(): # Several rotations in one second
+            rotated = self.path.with_name(f"{self.path.stem}-{stamp}-{n}{self.path.suffix}")
+            n += 1
+        os.replace(self.path, rotated)
+        print(f"CSV segment closed: {rotated}")
+        if self.gzip_rotated:
+            threading.Thread(target=gzip_file, args=(rotated,), name="csv-gzip", daemon=True).start()
+
+    def write(self, row):
+        """Appends one scans table row (see scan_row), rotating first if the segment is full or stale."""
+        try:
+            if ((self.max_bytes and self.size >= self.max_bytes)
+                    or (self.rollover_at is not None and time.time() >= self.rollover_at)):
+                self._rotate()
+            self._write(self._format(row[1:])) # Everything but ts_us, in CSV_FIELDNAMES order
+            self.maybe_flush()
+        except (IOError, OSError) as e:
+            print(f"[{row[1]}] CSV_ERROR: Failed to log to CSV - {e}")
+
+    def maybe_flush(self):
+        """Flushes buffered rows if the flush interval has elapsed."""
+        if self.dirty and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        try:
+            self.file.flush()
+        except (IOError, OSError) as e:
+            print(f"CSV_ERROR: Failed to flush CSV - {e}")
+        self.dirty = False
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        if self.file and not self.file.closed:
+            self.flush()
+            self.file.close()
+
+class NullSink:
+    """Stands in for CSVSink when CSV logging is off (rows are exported from the DB instead, see web_ui.py /api/export)."""
+    def write(self, row): pass
+    def maybe_flush(self): pass
+    def close(self): pass
+
+# --- Sighting Aggregation ---
+class Sighting:
+    """Sightings of one device since its last summary row."""
+
+    __slots__ = ('data', 'count', 'first_seen_us', 'last_seen_us', 'rssi_min', 'rssi_max',
+                 'rssi_sum', 'rssi_n', 'reported_us', 'reported_rssi', 'reported_name')
+
+    def __init__(self):
+        self.data = None
+        self.reported_us = None
+        self.reported_rssi = None
+        self.reported_name = None
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.first_seen_us = self.last_seen_us = None
+        self.rssi_min = self.rssi_max = None
+        self.rssi_sum = self.rssi_n = 0
+
+    def add(self, ts_us, data):
+        self.data = data
+        self.count += 1
+        if self.first_seen_us is None:
+            self.first_seen_us = ts_us
+        self.last_seen_us = ts_us
+        rssi = data.get('rssi')
+        if rssi is not None:
+            self.rssi_min = rssi if self.rssi_min is None else min(self.rssi_min, rssi)
+            self.rssi_max = rssi if self.rssi_max is None else max(self.rssi_max, rssi)
+            self.rssi_sum += rssi
+            self.rssi_n += 1
+
+    @property
+    def rssi_mean(self):
+        return round(self.rssi_sum / self.rssi_n, 1) if self.rssi_n else None
+
+class SightingAggregator:
+    """Collapses repeated BT/BLE sightings of the same device into summary rows.
+
+    Devices are tracked in a bounded LRU keyed by (module_type, mac/uid). A
+    device gets a summary row the first time it is seen, when its name or
+    RSSI changes materially, and every `interval` seconds while it keeps
+    being seen (or once it goes quiet). Each row covers the sightings since
+    the previous one. `emit(ts_us, data, sighting)` is called for every row.
+    """
+
+    def __init__(self, emit, interval=AGGREGATE_INTERVAL, rssi_delta=AGGREGATE_RSSI_DELTA,
+                 max_devices=AGGREGATE_MAX_DEVICES):
+        self.emit = emit
+        self.interval_us = int(interval * 1_000_000)
+        self.rssi_delta = rssi_delta
+        self.max_devices = max_devices
+        self.devices = OrderedDict()
+        self.last_sweep_us = 0
+
+    def _report(self, sighting):
+        self.emit(sighting.last_seen_us, sighting.data, sighting)
+        sighting.reported_us = sighting.last_seen_us
+        sighting.reported_rssi = sighting.data.get('rssi')
+        sighting.reported_name = sighting.data.get('name')
+        sighting.reset()
+
+    def add(self, ts_us, data):
+        key = (data.get('type'), data.get('mac') or data.get('uid'))
+        sighting = self.devices.get(key)
+        if sighting is None:
+            sighting = self.devices[key] = Sighting()
+            if len(self.devices) > self.max_devices:
+                _, evicted = self.devices.popitem(last=False)
+                if evicted.count:
+                    self._report(evicted)
+        else:
+            self.devices.move_to_end(key)
+        sighting.add(ts_us, data)
+
+        rssi, name = data.get('rssi'), data.get('name')
+        if (sighting.reported_us is None
+                or ts_us - sighting.reported_us >= self.interval_us
+                or (name and name != sighting.reported_name)
+                or (rssi is not None and sighting.reported_rssi is not None
+                    and abs(rssi - sighting.reported_rssi) >= self.rssi_delta)):
+            self._report(sighting)
+
+    def tick(self, now_us):
+        """Reports devices that went quiet with unreported sightings; cheap to call often."""
+        if now_us - self.last_sweep_us < 1_000_000:
+            return
+        self.last_sweep_us = now_us
+        for sighting in self.devices.values():
+            if sighting.count and now_us - sighting.reported_us >= self.interval_us:
+                self._report(sighting)
+
+    def flush(self):
+        for sighting in self.devices.values():
+            if sighting.count:
+                self._report(sighting)
+
+# --- RSSI Rollups ---
+class RSSIRollups:
+    """Accumulates per-device RSSI buckets for each rollup resolution in memory.
+
+    Every ROLLUP_FLUSH_INTERVAL seconds the partial buckets are sent to the
+    DB writer as upserts, which merge them into the stored bucket, so the
+    rollup tables stay current without re-reading raw scans. Fed with every
+    sighting, including ones the aggregator folds into a summary row.
+    """
+
+    def __init__(self, db_writer, flush_interval=ROLLUP_FLUSH_INTERVAL):
+        self.db_writer = db_writer
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        self.resolutions = [(proxnet_db.UPSERT_ROLLUP_SQL.format(table=proxnet_db.rollup_table(name)), seconds * 1_000_000)
+                            for name, seconds in proxnet_db.ROLLUP_RESOLUTIONS]
+        self.buckets = {} # (sql, device, bucket_us) -> [module_type, count, min, max, sum, last, last_us]
+
+    def add(self, ts_us, data):
+        rssi = data.get('rssi')
+        device = data.get('mac') or data.get('uid')
+        if rssi is None or device is None:
+            return
+        for sql, width_us in self.resolutions:
+            key = (sql, device, ts_us - ts_us % width_us)
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                self.buckets[key] = [data.get('type'), 1, rssi, rssi, rssi, rssi, ts_us]
+                continue
+            bucket[1] += 1
+            if rssi < bucket[2]: bucket[2] = rssi
+            if rssi > bucket[3]: bucket[3] = rssi
+            bucket[4] += rssi
+            if ts_us >= bucket[6]:
+                bucket[5], bucket[6] = rssi, ts_us
+
+    def maybe_flush(self):
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        for (sql, device, bucket_us), (module_type, count, lo, hi, total, last, last_us) in self.buckets.items():
+            self.db_writer.submit((device, bucket_us, module_type, count, lo, hi, total, last, last_us), sql)
+        self.buckets.clear()
+        self.last_flush = time.monotonic()
+
+# --- Scan Pipeline ---
+class ScanPipeline:
+    """Routes scan messages through aggregation (unless raw) into the DB and CSV sinks, and feeds the RSSI rollups."""
+
+    def __init__(self, db_writer, csv_sink, raw=False, aggregate_interval=AGGREGATE_INTERVAL):
+        self.db_writer = db_writer
+        self.csv_sink = csv_sink
+        self.aggregator = None if raw else SightingAggregator(self._write, interval=aggregate_interval)
+        self.rollups = RSSIRollups(db_writer)
+        self._ts_second = None
+        self._ts_text = None
+
+    def _format_ts(self, ts_us):
+        second = ts_us // 1_000_000
+        if second != self._ts_second:
+            self._ts_second, self._ts_text = second, proxnet_db.format_ts(ts_us)
+        return self._ts_text
+
+    def _write(self, ts_us, data, stats=None):
+        row = scan_row(ts_us, self._format_ts(ts_us), data, stats)
+        self.db_writer.submit(row)
+        self.csv_sink.write(row)
+
+    def add(self, ts_us, data):
+        self.rollups.add(ts_us, data)
+        if self.aggregator and data.get('type') in AGGREGATE_TYPES:
+            self.aggregator.add(ts_us, data)
+        else:
+            self._write(ts_us, data)
+
+    def tick(self):
+        if self.aggregator:
+            self.aggregator.tick(proxnet_db.now_us())
+        self.rollups.maybe_flush()
+        self.csv_sink.maybe_flush()
+
+    def close(self):
+        if self.aggregator:
+            self.aggregator.flush()
+        self.rollups.flush()
+
+class BusScanSink:
+    """Stands in for ScanPipeline with --bus: messages go to the bus daemon, which does the DB/CSV work."""
+
+    def __init__(self, publisher):
+        self.publisher = publisher
+
+    def add(self, ts_us, data):
+        self.publisher.publish_scan(ts_us, data)
+
+    def tick(self):
+        self.publisher.maybe_flush()
+
+    def close(self):
+        self.publisher.close()
+
+# --- Serial Framing ---
+class LinkStats:
+    """UART side counters: bytes/reads from the port and time spent decoding and handling each chunk."""
+
+    def __init__(self):
+        self.bytes = 0
+        self.reads = 0
+        self.decode_latency = Histogram() # FrameDecoder.feed() per chunk
+        self.handle_latency = Histogram() # JSON parsing + pipeline per chunk with messages
+
+    def register_metrics(self, metrics, decoder):
+        metrics.counter('serial_read_bytes_total', "Bytes read from the ESP32 UART", lambda: self.bytes)
+        metrics.counter('serial_reads_total', "read() calls that returned data", lambda: self.reads)
+        metrics.counter('messages_total', "Messages decoded from the UART", lambda: decoder.frames, wire='binary')
+        metrics.counter('messages_total', "Messages decoded from the UART", lambda: decoder.lines, wire='json')
+        metrics.counter('frame_crc_errors_total', "Binary frames with a bad CRC", lambda: decoder.crc_errors)
+        metrics.counter('frame_malformed_total', "Binary frames with a good CRC but a short payload", lambda: decoder.bad_frames)
+        metrics.counter('serial_noise_bytes_total', "Bytes discarded as line noise", lambda: decoder.discarded)
+        metrics.histogram('decode_seconds', "Framing time per UART chunk", self.decode_latency)
+        metrics.histogram('handle_seconds', "JSON decoding and pipeline time per chunk with messages", self.handle_latency)
+
+def read_chunk(ser):
+    """Blocks until data arrives (or the read timeout passes), then returns everything buffered."""
+    return ser.read(ser.in_waiting or 1)
+
+def handle_message(message, ts_us, timestamp, pipeline):
+    """Hands one decoded message to the scan pipeline.
+
+    `message` is either a dict from a binary frame or a raw JSON text line.
+    """
+    if isinstance(message, dict):
+        data = message
+    else:
+        try:
+            line = message.decode('utf-8')
+        except UnicodeDecodeError:
+            print(f"[{timestamp}] ERROR: Garbled data received")
+            return
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            print(f"[{timestamp}] RAW: {line}")
+            return
+    try:
+        print(f"[{timestamp}] LOG: {data}")
+
+        # Log scan data, skip status/error messages
+        if 'status' not in data and 'error' not in data:
+            pipeline.add(ts_us, data)
+    except Exception as e:
+        print(f"[{timestamp}] ERROR: Unexpected error - {e}")
+
+# --- Signal Handler ---
+def handle_sigterm(signum, frame):
+    # web_ui.stop_logger sends SIGTERM; turn it into an exception so the
+    # finally block below gets to flush the DB writer before we exit.
+    raise SystemExit(0)
 
 # --- Main Logger Function ---
-def start_logger():
+def start_logger(port=SERIAL_PORT, baud=BAUD_RATE, raw=False, aggregate_interval=AGGREGATE_INTERVAL, bus=False,
+                 write_csv=True):
     print("Starting ProxNet ESP32 Logger (v3 - UART)...")
-    setup_database() # Initialize/Update DB
-    print(f"CSV logging to: {CSV_FILE}")
-    print(f"Connecting to {SERIAL_PORT} at {BAUD_RATE} baud.")
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    db_writer = csv_sink = None
+    if bus:
+        pipeline = BusScanSink(BusPublisher('esp32'))
+        print(f"Publishing to the ingestion bus at {pipeline.publisher.path}")
+    else:
+        setup_database() # Initialize/Update DB
+        db_writer = DBWriter()
+        db_writer.start()
+        csv_sink = CSVSink() if write_csv else NullSink()
+        pipeline = ScanPipeline(db_writer, csv_sink, raw=raw, aggregate_interval=aggregate_interval)
+        print(f"CSV logging to: {CSV_FILE}" if write_csv else "CSV logging off (export from the web UI's /api/export).")
+        if raw: print("Raw mode: every sighting is logged.")
+        else: print(f"Aggregating {', '.join(AGGREGATE_TYPES)} sightings (summary every {aggregate_interval:g}s).")
+    print(f"Connecting to {port} at {baud} baud.")
     ser = None
+    decoder = FrameDecoder(max_line=MAX_LINE_LENGTH)
+    link = LinkStats()
+    metrics = Metrics('logger')
+    link.register_metrics(metrics, decoder)
+    if bus:
+        pipeline.publisher.register_metrics(metrics)
+    else:
+        db_writer.register_metrics(metrics)
 
     try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
+        ser = serial.Serial(port, baud, timeout=SERIAL_READ_TIMEOUT)
         print("Waiting for ESP32 to initialize...")
         time.sleep(2) # Give ESP32 time to boot and send READY message
         ser.reset_input_buffer()
-        print("Connection successful. Waiting for JSON data...")
+        print("Connection successful. Waiting for JSON or binary data...")
         print("="*30)
 
         while True:
-            if ser.in_waiting > 0:
-                line = ""
-                try:
-                    line = ser.readline().decode('utf-8').rstrip()
-                    timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-
-                    if line:
-                        data = json.loads(line)
-                        print(f"[{timestamp}] LOG: {data}")
-
-                        # Log scan data, skip status/error messages
-                        if 'status' not in data and 'error' not in data:
-                            log_to_db(timestamp, data)
-                            log_to_csv(timestamp, data)
-
-                except json.JSONDecodeError:
-                    if line: print(f"[{timestamp}] RAW: {line}")
-                except UnicodeDecodeError:
-                    timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-                    print(f"[{timestamp}] ERROR: Garbled data received")
-                except Exception as e:
-                    timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-                    print(f"[{timestamp}] ERROR: Unexpected error - {e}")
-
-            time.sleep(0.05)
+            chunk = read_chunk(ser)
+            if chunk:
+                link.bytes += len(chunk)
+                link.reads += 1
+                started = time.perf_counter_ns()
+                messages = decoder.feed(chunk)
+                decoded = time.perf_counter_ns()
+                link.decode_latency.observe_ns(started, decoded)
+                if messages:
+                    # Everything in one read arrived together; one timestamp covers the batch
+                    ts_us = proxnet_db.now_us()
+                    timestamp = proxnet_db.format_ts(ts_us)
+                    for message in messages:
+                        handle_message(message, ts_us, timestamp, pipeline)
+                    link.handle_latency.observe_ns(decoded)
+            pipeline.tick()
+            metrics.maybe_write()
 
     except serial.SerialException as e:
-        print(f"\nCRITICAL ERROR connecting to {SERIAL_PORT}: {e}")
+        print(f"\nCRITICAL ERROR connecting to {port}: {e}")
         print("Is the ESP32 wired correctly (TX2->Pi RXD, GND->GND)?")
         print("Did you enable serial port in raspi-config (disable console login)?")
     except KeyboardInterrupt:
         print("\nLogger stopped by user.")
+    except SystemExit:
+        print("\nLogger stopped by SIGTERM.")
     except Exception as e:
          print(f"\nCRITICAL UNEXPECTED ERROR: {e}")
     finally:
         if ser and ser.is_open:
             ser.close()
-            print(f"Port {SERIAL_PORT} closed.")
+            print(f"Port {port} closed.")
+        pipeline.close()
+        if decoder.crc_errors or decoder.bad_frames or decoder.discarded:
+            print(f"Framing: {decoder.crc_errors} bad CRC frame(s), {decoder.bad_frames} malformed frame(s), "
+                  f"{decoder.discarded} noise byte(s) skipped.")
+        if bus:
+            print(f"Bus publisher closed ({pipeline.publisher.published} published, {pipeline.publisher.dropped} dropped).")
+        else:
+            db_writer.close()
+            csv_sink.close()
+            print(f"Database writer flushed ({db_writer.rows_written} rows written, {db_writer.rows_dropped} dropped).")
+        metrics.write() # Final counts for /metrics
 
 if __name__ == "__main__":
-    start_logger()
+    parser = argparse.ArgumentParser(description="ProxNet ESP32 UART logger")
+    parser.add_argument("--port", default=SERIAL_PORT, help=f"Serial device (default {SERIAL_PORT}; a pty works for testing)")
+    parser.add_argument("--baud", type=int, default=BAUD_RATE, help=f"Baud rate (default {BAUD_RATE})")
+    parser.add_argument("--raw", action="store_true", help="Log every BT/BLE sighting instead of summary rows")
+    parser.add_argument("--aggregate-interval", type=float, default=AGGREGATE_INTERVAL,
+                        help=f"Seconds between summary rows per device (default {AGGREGATE_INTERVAL:g})")
+    parser.add_argument("--bus", action="store_true", help="Publish to proxnet_bus.py instead of writing the DB/CSV here")
+    parser.add_argument("--no-csv", action="store_true", help="Don't write proxnet_log.csv (rows are only stored in the DB)")
+    args = parser.parse_args()
+    start_logger(args.port, args.baud, raw=args.raw, aggregate_interval=args.aggregate_interval, bus=args.bus,
+                 write_csv=not args.no_csv)
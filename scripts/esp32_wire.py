@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+# esp32_wire.py
+# Compact binary framing for the ESP32 -> Pi UART link, decoded alongside JSON lines.
+#
+# Frame layout (all multi-byte fields little-endian):
+#   A5 5A | type u8 | len u8 | payload[len] | crc16 u16
+# The CRC is CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) over type, len and payload,
+# i.e. binascii.crc_hqx(frame[2:-2], 0xFFFF).
+#
+# Payloads:
+#   RFID / NFC      proto_len u8 | protocol ASCII | uid bytes (rest of payload)
+#   BTClassic / BLE mac[6] | rssi i8 | name UTF-8 (rest of payload)
+#   STATUS / ERROR  UTF-8 text
+#
+# A BLE sighting is ~12-30 bytes on the wire instead of ~70-100 as JSON.
+
+import struct
+from binascii import crc_hqx
+
+MAGIC = b"\xA5\x5A"
+HEADER_LEN = 4 # magic + type + len
+CRC_LEN = 2
+MAX_PAYLOAD = 255
+
+TYPE_RFID = 0x01
+TYPE_NFC = 0x02
+TYPE_BTCLASSIC = 0x03
+TYPE_BLE = 0x04
+TYPE_STATUS = 0x10
+TYPE_ERROR = 0x11
+
+TAG_TYPES = {TYPE_RFID: 'RFID', TYPE_NFC: 'NFC'}
+RADIO_TYPES = {TYPE_BTCLASSIC: 'BTClassic', TYPE_BLE: 'BLE'}
+TYPE_CODES = {name: code for code, name in {**TAG_TYPES, **RADIO_TYPES}.items()}
+
+_CRC = struct.Struct('<H')
+_RADIO = struct.Struct('<6sb')
+
+# --- Encoding (reference for the firmware and for test stand-ins) ---
+def encode_record(data):
+    """Encodes a scan/status dict (same keys as the JSON messages) into one binary frame."""
+    if 'status' in data:
+        typ, payload = TYPE_STATUS, str(data['status']).encode('utf-8')
+    elif 'error' in data:
+        typ, payload = TYPE_ERROR, str(data['error']).encode('utf-8')
+    else:
+        typ = TYPE_CODES[data['type']]
+        if typ in TAG_TYPES:
+            proto = (data.get('protocol') or '').encode('ascii')
+            payload = bytes([len(proto)]) + proto + bytes.fromhex(data['uid'])
+        else:
+            mac = bytes.fromhex(data['mac'].replace(':', ''))
+            payload = _RADIO.pack(mac, data.get('rssi') or 0) + (data.get('name') or '').encode('utf-8')
+    payload = payload[:MAX_PAYLOAD]
+    body = bytes([typ, len(payload)]) + payload
+    return MAGIC + body + _CRC.pack(crc_hqx(body, 0xFFFF))
+
+# --- Decoding ---
+def decode_payload(typ, payload):
+    """Turns a CRC-checked payload into the same dict shape the JSON messages use.
+
+    Returns None for an unknown type or a payload too short for its type.
+    """
+    if typ in RADIO_TYPES:
+        if len(payload) < _RADIO.size:
+            return None
+        mac, rssi = _RADIO.unpack_from(payload)
+        data = {'type': RADIO_TYPES[typ], 'mac': mac.hex(':'), 'rssi': rssi}
+        name = bytes(payload[_RADIO.size:])
+        if name:
+            data['name'] = name.decode('utf-8', 'replace')
+        return data
+    if typ in TAG_TYPES:
+        if not payload or len(payload) < 1 + payload[0]:
+            return None
+        proto_len = payload[0]
+        uid = bytes(payload[1 + proto_len:])
+        data = {'type': TAG_TYPES[typ], 'uid': uid.hex().upper(), 'uid_len': len(uid)}
+        if proto_len:
+            data['protocol'] = bytes(payload[1:1 + proto_len]).decode('ascii', 'replace')
+        return data
+    if typ == TYPE_STATUS:
+        return {'status': bytes(payload).decode('utf-8', 'replace')}
+    if typ == TYPE_ERROR:
+        return {'error': bytes(payload).decode('utf-8', 'replace')}
+    return None
+
+class FrameDecoder:
+    """Splits the UART byte stream into binary records and JSON text lines.
+
+    feed() returns a list whose items are either dicts (decoded binary frames)
+    or bytes (complete text lines, line ending stripped). Both kinds can be
+    mixed on the link, so the firmware can switch formats at any time and the
+    first frame or JSON object line seen decides what `mode` reports.
+
+    Once that is 'json', a magic only starts a frame at a message boundary,
+    so text that happens to contain A5 5A stays part of its line. Once it is
+    'binary', only lines starting with '{' are passed on; other bytes between
+    frames (e.g. a frame whose magic was hit by noise) are dropped. After a
+    frame with a bad CRC everything up to the next frame start is dropped:
+    the next magic, or in json mode the next magic or line starting with
+    '{', whichever comes first. Dropped bytes are counted in `discarded`.
+    """
+
+    def __init__(self, max_line=4096):
+        self.max_line = max_line
+        self.buffer = bytearray()
+        self.mode = None # 'binary' or 'json', from the first message decoded
+        self.frames = 0
+        self.lines = 0
+        self.crc_errors = 0
+        self.unknown_types = 0
+        self.bad_frames = 0 # Good CRC, but a payload too short for its type
+        self.discarded = 0
+        self.resync = False # Dropping bytes after a bad frame
+
+    def _detect(self, mode):
+        if self.mode is None:
+            self.mode = mode
+            print(f"Wire format detected: {mode}")
+
+    def feed(self, chunk):
+        buf = self.buffer
+        buf += chunk
+        out = []
+        pos = 0
+        n = len(buf)
+        text_only = self.mode == 'json' # Magic only counts where pos already is: a message boundary
+        next_magic = -1 if text_only else buf.find(MAGIC)
+        next_nl = buf.find(b'\n')
+        with memoryview(buf) as view:
+            while pos < n:
+                if 0 <= next_magic < pos:
+                    next_magic = buf.find(MAGIC, pos)
+                if 0 <= next_nl < pos:
+                    next_nl = buf.find(b'\n', pos)
+
+                if self.resync:
+                    resume = next_magic
+                    if text_only:
+                        # Whichever comes first: a frame or a JSON line (the bad frame may hold a bare newline)
+                        line = buf.find(b'\n{', pos)
+                        starts = [i for i in (line + 1 if line >= 0 else -1, buf.find(MAGIC, pos)) if i >= 0]
+                        resume = min(starts) if starts else -1
+                    if resume < 0:
+                        # Keep a trailing A5 or newline in case it starts the next magic or line
+                        keep = 1 if buf[-1] in (MAGIC[0], 0x0A) else 0
+                        self.discarded += n - keep - pos
+                        pos = n - keep
+                        break
+                    self.discarded += resume - pos
+                    pos = resume
+                    self.resync = False
+                elif buf.startswith(MAGIC, pos):
+                    if n - pos < HEADER_LEN + CRC_LEN:
+                        break
+                    end = pos + HEADER_LEN + buf[pos + 3] + CRC_LEN
+                    if end > n:
+                        break # Frame not complete yet
+                    (crc,) = _CRC.unpack_from(buf, end - CRC_LEN)
+                    if crc_hqx(view[pos + 2:end - CRC_LEN], 0xFFFF) != crc:
+                        self.crc_errors += 1
+                        self.discarded += 1
+                        self.resync = True
+                        pos += 1 # Its length byte can't be trusted: look for the next start from here
+                        continue
+                    typ = buf[pos + 2]
+                    data = decode_payload(typ, view[pos + HEADER_LEN:end - CRC_LEN])
+                    if data is not None:
+                        self.frames += 1
+                        self._detect('binary')
+                        out.append(data)
+                    elif typ in TAG_TYPES or typ in RADIO_TYPES:
+                        self.bad_frames += 1
+                    else:
+                        self.unknown_types += 1
+                    pos = end
+                elif next_nl >= 0 and (next_magic < 0 or next_nl < next_magic):
+                    line = bytes(view[pos:next_nl]).rstrip(b'\r')
+                    if not line.strip():
+                        pass
+                    elif text_only or self.mode is None or line.lstrip().startswith(b'{'):
+                        self.lines += 1
+                        if line.lstrip().startswith(b'{'): # Boot chatter before the first message can't decide the mode
+                            self._detect('json')
+                            if self.mode == 'json':
+                                text_only, next_magic = True, -1
+                        out.append(line)
+                    else:
+                        # Not a JSON object on a binary link: e.g. a frame whose magic was hit by noise
+                        self.discarded += next_nl + 1 - pos
+                    pos = next_nl + 1
+                elif next_magic >= 0:
+                    # Unterminated bytes in front of a frame: line noise, not a message
+                    self.discarded += next_magic - pos
+                    pos = next_magic
+                else:
+                    break # Partial text line, wait for more
+        del buf[:pos]
+        if len(buf) > self.max_line and buf.find(MAGIC) != 0:
+            # Runaway partial line; keep the last byte in case it starts a magic
+            self.discarded += len(buf) - 1
+            del buf[:-1]
+        return out
@@ -0,0 +1,724 @@
+#!/usr/bin/env python3
+
+# hw_sim.py
+# Hardware stand-ins so the scanners run (and can be measured) without the ESP32, nRF24 or CC1101:
+#   FakeSerial  serial.Serial on the slave end of a pty whose master plays the ESP32 (Esp32Link)
+#   FakeRF24    pyrf24.RF24 with the chip's 3-deep RX FIFO; packets arriving while it is full are lost
+#   FakeSpiDev  spidev.SpiDev in front of a CC1101 register/FIFO model: 64-byte RX FIFO filled at the
+#               configured data rate, RXBYTES overflow flag, strobes, status registers
+# Traffic is synthetic (Poisson arrivals at --rate) or replayed from recordings (the scans table of
+# proxnet_log.db, nrf24_sniffer.py capture files, cc1101_sniffer.py PCAP-NG segments), with the
+# schedule compressed by --speed (e.g. 100 = a recorded hour in 36 s). Only the schedule is sped up:
+# FIFO depths and the CC1101 byte clock stay physical, and frames that would overlap on the
+# CC1101's air are lost. With --stamp every message carries its sequence number and the time it
+# became available to the host (see STAMP), which scanner_bench.py uses for latency.
+#
+# The runner installs the fake in place of the real module and runs the unmodified scanner:
+#   python3 hw_sim.py nrf24 --rate 500 --speed 10 -- --bus
+#   python3 hw_sim.py cc1101 --replay ~/proxnet/logs/cc1101_capture_*.pcapng --speed 100 -- --pcapng
+#   python3 hw_sim.py esp32 --rate 200 --wire binary -- --raw
+#   python3 hw_sim.py esp32 --pty          # just the pty; point esp32_logger.py --port at it
+
+import os
+import pty
+import sys
+import tty
+import json
+import time
+import types
+import atexit
+import random
+import runpy
+import sqlite3
+import struct
+import argparse
+import threading
+from enum import IntEnum
+from pathlib import Path
+
+import cc1101_sniffer as cc
+from esp32_wire import encode_record
+from pcapng_writer import read_pcapng, LINKTYPE_CC1101, CC1101_HEADER
+
+# --- Configuration ---
+SCRIPT_DIR = Path(__file__).resolve().parent
+SCANNERS = {'esp32': 'esp32_logger.py', 'nrf24': 'nrf24_sniffer.py', 'cc1101': 'cc1101_sniffer.py'}
+DEFAULT_RATE = 100.0    # Synthetic messages per second (before --speed)
+DEFAULT_COUNT = 10000
+PTY_START_DELAY = 3.0   # --pty: seconds before traffic starts (esp32_logger.py waits 2 s for the boot message)
+ESP32_DEVICES = 200     # Distinct synthetic BT/BLE devices
+NRF24_FIFO_DEPTH = 3
+NRF24_PAYLOAD = 32
+NRF24_CHANNEL = 76      # nrf24_sniffer.RF_CHANNEL (not imported: that would load the real pyrf24)
+CC1101_FIFO_SIZE = 64
+CC1101_NOISE_DBM = -100.0 # RSSI reported while nothing is on the air
+CC1101_CRC_OK = 0x80      # Set in the appended LQI byte
+
+# Carried at the start of every payload (nRF24/CC1101) or as the uid/name hex (ESP32) with --stamp:
+# sequence number and the wall-clock microsecond the message became available to the host.
+STAMP = struct.Struct('<Iq')
+
+# --- Traffic ---
+def poisson_times(rate, count, seed=None, min_gap=0.0):
+    """`count` arrival times (seconds from 0) averaging `rate` per second: Poisson, but at least `min_gap` apart."""
+    rng = random.Random(seed)
+    mean_gap = max(1 / rate - min_gap, 1e-9)
+    t = 0.0
+    for _ in range(count):
+        yield t
+        t += min_gap + rng.expovariate(1 / mean_gap)
+
+def synthetic_esp32(rate, count, seed=None):
+    """Yields (t, message dict): mostly BLE sightings from a fixed device population, some BT/tag reads."""
+    rng = random.Random(seed)
+    devices = [(rng.randbytes(6).hex(':'), f"dev-{i}") for i in range(ESP32_DEVICES)]
+    for t in poisson_times(rate, count, seed):
+        roll = rng.random()
+        if roll < 0.05:
+            uid = rng.randbytes(rng.choice((4, 7)))
+            yield t, {'type': rng.choice(('RFID', 'NFC')), 'protocol': 'ISO14443A', 'uid': uid.hex().upper(),
+                      'uid_len': len(uid)}
+        else:
+            mac, name = rng.choice(devices)
+            yield t, {'type': 'BTClassic' if roll < 0.15 else 'BLE', 'mac': mac, 'name': name,
+                      'rssi': rng.randint(-95, -35)}
+
+def synthetic_nrf24(rate, count, channels=(NRF24_CHANNEL,), seed=None):
+    """Yields (t, channel, pipe, payload) with random 32-byte payloads spread over `channels`."""
+    rng = random.Random(seed)
+    for t in poisson_times(rate, count, seed):
+        yield t, rng.choice(channels), 1, rng.randbytes(NRF24_PAYLOAD)
+
+def synthetic_cc1101(rate, count, frequencies=(cc.FREQ_MHZ,), seed=None):
+    """Yields (t, mhz, payload, rssi_dbm, lqi); payloads are fitted to PKTLEN when they go on the air.
+
+    Frames are spaced at least one air time apart (at the sniffer's default
+    config), so at --speed 1 none are lost to overlaps.
+    """
+    rng = random.Random(seed)
+    air_time = (cc.PACKET_LEN + 2) * 8 / cc.data_rate()
+    for t in poisson_times(rate, count, seed, min_gap=air_time):
+        yield t, rng.choice(frequencies), rng.randbytes(cc.PACKET_LEN), rng.uniform(-70, -30), rng.randint(0, 40)
+
+def replay_esp32(db_files):
+    """Yields (t, message dict) from the scans table of one or more proxnet_log.db files (one message per row)."""
+    first = None
+    for db_file in db_files:
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+        try:
+            rows = conn.execute("SELECT ts_us, module_type, protocol, uid, mac, name, rssi FROM scans ORDER BY ts_us, id")
+            for ts_us, module_type, protocol, uid, mac, name, rssi in rows:
+                first = ts_us if first is None else first
+                data = {'type': module_type, 'protocol': protocol, 'uid': uid, 'mac': mac, 'name': name, 'rssi': rssi}
+                if uid:
+                    data['uid_len'] = len(uid) // 2
+                yield (ts_us - first) / 1e6, {k: v for k, v in data.items() if v is not None}
+        finally:
+            conn.close()
+
+def replay_nrf24(paths):
+    """Yields (t, channel, pipe, payload) from nrf24_sniffer.py binary capture files, in order."""
+    from nrf24_sniffer import read_capture # Deferred: importing the sniffer loads pyrf24 (real or fake)
+    first = None
+    for path in paths:
+        for ts_ns, channel, pipe, payload in read_capture(path):
+            first = ts_ns if first is None else first
+            yield (ts_ns - first) / 1e9, channel, pipe, payload
+
+def replay_cc1101(paths):
+    """Yields (t, mhz, payload, rssi_dbm, lqi) from cc1101_sniffer.py PCAP-NG segments, in order."""
+    first = None
+    for path in paths:
+        for interface, ts_ns, data, _ in read_pcapng(path):
+            if interface['linktype'] != LINKTYPE_CC1101:
+                continue
+            # Interface names are cc1101-<MHz>MHz (see PacketOutput.emit)
+            mhz = float(interface['name'].removeprefix('cc1101-').removesuffix('MHz'))
+            rssi, lqi = CC1101_HEADER.unpack_from(data)
+            first = ts_ns if first is None else first
+            yield (ts_ns - first) / 1e9, mhz, data[CC1101_HEADER.size:], rssi, lqi
+
+# --- Stamps ---
+def stamp_payload(payload, seq, ts_us):
+    """Overwrites the start of `payload` with a STAMP (zero padded if the payload is shorter)."""
+    stamp = STAMP.pack(seq, ts_us)
+    return stamp + bytes(payload[len(stamp):])
+
+def stamp_message(data, seq, ts_us):
+    """Copy of an ESP32 message carrying a STAMP: as the uid of tag reads, as the name of BT/BLE sightings."""
+    stamp = STAMP.pack(seq, ts_us).hex()
+    data = dict(data)
+    if data.get('type') in ('RFID', 'NFC'):
+        data['uid'], data['uid_len'] = stamp.upper(), STAMP.size
+    else:
+        data['name'] = stamp
+    return data
+
+def read_stamp(value):
+    """(seq, ts_us) from a stamped payload (bytes) or uid/name (hex text); None if there is no stamp."""
+    try:
+        data = bytes.fromhex(value) if isinstance(value, str) else bytes(value)
+        return STAMP.unpack_from(data) if len(data) >= STAMP.size else None
+    except (ValueError, TypeError):
+        return None
+
+# --- Schedule ---
+class Schedule:
+    """Traffic times (seconds from the first message) mapped onto time.monotonic(), `speed` times faster.
+
+    Nothing is due until start() is called, which each fake does when the
+    scanner starts listening, so setup time doesn't turn into missed traffic.
+    """
+
+    def __init__(self, traffic, speed=1.0):
+        self.items = iter(traffic)
+        self.speed = speed
+        self.started = None
+        self.pending = None
+        self.wall_offset = time.time() - time.monotonic()
+        self.first_us = None # Wall clock of the first and last message taken
+        self.last_us = None
+
+    def start(self):
+        if self.started is None:
+            self.started = time.monotonic()
+
+    def peek(self):
+        """(monotonic due time, fields) of the next message; None before start() or once the traffic runs out."""
+        if self.started is None:
+            return None
+        if self.pending is None:
+            try:
+                t, *fields = next(self.items)
+            except StopIteration:
+                return None
+            self.pending = (self.started + t / self.speed, fields)
+        return self.pending
+
+    def pop(self):
+        due, fields = self.pending
+        self.pending = None
+        self.last_us = self.wall_us(due)
+        if self.first_us is None:
+            self.first_us = self.last_us
+        return due, fields
+
+    def due(self, now):
+        """Yields every message due by `now`, in order."""
+        while True:
+            pending = self.peek()
+            if pending is None or pending[0] > now:
+                return
+            yield self.pop()
+
+    @property
+    def done(self):
+        return self.started is not None and self.peek() is None
+
+    def wall_us(self, mono):
+        return int((mono + self.wall_offset) * 1e6)
+
+class SimStats(dict):
+    """Counters one fake keeps; written as JSON by the runner (--stats-file) when the scanner exits."""
+
+    def __init__(self, device, schedule, **counters):
+        super().__init__(device=device, offered=0, delivered=0, **counters)
+        self.schedule = schedule
+
+    def snapshot(self):
+        return {**self, 'first_us': self.schedule.first_us, 'last_us': self.schedule.last_us,
+                'exhausted': self.schedule.done}
+
+# --- ESP32 UART ---
+class Esp32Link:
+    """The ESP32 end of the UART: a raw-mode pty whose master side is written from a Schedule by a thread.
+
+    Messages due together are written in one burst, like a continuous UART
+    stream. The pty only holds a few KB; when the host stops reading, the
+    write comes up short and the messages that didn't fit are counted as
+    overruns, as a real UART would drop them. With `baud`, messages also
+    queue behind each other at that line rate (10 bits per byte).
+    """
+
+    def __init__(self, schedule, wire='json', baud=None, stamp=False):
+        self.schedule = schedule
+        self.wire = wire
+        self.baud = baud
+        self.stamp = stamp
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave) # No echo or newline translation; pyserial sets the same when it opens the port
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(self.slave)
+        self.stats = SimStats('esp32', schedule, overruns=0, overrun_bytes=0, bytes=0)
+        self.thread = threading.Thread(target=self._run, name="esp32-link", daemon=True)
+
+    def start(self):
+        if self.schedule.started is None:
+            self.schedule.start()
+            self.thread.start()
+
+    def _encode(self, data, seq, ts_us):
+        if self.stamp:
+            data = stamp_message(data, seq, ts_us)
+        if self.wire == 'binary':
+            return encode_record(data)
+        return json.dumps(data, separators=(',', ':')).encode() + b"\n"
+
+    def _run(self):
+        link_free = 0.0
+        while True:
+            pending = self.schedule.peek()
+            if pending is None:
+                return
+            due = max(pending[0], link_free) if self.baud else pending[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            now = time.monotonic()
+            ts_us = self.schedule.wall_us(now)
+            # Paced: one message per line slot; unpaced: everything due goes out in one burst
+            batch = [self.schedule.pop()] if self.baud else list(self.schedule.due(now))
+            frames = []
+            for _, (data,) in batch:
+                frames.append(self._encode(data, self.stats['offered'], ts_us))
+                self.stats['offered'] += 1
+            burst = b"".join(frames)
+            if self.baud:
+                link_free = due + len(burst) * 10 / self.baud
+            try:
+                written = os.write(self.master, burst)
+            except BlockingIOError:
+                written = 0
+            self.stats['bytes'] += written
+            end = 0
+            for frame in frames:
+                end += len(frame)
+                if end <= written:
+                    self.stats['delivered'] += 1
+                else:
+                    self.stats['overruns'] += 1
+            self.stats['overrun_bytes'] += len(burst) - written
+
+    def close(self):
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+class FakeSerial:
+    """serial.Serial stand-in for esp32_logger.py: real pyserial on the slave end of an Esp32Link pty.
+
+    Traffic starts at the first reset_input_buffer(), i.e. once the logger
+    has waited for the ESP32 to boot.
+    """
+
+    link = None         # Set by install_serial()
+    serial_class = None # The real serial.Serial
+
+    def __init__(self, port=None, baudrate=9600, timeout=None, **kwargs):
+        self._serial = self.serial_class(self.link.port, baudrate, timeout=timeout, **kwargs)
+
+    def reset_input_buffer(self):
+        self._serial.reset_input_buffer()
+        self.link.start()
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__['_serial'], name)
+
+# --- nRF24L01+ ---
+class rf24_datarate(IntEnum):
+    RF24_1MBPS = 0
+    RF24_2MBPS = 1
+    RF24_250KBPS = 2
+
+class rf24_pa_dbm(IntEnum):
+    RF24_PA_MIN = 0
+    RF24_PA_LOW = 1
+    RF24_PA_HIGH = 2
+    RF24_PA_MAX = 3
+
+class FakeRF24:
+    """The parts of pyrf24.RF24 the sniffer uses, over a 3-deep RX FIFO fed from a Schedule.
+
+    The FIFO is brought up to date whenever the sniffer looks at it, so no
+    thread is involved: packets due by then land in the FIFO if the radio
+    is listening on their channel, and are lost (fifo_overflows) if it
+    already holds three. Air time and data rate are not modelled.
+    """
+
+    def __init__(self, ce_pin=None, csn_pin=None, schedule=None, stamp=False):
+        self.schedule = schedule
+        self.stamp = stamp
+        self.channel = NRF24_CHANNEL
+        self.data_rate = rf24_datarate.RF24_1MBPS
+        self.payload_size = NRF24_PAYLOAD
+        self.listening = False
+        self.fifo = []
+        self.rpd = False
+        self.stats = SimStats('nrf24', schedule, fifo_overflows=0, off_channel=0)
+
+    def _advance(self):
+        for due, (channel, pipe, payload) in self.schedule.due(time.monotonic()):
+            seq = self.stats['offered']
+            self.stats['offered'] += 1
+            if not self.listening or channel != self.channel:
+                self.stats['off_channel'] += 1
+                continue
+            self.rpd = True
+            if len(self.fifo) >= NRF24_FIFO_DEPTH:
+                self.stats['fifo_overflows'] += 1
+                continue
+            if self.stamp:
+                payload = stamp_payload(payload, seq, self.schedule.wall_us(due))
+            self.fifo.append((pipe, payload))
+
+    def begin(self):
+        return True
+
+    def isPVariant(self):
+        return True
+
+    def setPALevel(self, level):
+        pass
+
+    def setDataRate(self, rate):
+        self.data_rate = rate
+        return True
+
+    def setChannel(self, channel):
+        self._advance() # Packets due before the hop belong to the old channel
+        self.channel = channel
+
+    def setAutoAck(self, enable):
+        pass
+
+    def disableCRC(self):
+        pass
+
+    def setPayloadSize(self, size):
+        self.payload_size = size
+
+    def openReadingPipe(self, pipe, address):
+        pass
+
+    def maskIRQ(self, tx_ok, tx_fail, rx_ready):
+        pass
+
+    def startListening(self):
+        self.listening = True
+        self.schedule.start()
+
+    def stopListening(self):
+        self.listening = False # Traffic after this (e.g. during shutdown) isn't counted at all
+
+    def powerDown(self):
+        self.stopListening()
+
+    def available(self):
+        self._advance()
+        return bool(self.fifo)
+
+    def available_pipe(self):
+        self._advance()
+        return (True, self.fifo[0][0]) if self.fifo else (False, None)
+
+    def rxFifoFull(self):
+        self._advance()
+        return len(self.fifo) >= NRF24_FIFO_DEPTH
+
+    def testRPD(self):
+        self._advance()
+        rpd, self.rpd = self.rpd, False
+        return rpd
+
+    def whatHappened(self):
+        self._advance()
+        return False, False, bool(self.fifo)
+
+    def read(self, length=None):
+        self._advance()
+        if not self.fifo:
+            return bytes(length or self.payload_size)
+        _, payload = self.fifo.pop(0)
+        self.stats['delivered'] += 1
+        length = length or self.payload_size
+        return bytes(payload[:length]).ljust(length, b"\0")
+
+# --- CC1101 ---
+class FakeSpiDev:
+    """spidev.SpiDev talking to a CC1101 model: registers, strobes, status registers and the RX FIFO.
+
+    In RX, a frame on the tuned frequency (FREQ2..0) streams into the 64-byte
+    FIFO one byte per 8 / data rate seconds: PKTLEN payload bytes, then RSSI
+    and LQI when PKTCTRL1 appends status. Reading the FIFO too slowly sets
+    the RXBYTES overflow bit and the rest of the frame is lost until SFRX.
+    A frame that starts while another is still on the air is lost (air_lost),
+    as is one that arrives while the radio is idle or tuned elsewhere.
+    Like FakeRF24 the model catches up on every transfer instead of running
+    a thread.
+    """
+
+    def __init__(self, schedule=None, stamp=False):
+        self.schedule = schedule
+        self.stamp = stamp
+        self.max_speed_hz = 0
+        self.mode = 0
+        self.stats = SimStats('cc1101', schedule, fifo_overflows=0, lost_bytes=0, air_lost=0, off_channel=0,
+                              aborted=0)
+        self._reset()
+
+    def _reset(self):
+        self.regs = bytearray(cc.RESET_IMAGE)
+        self.state = cc.MARCSTATE_IDLE
+        self.fifo = bytearray()
+        self.overflow = False
+        self.frame = None    # Frame on the air: [bytes, start, byte time, bytes clocked in, received, rssi]
+        self.air_until = 0.0 # When the last frame on the air ends
+
+    # spidev API
+    def open(self, bus, device):
+        pass
+
+    def close(self):
+        pass
+
+    def xfer2(self, data):
+        self._advance(time.monotonic())
+        header, count = data[0], len(data) - 1
+        address = header & 0x3F
+        read, burst = header & cc.READ_SINGLE, header & cc.WRITE_BURST
+        status = self._status_byte()
+        if 0x30 <= address <= 0x3D and not burst:
+            self._strobe(address)
+            return [self._status_byte()] * len(data)
+        if 0x30 <= address <= 0x3D:
+            return [status, self._status_register(address)] + [0] * (count - 1)
+        if address == cc.REG_RXFIFO:
+            if not read:
+                return [status] * len(data) # TX FIFO: nothing is transmitted
+            chunk = bytes(self.fifo[:count]).ljust(count, b"\0")
+            del self.fifo[:count]
+            return [status] + list(chunk)
+        if address == cc.REG_PATABLE:
+            return [status] * len(data)
+        values = data[1:] if burst or count == 1 else data[1:2]
+        if read:
+            return [status] + [self.regs[address + i] if address + i < len(self.regs) else 0 for i in range(count)]
+        for i, value in enumerate(values):
+            if address + i < len(self.regs):
+                self.regs[address + i] = value & 0xFF
+        return [status] * len(data)
+
+    # Model
+    def _status_byte(self):
+        state = {cc.MARCSTATE_IDLE: 0, 0x0D: 1, 0x11: 6}.get(self.state, 0)
+        return (state << 4) | min(len(self.fifo), 15)
+
+    def _status_register(self, address):
+        if address == cc.STATUS_RXBYTES:
+            return min(len(self.fifo), cc.RXBYTES_COUNT) | (cc.RXBYTES_OVERFLOW if self.overflow else 0)
+        if address == cc.STATUS_MARCSTATE:
+            return self.state
+        if address == cc.STATUS_RSSI:
+            receiving = self.frame is not None and self.frame[4]
+            return rssi_raw(self.frame[5] if receiving else CC1101_NOISE_DBM)
+        return 0
+
+    def _strobe(self, strobe):
+        if strobe == cc.SRES:
+            self._reset()
+        elif strobe == cc.SIDLE:
+            self._abort()
+            if not self.overflow:
+                self.state = cc.MARCSTATE_IDLE
+        elif strobe == cc.SFRX:
+            self.fifo.clear()
+            self.overflow = False
+            self.state = cc.MARCSTATE_IDLE
+        elif strobe == cc.SRX and not self.overflow:
+            self.state = 0x0D
+            self.schedule.start()
+        # SCAL completes instantly; MARCSTATE already reads IDLE
+
+    def _abort(self):
+        if self.frame is not None and self.frame[4]:
+            self.stats['aborted'] += 1
+            self.frame[4] = False
+
+    def _tuned(self, mhz):
+        return bytes(self.regs[cc.REG_FREQ2:cc.REG_FREQ0 + 1]) == cc.freq_bytes(mhz)
+
+    def _frame_bytes(self, seq, due, payload, rssi, lqi, byte_time):
+        length = self.regs[cc.REG_PKTLEN]
+        append = self.regs[cc.REG_PKTCTRL1] & 0x04
+        total = length + (2 if append else 0)
+        if self.stamp:
+            # Stamped with the time the last byte reaches the FIFO
+            payload = stamp_payload(payload, seq, self.schedule.wall_us(due + total * byte_time))
+        frame = bytes(payload[:length]).ljust(length, b"\0")
+        if append:
+            frame += bytes([rssi_raw(rssi), (lqi & 0x7F) | CC1101_CRC_OK])
+        return frame
+
+    def _clock_in(self, until):
+        """Moves the bytes of the frame on the air that arrived by `until` into the FIFO."""
+        frame = self.frame
+        if frame is None:
+            return
+        data, start, byte_time, clocked, receiving, _ = frame
+        arrived = min(len(data), int((until - start) / byte_time))
+        if receiving and arrived > clocked:
+            new = data[clocked:arrived]
+            room = CC1101_FIFO_SIZE - len(self.fifo)
+            if len(new) > room:
+                self.fifo += new[:room]
+                self.overflow = True
+                self.state = 0x11 # RXFIFO_OVERFLOW
+                self.stats['fifo_overflows'] += 1
+                self.stats['lost_bytes'] += len(data) - clocked - room
+                frame[4] = False
+            else:
+                self.fifo += new
+                if arrived == len(data):
+                    self.stats['delivered'] += 1
+        frame[3] = arrived
+        if arrived == len(data):
+            self.frame = None
+
+    def _advance(self, now):
+        while True:
+            pending = self.schedule.peek()
+            if pending is None or pending[0] > now:
+                break
+            self._clock_in(pending[0])
+            due, (mhz, payload, rssi, lqi) = self.schedule.pop()
+            seq = self.stats['offered']
+            self.stats['offered'] += 1
+            if due < self.air_until:
+                self.stats['air_lost'] += 1
+                continue
+            byte_time = 8 / cc.data_rate(list(enumerate(self.regs)))
+            data = self._frame_bytes(seq, due, payload, rssi, lqi, byte_time)
+            self.air_until = due + len(data) * byte_time
+            receiving = self.state == 0x0D and self._tuned(mhz)
+            if not receiving:
+                self.stats['off_channel'] += 1
+            self.frame = [data, due, byte_time, 0, receiving, rssi]
+        self._clock_in(now)
+
+def rssi_raw(dbm):
+    """Inverse of cc1101_sniffer.rssi_dbm: the RSSI status byte for a level in dBm."""
+    return max(-128, min(127, round((dbm + 74) * 2))) & 0xFF
+
+# --- Installing the Fakes ---
+def install_serial(link):
+    """Makes serial.Serial open `link`'s pty instead of the named port."""
+    import serial
+    if serial.Serial is not FakeSerial:
+        FakeSerial.serial_class = serial.Serial
+    FakeSerial.link = link
+    serial.Serial = FakeSerial
+
+def install_rf24(schedule, stamp=False):
+    """Registers a `pyrf24` module whose RF24 is a FakeRF24 on `schedule`; returns the module."""
+    module = types.ModuleType('pyrf24')
+    module.radios = []
+    def RF24(ce_pin=None, csn_pin=None, *args):
+        radio = FakeRF24(ce_pin, csn_pin, schedule=schedule, stamp=stamp)
+        module.radios.append(radio)
+        return radio
+    module.RF24 = RF24
+    module.rf24_datarate, module.rf24_pa_dbm = rf24_datarate, rf24_pa_dbm
+    for enum in (rf24_datarate, rf24_pa_dbm):
+        for member in enum:
+            setattr(module, member.name, member)
+    sys.modules['pyrf24'] = module
+    return module
+
+def install_spidev(schedule, stamp=False):
+    """Registers a `spidev` module whose SpiDev is a FakeSpiDev on `schedule`; returns the module."""
+    module = types.ModuleType('spidev')
+    module.devices = []
+    def SpiDev(*args):
+        device = FakeSpiDev(schedule=schedule, stamp=stamp)
+        module.devices.append(device)
+        return device
+    module.SpiDev = SpiDev
+    sys.modules['spidev'] = module
+    return module
+
+# --- Runner ---
+def build_traffic(scanner, args):
+    if args.replay:
+        return {'esp32': replay_esp32, 'nrf24': replay_nrf24, 'cc1101': replay_cc1101}[scanner](args.replay)
+    if scanner == 'esp32':
+        return synthetic_esp32(args.rate, args.count, args.seed)
+    if scanner == 'nrf24':
+        return synthetic_nrf24(args.rate, args.count, args.channels or [NRF24_CHANNEL], args.seed)
+    return synthetic_cc1101(args.rate, args.count, args.freqs or [cc.FREQ_MHZ], args.seed)
+
+def write_stats(path, devices):
+    stats = [device.stats.snapshot() for device in devices]
+    if path:
+        tmp = Path(f"{path}.tmp")
+        tmp.write_text(json.dumps(stats))
+        os.replace(tmp, path)
+    for entry in stats:
+        print(f"SIM: {json.dumps(entry)}", file=sys.stderr)
+
+def run(scanner, args, scanner_args):
+    """Installs the stand-in for `scanner` and runs the real script as __main__ with `scanner_args`."""
+    schedule = Schedule(build_traffic(scanner, args), args.speed)
+    if scanner == 'esp32':
+        link = Esp32Link(schedule, args.wire, args.baud, args.stamp)
+        if args.pty:
+            print(f"ESP32 stand-in on {link.port}; traffic starts in {PTY_START_DELAY:g}s", flush=True)
+            time.sleep(PTY_START_DELAY)
+            link.start()
+            try:
+                link.thread.join()
+            except KeyboardInterrupt:
+                pass
+            write_stats(args.stats_file, [link])
+            return
+        install_serial(link)
+        devices = lambda: [link]
+        scanner_args = ['--port', link.port] + scanner_args
+    elif scanner == 'nrf24':
+        module = install_rf24(schedule, args.stamp)
+        devices = lambda: module.radios
+    else:
+        module = install_spidev(schedule, args.stamp)
+        devices = lambda: module.devices
+    atexit.register(lambda: write_stats(args.stats_file, devices()))
+    script = SCRIPT_DIR / SCANNERS[scanner]
+    sys.argv = [str(script)] + scanner_args
+    runpy.run_path(str(script), run_name='__main__')
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    scanner_args = []
+    if '--' in argv:
+        split = argv.index('--')
+        argv, scanner_args = argv[:split], argv[split + 1:]
+    parser = argparse.ArgumentParser(description="Run a ProxNet scanner against simulated hardware",
+                                     epilog="Arguments after -- are passed to the scanner script.")
+    parser.add_argument("scanner", choices=SCANNERS)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help=f"Synthetic messages/s (default {DEFAULT_RATE:g})")
+    parser.add_argument("--count", type=int, default=DEFAULT_COUNT, help=f"Synthetic messages (default {DEFAULT_COUNT})")
+    parser.add_argument("--speed", type=float, default=1.0, help="Schedule speed-up, e.g. 100 replays an hour in 36 s")
+    parser.add_argument("--replay", type=Path, nargs='+', help="Recorded traffic: proxnet_log.db (esp32), "
+                                                                "capture .bin files (nrf24) or .pcapng segments (cc1101)")
+    parser.add_argument("--seed", type=int, help="Random seed for synthetic traffic")
+    parser.add_argument("--stamp", action="store_true", help="Stamp messages with a sequence number and availability time")
+    parser.add_argument("--stats-file", type=Path, help="Write the stand-in's counters here as JSON on exit")
+    parser.add_argument("--wire", choices=('json', 'binary'), default='json', help="esp32: UART message format")
+    parser.add_argument("--baud", type=int, help="esp32: pace the UART at this line rate (default: as fast as scheduled)")
+    parser.add_argument("--pty", action="store_true", help="esp32: only run the pty stand-in and print its path")
+    parser.add_argument("--channels", type=lambda v: [int(c) for c in v.split(',')], help="nrf24: synthetic channels")
+    parser.add_argument("--freqs", type=lambda v: [float(f) for f in v.split(',')], help="cc1101: synthetic frequencies (MHz)")
+    args = parser.parse_args(argv)
+    if args.speed <= 0 or args.rate <= 0:
+        parser.error("--speed and --rate must be positive")
+    run(args.scanner, args, scanner_args)
@@ -1,40 +1,87 @@
 #!/usr/bin/env python3
 
 # nrf24_sniffer.py
-# Listens for packets on a specified nRF24L01+ channel and prints them.
-# Final version with specific error handling.
+# Listens for packets on a specified nRF24L01+ channel and logs them.
+# Version 2: drains the RX FIFO on every wake (IRQ pin when wired), timestamps packets
+# into a preallocated ring and writes them as a compact binary record stream.
+# --sweep hops across channels/data rates, dwelling longer where there is activity.
+# --pcapng streams PCAP-NG instead (one interface per channel) for Wireshark/tshark.
+# --bus also publishes every packet to proxnet_bus.py (stored in the packets table).
+# Radio, ring and writer metrics are snapshotted for web_ui.py's /metrics (see proxnet_metrics.py).
 
 import time
 import sys
+import os
+import json
 import signal
+import struct
+import argparse
+import threading
+from pathlib import Path
+
+from pcapng_writer import PcapngWriter, LINKTYPE_NRF24, NRF24_HEADER
+from proxnet_bus import BusPublisher
+from proxnet_metrics import Metrics, Histogram
 
 # --- Configuration ---
 CE_PIN = 22
 CSN_PIN = 1 # Corresponds to SPI CE1 (Pi Pin 26)
+IRQ_PIN = None # BCM GPIO wired to the nRF24 IRQ pin (e.g. 24); None = poll the FIFO
 RF_CHANNEL = 76
 DATA_RATE_ENUM = None # Placeholder
 PAYLOAD_SIZE = 32
 PIPE_ADDRESS = b"\x01\x02\x03\x04\x01"
+LOG_DIR = Path.home() / "proxnet" / "logs"
+CAPTURE_DIR = LOG_DIR # Each run writes nrf24_capture_<timestamp>.bin (or .pcapng segments) here
+RING_SLOTS = 4096           # Packets buffered between the RX loop and the writer
+POLL_INTERVAL = 0.0005      # Idle wait between FIFO checks when there is no IRQ pin
+IRQ_TIMEOUT = 0.5           # Longest wait for an IRQ edge before re-checking the FIFO
+WRITER_FLUSH_INTERVAL = 1.0 # Seconds between capture file flushes
+STATS_INTERVAL = 10.0       # Seconds between throughput/drop reports
+SWEEP_CHANNELS = range(0, 126)
+SWEEP_RATES = ('250k', '1m', '2m')  # --rates names
+SWEEP_BASE_DWELL = 0.005    # Seconds spent on a quiet channel per visit
+SWEEP_MAX_DWELL = 0.100     # Upper bound for a busy channel
+SWEEP_BOOST = 4.0           # Extra dwell per unit of activity score (in multiples of the base dwell)
+SWEEP_DECAY = 0.8           # Weight of history in the per-channel activity score
+SWEEP_REPORT_FILE = LOG_DIR / "nrf24_sweep.json" # Read by web_ui.py
+SWEEP_REPORT_INTERVAL = 5.0
+
+# --- Capture File Format ---
+# File header: magic, then the monotonic and wall clocks (ns) at capture start so
+# record timestamps (monotonic ns) can be mapped to wall-clock time.
+CAPTURE_MAGIC = b"PXN24\x01"
+CAPTURE_HEADER = struct.Struct('<6sQQ')
+# One record per packet: monotonic ns, channel, pipe, payload length, payload (zero padded)
+RECORD = struct.Struct('<QBBB32s')
 
 # --- Import RF24 Library ---
 try:
     from pyrf24 import RF24, RF24_PA_LOW, RF24_1MBPS, RF24_2MBPS, RF24_250KBPS
     DATA_RATE_ENUM = RF24_1MBPS # Assign actual enum value
-    print("DEBUG: pyRF24 library imported successfully.")
 except ImportError:
-    print("CRITICAL ERROR: pyRF24 library not found.", file=sys.stderr)
-    sys.exit(1)
+    RF24 = None # Reported in main(); the capture helpers below still work without it
 except Exception as e:
     print(f"CRITICAL ERROR: Failed to import pyRF24 - {e}", file=sys.stderr)
     sys.exit(1)
 
+# --- Optional IRQ Support ---
+try:
+    import RPi.GPIO as GPIO
+except ImportError:
+    GPIO = None
+
 # --- Global Radio Object ---
 radio = None
 
 # --- Signal Handler ---
 def cleanup(signum, frame):
-    global radio
+    # Raise so main()'s finally block can flush the capture writer and power down the radio
     print("\nCaught signal, cleaning up...")
+    raise SystemExit(0)
+
+def power_down():
+    global radio
     if radio:
         try:
             print("Powering down radio.")
@@ -43,36 +90,236 @@ def cleanup(signum, frame):
                 radio.powerDown()
         except Exception as final_e:
              print(f"Error during radio powerDown: {final_e}", file=sys.stderr)
-    sys.exit(0)
 
-# Register signal handlers
-signal.signal(signal.SIGINT, cleanup)
-signal.signal(signal.SIGTERM, cleanup)
+# --- Packet Ring ---
+class PacketRing:
+    """Preallocated ring of RECORD-sized slots between the RX loop and the writer.
 
-# --- Main Logic ---
-try:
-    print("Starting nRF24L01+ Sniffer...")
+    Single producer, single consumer: the RX loop only advances `head`, the
+    writer only advances `tail`, so no lock is taken per packet. When the
+    writer falls a full ring behind, new packets are counted in `dropped`
+    rather than blocking the radio.
+    """
 
-    # --- Step 1: Create RF24 object ---
-    try:
-        radio = RF24(CE_PIN, CSN_PIN)
-        print("DEBUG: RF24 object created.")
-    except Exception as e:
-        print(f"CRITICAL ERROR: Failed to create RF24 object - {e}", file=sys.stderr)
-        sys.exit(1)
+    def __init__(self, slots=RING_SLOTS):
+        self.slots = slots
+        self.buf = bytearray(RECORD.size * slots)
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+        self.cond = threading.Condition()
 
-    # --- Step 2: Initialize Radio ---
-    try:
-        if not radio.begin():
-            print("CRITICAL ERROR: radio.begin() failed. Check wiring/power.", file=sys.stderr)
-            sys.exit(1)
-        print("DEBUG: radio.begin() successful.")
-    except Exception as e:
-         print(f"CRITICAL ERROR: Exception during radio.begin() - {e}", file=sys.stderr)
-         sys.exit(1)
+    def put(self, ts_ns, channel, pipe, payload):
+        if self.head - self.tail >= self.slots:
+            self.dropped += 1
+            return False
+        RECORD.pack_into(self.buf, (self.head % self.slots) * RECORD.size, ts_ns, channel, pipe, len(payload), payload)
+        self.head += 1
+        return True
+
+    def notify(self):
+        """Wakes the writer; called once per drained burst, not per packet."""
+        with self.cond:
+            self.cond.notify()
+
+    def take(self, timeout):
+        """Waits up to `timeout` for records and returns them as one bytes object (possibly empty)."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.head > self.tail, timeout)
+        head = self.head
+        count = head - self.tail
+        if not count:
+            return b""
+        start = (self.tail % self.slots) * RECORD.size
+        end = start + count * RECORD.size
+        if end <= len(self.buf):
+            data = bytes(self.buf[start:end])
+        else:
+            data = bytes(self.buf[start:]) + bytes(self.buf[:end - len(self.buf)])
+        self.tail = head
+        return data
+
+# --- Capture Writer ---
+def format_record(ts_ns, channel, pipe, length, payload):
+    return f"[{ts_ns / 1e9:.6f}] CH {channel} P{pipe} RX ({length} bytes): {payload[:length].hex().upper()}"
+
+class CaptureWriter(threading.Thread):
+    """Drains the ring into the binary capture file (or PCAP-NG segments), optionally echoing text lines.
+
+    With a `bus` publisher, each drained batch is also published before it
+    is written, so the bus never waits on the capture file.
+    """
+
+    def __init__(self, ring, path, text=False, pcapng=False, bus=None):
+        super().__init__(name="capture-writer", daemon=True)
+        self.ring = ring
+        self.path = Path(path)
+        self.text = text
+        self.pcapng = pcapng
+        self.bus = bus
+        self.offset_ns = time.time_ns() - time.monotonic_ns() # Ring timestamps are monotonic
+        self.records = 0
+        self.bytes_written = 0
+        self.write_latency = Histogram() # Publish + write per drained batch
+        self.stop_event = threading.Event()
+
+    def run(self):
+        if self.pcapng:
+            self.run_pcapng()
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'wb', buffering=256 * 1024) as f:
+            f.write(CAPTURE_HEADER.pack(CAPTURE_MAGIC, time.monotonic_ns(), time.time_ns()))
+            last_flush = time.monotonic()
+            while True:
+                stopping = self.stop_event.is_set()
+                data = self.ring.take(0.2)
+                started = time.perf_counter_ns()
+                self._publish(data)
+                if data:
+                    f.write(data)
+                    self.records += len(data) // RECORD.size
+                    self.bytes_written += len(data)
+                    if self.text:
+                        for record in RECORD.iter_unpack(data):
+                            print(format_record(*record))
+                    self.write_latency.observe_ns(started)
+                if time.monotonic() - last_flush >= WRITER_FLUSH_INTERVAL:
+                    f.flush()
+                    last_flush = time.monotonic()
+                if stopping and not data:
+                    break
+
+    def run_pcapng(self):
+        # self.path is the segment prefix; ring timestamps are monotonic, PCAP-NG wants wall clock
+        out = PcapngWriter(self.path.with_suffix(''))
+        offset_ns = self.offset_ns
+        try:
+            while True:
+                stopping = self.stop_event.is_set()
+                data = self.ring.take(0.2)
+                started = time.perf_counter_ns()
+                self._publish(data)
+                for ts_ns, channel, pipe, length, payload in RECORD.iter_unpack(data):
+                    interface = out.interface(channel, LINKTYPE_NRF24, f"nrf24-ch{channel}",
+                                              f"nRF24L01+ channel {channel} ({2400 + channel} MHz)")
+                    out.write(interface, ts_ns + offset_ns, NRF24_HEADER.pack(pipe) + payload[:length])
+                    if self.text:
+                        print(format_record(ts_ns, channel, pipe, length, payload))
+                self.records += len(data) // RECORD.size
+                self.bytes_written = out.size
+                out.maybe_flush()
+                if data:
+                    self.write_latency.observe_ns(started)
+                if stopping and not data:
+                    break
+        finally:
+            out.close()
+
+    def _publish(self, data):
+        if not self.bus or not data:
+            return
+        for ts_ns, channel, pipe, length, payload in RECORD.iter_unpack(data):
+            self.bus.publish_nrf24((ts_ns + self.offset_ns) // 1000, channel, pipe, payload[:length])
+        self.bus.flush()
+
+    def register_metrics(self, metrics):
+        metrics.counter('capture_records_total', "Packets written to the capture file", lambda: self.records)
+        metrics.counter('capture_bytes_total', "Bytes written to the capture file", lambda: self.bytes_written)
+        metrics.histogram('capture_write_seconds', "Time to publish and write one drained batch", self.write_latency)
+        if self.bus:
+            self.bus.register_metrics(metrics)
+
+    def close(self):
+        self.stop_event.set()
+        self.ring.notify()
+        self.join(5)
+        if self.bus:
+            self.bus.close()
+
+def read_capture(path):
+    """Yields (ts_ns, channel, pipe, payload) from a capture file; ts_ns is mapped to wall-clock time."""
+    with open(path, 'rb') as f:
+        magic, mono_ns, wall_ns = CAPTURE_HEADER.unpack(f.read(CAPTURE_HEADER.size))
+        if magic != CAPTURE_MAGIC:
+            raise ValueError(f"{path} is not an nRF24 capture file")
+        while True:
+            data = f.read(RECORD.size * 1024)
+            if len(data) < RECORD.size:
+                break
+            data = data[:len(data) - len(data) % RECORD.size]
+            for ts_ns, channel, pipe, length, payload in RECORD.iter_unpack(data):
+                yield ts_ns - mono_ns + wall_ns, channel, pipe, payload[:length]
+
+# --- Receive Loop ---
+class RxStats:
+    def __init__(self):
+        self.packets = 0
+        self.fifo_full = 0 # Wakes that found the 3-deep FIFO full: the radio may have dropped packets
+        self.wakes = 0
+        self.spi_transactions = 0 # Radio commands issued (each one SPI transaction)
+        self.drain_latency = Histogram() # FIFO drain per wake that found packets
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.last_packets = 0
+
+    def maybe_report(self, ring):
+        now = time.monotonic()
+        if now - self.last_report < STATS_INTERVAL:
+            return
+        rate = (self.packets - self.last_packets) / (now - self.last_report)
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] STATS: {self.packets} packets ({rate:.1f}/s), "
+              f"FIFO full {self.fifo_full}x, ring drops {ring.dropped}")
+        self.last_report, self.last_packets = now, self.packets
+
+    def register_metrics(self, metrics, ring):
+        metrics.counter('packets_total', "Payloads read from the RX FIFO", lambda: self.packets)
+        metrics.counter('wakes_total', "RX FIFO drains (IRQ or poll wakes)", lambda: self.wakes)
+        metrics.counter('fifo_overflows_total', "Wakes that found the 3-deep RX FIFO full", lambda: self.fifo_full)
+        metrics.counter('spi_transactions_total', "SPI transactions issued to the radio", lambda: self.spi_transactions)
+        metrics.counter('ring_dropped_total', "Packets dropped because the writer fell a ring behind", lambda: ring.dropped)
+        metrics.gauge('ring_depth', "Packets waiting in the ring for the writer", lambda: ring.head - ring.tail)
+        metrics.histogram('drain_seconds', "Time to drain the RX FIFO on a wake that found packets", self.drain_latency)
 
-    # --- Configure Radio for Sniffing ---
-    print("DEBUG: Configuring radio...")
+def drain_fifo(radio, ring, channel, stats):
+    """Reads every payload waiting in the RX FIFO; returns how many were read."""
+    stats.wakes += 1
+    started = time.perf_counter_ns()
+    if radio.rxFifoFull():
+        stats.fifo_full += 1
+    count = 0
+    while True:
+        has_payload, pipe = radio.available_pipe()
+        if not has_payload:
+            break
+        ts_ns = time.monotonic_ns()
+        ring.put(ts_ns, channel, pipe, radio.read(PAYLOAD_SIZE))
+        count += 1
+    stats.spi_transactions += 2 * count + 2 # FIFO status, then available/read per payload and the final empty check
+    if count:
+        stats.packets += count
+        ring.notify()
+        stats.drain_latency.observe_ns(started)
+    return count
+
+def setup_irq(pin):
+    """Configures the IRQ pin for RX-ready interrupts; returns False if unavailable."""
+    if pin is None or GPIO is None:
+        return False
+    GPIO.setmode(GPIO.BCM)
+    GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+    radio.maskIRQ(True, True, False) # Only RX_DR pulls IRQ low
+    return True
+
+def wait_for_packet(use_irq):
+    if use_irq:
+        radio.whatHappened() # Clear RX_DR so the next packet produces a fresh falling edge
+        if not radio.available():
+            GPIO.wait_for_edge(IRQ_PIN, GPIO.FALLING, timeout=int(IRQ_TIMEOUT * 1000))
+    else:
+        time.sleep(POLL_INTERVAL)
+
+def configure_radio():
     radio.setPALevel(RF24_PA_LOW)
     radio.setDataRate(DATA_RATE_ENUM)
     radio.setChannel(RF_CHANNEL)
@@ -81,27 +328,211 @@ try:
     radio.setPayloadSize(PAYLOAD_SIZE)
     radio.openReadingPipe(1, PIPE_ADDRESS)
     radio.startListening()
-    print("DEBUG: Radio configured.")
 
-    # --- Ready ---
-    print(f"Listening started on Channel {RF_CHANNEL}, Data Rate: {DATA_RATE_ENUM.name if DATA_RATE_ENUM else 'Unknown'}")
-    print(f"Payload Size: {PAYLOAD_SIZE} bytes")
-    print("Press Ctrl+C to stop.")
-    print("-" * 30)
+# --- Channel Sweep ---
+class ChannelSweeper:
+    """Hops across (data rate, channel) slots, dwelling longer where there is activity.
 
-    # --- Main Sniffing Loop ---
-    while True:
-        if radio.available():
-            payload = radio.read(PAYLOAD_SIZE)
-            payload_len = len(payload)
-            timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-            hex_payload = payload.hex().upper()
-            print(f"[{timestamp}] RX ({payload_len} bytes): {hex_payload}")
-        time.sleep(0.01)
-
-except KeyboardInterrupt:
-    # Cleanup is handled by the signal handler
-    pass
-except Exception as e:
-    print(f"\nAn error occurred during setup or loop: {e}", file=sys.stderr)
-    cleanup(None, None) # Attempt cleanup
+    Every slot is visited once per sweep so coverage never stalls, but the
+    dwell per visit grows with the slot's activity score: an exponentially
+    weighted average of packets received plus RPD (carrier > -64 dBm) hits
+    per visit. The radio, clock and sleep are injected so the scheduler can
+    run against a fake RF24 object.
+    """
+
+    def __init__(self, radio, ring, stats, channels=SWEEP_CHANNELS, data_rates=None,
+                 base_dwell=SWEEP_BASE_DWELL, max_dwell=SWEEP_MAX_DWELL,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.radio = radio
+        self.ring = ring
+        self.stats = stats
+        self.data_rates = list(data_rates or [DATA_RATE_ENUM])
+        self.slots = [(rate, channel) for rate in self.data_rates for channel in channels]
+        self.base_dwell = base_dwell
+        self.max_dwell = max_dwell
+        self.clock = clock
+        self.sleep = sleep
+        self.current_rate = None
+        self.sweeps = 0
+        # Per-slot histogram: visits, packets, rpd_hits, dwell seconds, activity score
+        self.histogram = {slot: {'visits': 0, 'packets': 0, 'rpd_hits': 0, 'dwell': 0.0, 'score': 0.0}
+                          for slot in self.slots}
+
+    def dwell_for(self, slot):
+        return min(self.max_dwell, self.base_dwell * (1 + SWEEP_BOOST * self.histogram[slot]['score']))
+
+    def visit(self, slot):
+        rate, channel = slot
+        if rate != self.current_rate:
+            self.radio.setDataRate(rate)
+            self.current_rate = rate
+        self.radio.setChannel(channel)
+        dwell = self.dwell_for(slot)
+        start = self.clock()
+        deadline = start + dwell
+        packets, rpd = 0, False
+        while True:
+            packets += drain_fifo(self.radio, self.ring, channel, self.stats)
+            rpd = rpd or self.radio.testRPD()
+            self.stats.spi_transactions += 1
+            if self.clock() >= deadline:
+                break
+            self.sleep(POLL_INTERVAL)
+        entry = self.histogram[slot]
+        entry['visits'] += 1
+        entry['packets'] += packets
+        entry['rpd_hits'] += rpd
+        entry['dwell'] += self.clock() - start
+        entry['score'] = SWEEP_DECAY * entry['score'] + (1 - SWEEP_DECAY) * (packets + rpd)
+        return packets
+
+    def sweep(self):
+        """Visits every slot once; returns packets received during the sweep."""
+        packets = sum(self.visit(slot) for slot in self.slots)
+        self.sweeps += 1
+        return packets
+
+    def report(self):
+        names = {rate: getattr(rate, 'name', str(rate)) for rate in self.data_rates}
+        return {
+            'updated': time.time(),
+            'sweeps': self.sweeps,
+            'slots': [{'data_rate': names[rate], 'channel': channel, **{k: round(v, 3) for k, v in entry.items()}}
+                      for (rate, channel), entry in self.histogram.items()],
+        }
+
+    def write_report(self, path=SWEEP_REPORT_FILE):
+        tmp = Path(f"{path}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump(self.report(), f)
+        os.replace(tmp, path) # Readers never see a half-written file
+
+def parse_channels(spec):
+    """'0-125' / '2,40,76-80' -> sorted list of channel numbers."""
+    channels = set()
+    for part in spec.split(','):
+        lo, _, hi = part.partition('-')
+        channels.update(range(int(lo), int(hi or lo) + 1))
+    return sorted(c for c in channels if 0 <= c <= 125)
+
+def parse_rates(spec):
+    """'250k,2m' -> ['250k', '2m']; unknown names are a usage error."""
+    rates = [r.strip().lower() for r in spec.split(',') if r.strip()]
+    unknown = [r for r in rates if r not in SWEEP_RATES]
+    if unknown or not rates:
+        raise argparse.ArgumentTypeError(f"unknown data rate(s) {', '.join(unknown) or spec!r}, "
+                                         f"expected any of {','.join(SWEEP_RATES)}")
+    return rates
+
+# --- Main Logic ---
+def main(text=False, capture_file=None, sweep=False, channels=SWEEP_CHANNELS, rates=None, dwell=SWEEP_BASE_DWELL,
+         pcapng=False, bus=False):
+    global radio
+    if RF24 is None:
+        print("CRITICAL ERROR: pyRF24 library not found.", file=sys.stderr)
+        sys.exit(1)
+    print("DEBUG: pyRF24 library imported successfully.")
+    signal.signal(signal.SIGINT, cleanup)
+    signal.signal(signal.SIGTERM, cleanup)
+
+    if capture_file is None and pcapng:
+        capture_file = CAPTURE_DIR / "nrf24_capture" # Segments are nrf24_capture_<timestamp>.pcapng
+    elif capture_file is None:
+        capture_file = CAPTURE_DIR / f"nrf24_capture_{time.strftime('%Y%m%d_%H%M%S')}.bin"
+    ring = PacketRing()
+    writer = None
+    stats = RxStats()
+    metrics = Metrics('nrf24')
+    stats.register_metrics(metrics, ring)
+    try:
+        print("Starting nRF24L01+ Sniffer...")
+
+        # --- Step 1: Create RF24 object ---
+        try:
+            radio = RF24(CE_PIN, CSN_PIN)
+            print("DEBUG: RF24 object created.")
+        except Exception as e:
+            print(f"CRITICAL ERROR: Failed to create RF24 object - {e}", file=sys.stderr)
+            sys.exit(1)
+
+        # --- Step 2: Initialize Radio ---
+        try:
+            if not radio.begin():
+                print("CRITICAL ERROR: radio.begin() failed. Check wiring/power.", file=sys.stderr)
+                sys.exit(1)
+            print("DEBUG: radio.begin() successful.")
+        except Exception as e:
+             print(f"CRITICAL ERROR: Exception during radio.begin() - {e}", file=sys.stderr)
+             sys.exit(1)
+
+        # --- Configure Radio for Sniffing ---
+        print("DEBUG: Configuring radio...")
+        configure_radio()
+        use_irq = setup_irq(IRQ_PIN)
+        print("DEBUG: Radio configured.")
+
+        writer = CaptureWriter(ring, capture_file, text=text, pcapng=pcapng, bus=BusPublisher('nrf24') if bus else None)
+        writer.register_metrics(metrics)
+        writer.start()
+
+        if sweep:
+            rate_enums = [{'250k': RF24_250KBPS, '1m': RF24_1MBPS, '2m': RF24_2MBPS}[r] for r in rates or ['1m']]
+            sweeper = ChannelSweeper(radio, ring, stats, channels, rate_enums, base_dwell=dwell)
+            print(f"Sweep mode: {len(channels)} channel(s) x {len(rate_enums)} data rate(s), base dwell {dwell * 1000:g} ms")
+            print(f"Activity histogram: {SWEEP_REPORT_FILE}")
+            print(f"Capture file: {capture_file}" + ("_<timestamp>.pcapng (rotating)" if pcapng else ""))
+            print("-" * 30)
+            last_report = time.monotonic()
+            while True:
+                sweeper.sweep()
+                stats.maybe_report(ring)
+                metrics.maybe_write()
+                if time.monotonic() - last_report >= SWEEP_REPORT_INTERVAL:
+                    sweeper.write_report()
+                    last_report = time.monotonic()
+
+        # --- Ready ---
+        print(f"Listening started on Channel {RF_CHANNEL}, Data Rate: {DATA_RATE_ENUM.name if DATA_RATE_ENUM else 'Unknown'}")
+        print(f"Payload Size: {PAYLOAD_SIZE} bytes")
+        print(f"Wake source: {'IRQ on GPIO ' + str(IRQ_PIN) if use_irq else 'FIFO polling'}")
+        print(f"Capture file: {capture_file}" + ("_<timestamp>.pcapng (rotating)" if pcapng else ""))
+        print("Press Ctrl+C to stop.")
+        print("-" * 30)
+
+        # --- Main Sniffing Loop ---
+        while True:
+            if not drain_fifo(radio, ring, RF_CHANNEL, stats):
+                wait_for_packet(use_irq)
+            stats.maybe_report(ring)
+            metrics.maybe_write()
+
+    except KeyboardInterrupt:
+        pass # SystemExit (signals, setup failures) propagates after the finally block
+    except Exception as e:
+        print(f"\nAn error occurred during setup or loop: {e}", file=sys.stderr)
+    finally:
+        if writer:
+            writer.close()
+            print(f"Capture closed: {writer.records} packets written, {ring.dropped} dropped in ring, "
+                  f"FIFO full {stats.fifo_full}x.")
+            if writer.bus:
+                print(f"Bus: {writer.bus.published} packets published, {writer.bus.dropped} dropped.")
+        power_down()
+        if GPIO is not None and IRQ_PIN is not None:
+            GPIO.cleanup(IRQ_PIN)
+        metrics.write() # Final counts for /metrics
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ProxNet nRF24L01+ sniffer")
+    parser.add_argument("--text", action="store_true", help="Also print every packet as a hex line (slow)")
+    parser.add_argument("--capture-file", type=Path, help=f"Binary capture output (default {CAPTURE_DIR}/nrf24_capture_<timestamp>.bin); "
+                                                          "with --pcapng, the segment name prefix")
+    parser.add_argument("--pcapng", action="store_true", help="Write rotating PCAP-NG segments instead of the binary record file")
+    parser.add_argument("--sweep", action="store_true", help="Hop across channels/data rates instead of listening on RF_CHANNEL")
+    parser.add_argument("--channels", type=parse_channels, default=list(SWEEP_CHANNELS), help="Sweep channel set, e.g. 0-125 or 2,40,76-80")
+    parser.add_argument("--rates", type=parse_rates, default=['1m'], help=f"Sweep data rates: any of {','.join(SWEEP_RATES)}")
+    parser.add_argument("--dwell-ms", type=float, default=SWEEP_BASE_DWELL * 1000, help="Base dwell per channel in ms")
+    parser.add_argument("--bus", action="store_true", help="Also publish every packet to the proxnet_bus.py ingestion bus")
+    args = parser.parse_args()
+    main(text=args.text, capture_file=args.capture_file, sweep=args.sweep,
+         channels=args.channels, rates=args.rates, dwell=args.dwell_ms / 1000, pcapng=args.pcapng, bus=args.bus)
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+
+# ook_demod.py
+# Turns demodulated OOK/ASK sample streams (e.g. CC1101 FIFO data with PKTCTRL0 = 0x00, where
+# every bit is one sample of carrier on/off at the data rate) into decoded remote/sensor codes.
+#
+# Pipeline, vectorized with NumPy over the whole capture:
+#   samples -> run lengths (pulse/gap widths) -> frames split at long gaps
+#   -> per-frame short/long pulse clusters -> protocol table match -> bits -> codes
+#
+# Usage:
+#   python3 ook_demod.py capture.bin [--sample-rate 9992]   # packed bits, MSB first (FIFO byte order)
+#   python3 ook_demod.py samples.npy                        # one 0/1 sample per element
+#   python3 ook_demod.py --bench [--hours 2]
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from cc1101_sniffer import data_rate
+
+# --- Configuration ---
+DEFAULT_SAMPLE_RATE = data_rate() # CC1101 CONFIG_REGS data rate, ~10 kBaud
+CHUNK_BYTES = 4 * 1024 * 1024    # Packed capture bytes unpacked per pass (32M samples)
+SPLIT_GAP_US = 2000      # A gap longer than this ends a frame (sync/inter-frame gaps are all longer)
+CLUSTER_MIN_RATIO = 1.5  # Long/short pulse ratio below this means the frame has only one pulse width
+CLUSTER_ITERATIONS = 2   # 2-means refinement passes after the initial geometric-mean split
+TOLERANCE = 0.30         # Relative tolerance on pulse length, long/short ratio and bit period
+REPEAT_GAP = 0.5         # Seconds; identical codes closer than this are folded into one transmission
+BENCH_HOURS = 2.0
+BENCH_TX_INTERVAL = 3.0  # Mean seconds between synthetic transmissions
+BENCH_GLITCH_RATE = 20.0 # Noise spikes per second of idle time
+
+# Protocol table. Pulse/gap pairs are in units of `te` microseconds. Fixed-code entries follow
+# rc-switch: data bits, then a sync pulse and gap. KeeLoq sends a preamble and header gap,
+# then 66 PWM bits LSB first with no sync pulse. When several entries fit a frame, the one
+# with the smallest combined TE, pulse-ratio and bit-period error wins.
+PROTOCOLS = [
+    {'name': 'rc-switch 1 (PT2262/EV1527)', 'te': 350, 'sync': (1, 31), 'zero': (1, 3), 'one': (3, 1), 'bits': (12, 32)},
+    {'name': 'rc-switch 2', 'te': 650, 'sync': (1, 10), 'zero': (1, 2), 'one': (2, 1), 'bits': (12, 32)},
+    {'name': 'rc-switch 3', 'te': 100, 'sync': (30, 71), 'zero': (4, 11), 'one': (9, 6), 'bits': (12, 32)},
+    {'name': 'rc-switch 4', 'te': 380, 'sync': (1, 6), 'zero': (1, 3), 'one': (3, 1), 'bits': (12, 32)},
+    {'name': 'rc-switch 5', 'te': 500, 'sync': (6, 14), 'zero': (1, 2), 'one': (2, 1), 'bits': (12, 32)},
+    {'name': 'rc-switch 7 (HS2303-PT)', 'te': 150, 'sync': (2, 62), 'zero': (1, 6), 'one': (6, 1), 'bits': (12, 32)},
+    {'name': 'KeeLoq (HCS301)', 'te': 400, 'sync': None, 'zero': (2, 1), 'one': (1, 2), 'bits': (66, 66),
+     'rolling': True, 'lsb_first': True},
+]
+
+# --- Run Lengths ---
+def runs_from_samples(samples, offset=0):
+    """(levels, starts, lengths) of the constant-level runs in a 0/1 sample array."""
+    samples = np.asarray(samples, dtype=np.uint8)
+    if not len(samples):
+        return np.empty(0, np.uint8), np.empty(0, np.int64), np.empty(0, np.int64)
+    edges = np.flatnonzero(samples[1:] != samples[:-1]) + 1
+    starts = np.concatenate(([0], edges))
+    lengths = np.diff(np.concatenate((starts, [len(samples)])))
+    return samples[starts], starts + offset, lengths
+
+def runs_from_file(path, chunk_bytes=CHUNK_BYTES):
+    """Run lengths of a capture file, unpacking packed-bit captures a chunk at a time."""
+    path = Path(path)
+    if path.suffix == '.npy':
+        return runs_from_samples(np.load(path, mmap_mode='r').astype(np.uint8))
+    parts = []
+    offset = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                break
+            samples = np.unpackbits(np.frombuffer(chunk, dtype=np.uint8))
+            parts.append(runs_from_samples(samples, offset))
+            offset += len(samples)
+    if not parts:
+        return runs_from_samples([])
+    levels, starts, lengths = (np.concatenate(column) for column in zip(*parts))
+    # A run that straddles a chunk boundary shows up as two runs of the same level
+    joined = np.flatnonzero(levels[1:] == levels[:-1]) + 1
+    if len(joined):
+        keep = np.ones(len(levels), dtype=bool)
+        keep[joined] = False
+        group = np.cumsum(keep) - 1
+        lengths = np.bincount(group, weights=lengths).astype(np.int64)
+        levels, starts = levels[keep], starts[keep]
+    return levels, starts, lengths
+
+# --- Demodulation ---
+def _protocol_arrays():
+    zero = np.array([p['zero'] for p in PROTOCOLS], dtype=float)
+    one = np.array([p['one'] for p in PROTOCOLS], dtype=float)
+    short = np.minimum(zero[:, 0], one[:, 0])
+    return {
+        'te': np.array([p['te'] for p in PROTOCOLS], dtype=float),
+        'short': short,
+        'ratio': np.maximum(zero[:, 0], one[:, 0]) / short,
+        'period': zero.sum(axis=1),
+        'one_long': one[:, 0] > zero[:, 0],
+        'sync': np.array([p['sync'] is not None for p in PROTOCOLS], dtype=int),
+        'min_bits': np.array([p['bits'][0] for p in PROTOCOLS]),
+        'max_bits': np.array([p['bits'][1] for p in PROTOCOLS]),
+    }
+
+def demodulate(levels, starts, lengths, sample_rate=DEFAULT_SAMPLE_RATE):
+    """Decodes every frame in a run-length capture; returns one dict per matched frame.
+
+    Frames are the pulses between gaps longer than SPLIT_GAP_US. Within a
+    frame, pulse widths are split into a short and a long cluster (starting
+    at the geometric mean of the shortest and longest pulse, refined with a
+    couple of 2-means passes). The last pulse is left
+    out because it is usually a sync pulse. The short-pulse mean, long/short
+    ratio and mean bit period are scored against every PROTOCOLS entry at
+    once, and every complete pulse+gap pair must then fit the chosen
+    protocol's bit period.
+    """
+    widths = lengths * (1e6 / sample_rate)
+    n = len(levels)
+    high = np.flatnonzero(levels == 1)
+    if not len(high):
+        return []
+    split = (levels == 0) & (widths > SPLIT_GAP_US)
+    frame_of_run = np.cumsum(split) - split # A splitting gap still belongs to the frame it ends
+    nxt = np.minimum(high + 1, n - 1)
+    complete = (high + 1 < n) & ~split[nxt] # Pulse followed by a data gap in the same frame
+    pulse = widths[high]
+    gap = np.where(complete, widths[nxt], np.nan)
+    frame = frame_of_run[high]
+
+    first = np.flatnonzero(np.concatenate(([True], frame[1:] != frame[:-1])))
+    count = np.diff(np.concatenate((first, [len(high)])))
+    last = np.zeros(len(high), dtype=bool)
+    last[first + count - 1] = True
+    index = np.repeat(np.arange(len(first)), count) # Pulse -> frame number
+
+    # --- Cluster pulse widths per frame (last pulse excluded) ---
+    body = np.where(last, np.nan, pulse)
+    lo = np.fmin.reduceat(body, first)
+    hi = np.fmax.reduceat(body, first)
+    single = ~(hi >= lo * CLUSTER_MIN_RATIO)
+    threshold = np.where(single, np.inf, np.sqrt(lo * hi))
+    for _ in range(CLUSTER_ITERATIONS + 1):
+        is_long = pulse > threshold[index]
+        short_sel = ~is_long & ~last
+        long_sel = is_long & ~last
+        short_n = np.add.reduceat(short_sel.astype(int), first)
+        long_n = np.add.reduceat(long_sel.astype(int), first)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            short_mean = np.add.reduceat(np.where(short_sel, pulse, 0.0), first) / short_n
+            long_mean = np.add.reduceat(np.where(long_sel, pulse, 0.0), first) / long_n
+        # 2-means refinement: move the split to the midpoint of the two cluster means
+        threshold = np.where(single, np.inf, (short_mean + long_mean) / 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = long_mean / short_mean
+
+    # --- Score every frame against every protocol, keep the closest fit ---
+    proto = _protocol_arrays()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pair_mean = (np.add.reduceat(np.where(complete, pulse + gap, 0.0), first)
+                     / np.add.reduceat(complete.astype(int), first))
+        te_est = short_mean[:, None] / proto['short'][None, :]
+        te_err = np.abs(te_est / proto['te'] - 1)
+        ratio_err = np.where(single[:, None], 0.0, np.abs(ratio[:, None] / proto['ratio'] - 1))
+        period_err = np.abs(pair_mean[:, None] / te_est / proto['period'] - 1)
+    bits = count[:, None] - proto['sync'][None, :]
+    match = ((te_err <= TOLERANCE) & (ratio_err <= TOLERANCE) & (period_err <= TOLERANCE)
+             & (bits >= proto['min_bits']) & (bits <= proto['max_bits']))
+    score = np.where(match, te_err + ratio_err + period_err, np.inf)
+    choice = score.argmin(axis=1)
+    rows = np.arange(len(first))
+    matched = np.isfinite(score[rows, choice])
+    te = te_est[rows, choice]
+
+    # --- Every complete pulse+gap pair must span one bit period ---
+    period = (pulse + gap) / te[index]
+    bad = complete & ~(np.abs(period - proto['period'][choice][index]) <= TOLERANCE * proto['period'][choice][index])
+    matched &= np.add.reduceat(bad.astype(int), first) == 0
+
+    bit_values = is_long == proto['one_long'][choice][index]
+    results = []
+    for f in np.flatnonzero(matched):
+        p = PROTOCOLS[choice[f]]
+        nbits = count[f] - (p['sync'] is not None)
+        frame_bits = bit_values[first[f]:first[f] + nbits]
+        if p.get('lsb_first'):
+            frame_bits = frame_bits[::-1]
+        code = int(''.join('1' if b else '0' for b in frame_bits), 2)
+        result = {
+            'time': starts[high[first[f]]] / sample_rate,
+            'protocol': p['name'],
+            'bits': int(nbits),
+            'code': code,
+            'te': round(float(te[f])),
+        }
+        if p.get('rolling'):
+            result.update(keeloq_fields(code))
+        results.append(result)
+    return results
+
+def keeloq_fields(code):
+    """Splits a 66-bit KeeLoq transmission into its encrypted (rolling) and fixed parts."""
+    return {
+        'hopping': code & 0xFFFFFFFF,
+        'serial': (code >> 32) & 0x0FFFFFFF,
+        'buttons': (code >> 60) & 0x0F,
+        'vlow': (code >> 64) & 1,
+        'repeat': (code >> 65) & 1,
+    }
+
+def fold_repeats(results, repeat_gap=REPEAT_GAP):
+    """Merges back-to-back identical frames (remotes resend each code several times)."""
+    folded = []
+    for result in results:
+        prev = folded[-1] if folded else None
+        # Compared on code and length only: rc-switch 1/4 or 2/5 can trade places between repeats
+        if (prev and prev['bits'] == result['bits'] and prev['code'] == result['code']
+                and result['time'] - prev['last_time'] <= repeat_gap):
+            prev['repeats'] += 1
+            prev['last_time'] = result['time']
+        else:
+            folded.append({**result, 'repeats': 1, 'last_time': result['time']})
+    return folded
+
+def format_result(result):
+    line = f"[{result['time']:.3f}s] {result['protocol']}: "
+    if 'serial' in result:
+        line += (f"serial 0x{result['serial']:07X} buttons 0x{result['buttons']:X} "
+                 f"hopping 0x{result['hopping']:08X} vlow {result['vlow']}")
+    else:
+        line += f"{result['bits']} bits 0x{result['code']:0{(result['bits'] + 3) // 4}X}"
+    return line + f" (TE {result['te']} us, x{result['repeats']})"
+
+# --- Synthetic Captures ---
+def protocol_runs(protocol, code, nbits, te, rng, jitter=0.1):
+    """(level, microseconds) runs for one frame of `protocol`, ending with its inter-frame gap."""
+    runs = []
+    if protocol['sync'] is None: # KeeLoq: 12-pulse preamble, then a 10 TE header gap
+        runs += [(1, te), (0, te)] * 11 + [(1, te), (0, 10 * te)]
+    order = range(nbits) if protocol.get('lsb_first') else range(nbits - 1, -1, -1)
+    for i in order:
+        high, low = protocol['one'] if (code >> i) & 1 else protocol['zero']
+        runs += [(1, high * te), (0, low * te)]
+    if protocol['sync'] is None:
+        runs[-1] = (0, runs[-1][1] + 39 * te) # Guard time after the last bit
+    else:
+        runs += [(1, protocol['sync'][0] * te), (0, protocol['sync'][1] * te)]
+    return [(level, width * rng.uniform(1 - jitter, 1 + jitter)) for level, width in runs]
+
+def synthetic_capture(hours=BENCH_HOURS, sample_rate=DEFAULT_SAMPLE_RATE, seed=1):
+    """Idle noise with a transmission every few seconds; returns (packed bits, truth list)."""
+    rng = random.Random(seed)
+    levels, widths, truth = [], [], []
+    t = 0.0
+    duration = hours * 3600e6
+    usable = [p for p in PROTOCOLS if p['te'] * 1e-6 * sample_rate >= 3] # Pulses need a few samples
+    while t < duration:
+        idle = rng.expovariate(1 / BENCH_TX_INTERVAL) * 1e6
+        end = t + idle
+        while t < end: # Idle time with isolated noise spikes
+            quiet = rng.expovariate(BENCH_GLITCH_RATE) * 1e6
+            levels += [0, 1]
+            widths += [quiet, rng.uniform(1, 3) * 1e6 / sample_rate]
+            t += quiet + widths[-1]
+        protocol = rng.choice(usable)
+        nbits = protocol['bits'][0] if protocol.get('rolling') else rng.choice((12, 24, 24, 32))
+        code = rng.getrandbits(nbits)
+        te = protocol['te'] * rng.uniform(0.9, 1.1) # Per-remote oscillator spread
+        truth.append((t / 1e6, protocol['name'], code, nbits))
+        levels.append(0)
+        widths.append(3 * SPLIT_GAP_US) # Silence ahead of the first frame
+        t += widths[-1]
+        for _ in range(rng.randint(3, 6)):
+            for level, width in protocol_runs(protocol, code, nbits, te, rng):
+                levels.append(level)
+                widths.append(width)
+                t += width
+    edges = np.round(np.cumsum(widths) * sample_rate / 1e6).astype(np.int64)
+    lengths = np.diff(np.concatenate(([0], edges)))
+    samples = np.repeat(np.array(levels, dtype=np.uint8), lengths)
+    return np.packbits(samples), truth
+
+def bench(hours=BENCH_HOURS, sample_rate=DEFAULT_SAMPLE_RATE):
+    print(f"Generating {hours:g} h of synthetic OOK capture at {sample_rate:.0f} samples/s...")
+    packed, truth = synthetic_capture(hours, sample_rate)
+    path = Path(f"/tmp/ook_bench_{hours:g}h.bin")
+    packed.tofile(path)
+    print(f"{path}: {len(packed) * 8 / 1e6:.1f}M samples, {len(packed) / 1e6:.1f} MB, {len(truth)} transmissions")
+
+    started = time.perf_counter()
+    levels, starts, lengths = runs_from_file(path)
+    runs_done = time.perf_counter()
+    results = fold_repeats(demodulate(levels, starts, lengths, sample_rate))
+    elapsed = time.perf_counter() - started
+
+    found = {(r['code'], r['bits']) for r in results}
+    expected = {(code, nbits) for _, _, code, nbits in truth}
+    recovered = sum((code, nbits) in found for _, _, code, nbits in truth)
+    # Entries with the same pulse shapes and overlapping TE (rc-switch 1/4, 2/5) can swap names
+    exact = len({(name, code) for _, name, code, _ in truth} & {(r['protocol'], r['code']) for r in results})
+    print(f"Run lengths: {len(levels)} runs in {runs_done - started:.2f}s")
+    print(f"Decoded {len(results)} transmissions: recovered {recovered}/{len(truth)} codes "
+          f"({exact} under the exact protocol entry), {len(found - expected)} spurious")
+    print(f"Total {elapsed:.2f}s -> {hours * 3600 / elapsed:.0f}x real time")
+    path.unlink()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Demodulate OOK/ASK sample captures into remote/sensor codes")
+    parser.add_argument("capture", nargs="?", type=Path, help="Packed-bit capture (.bin) or 0/1 sample array (.npy)")
+    parser.add_argument("--sample-rate", type=float, default=DEFAULT_SAMPLE_RATE, help="Samples per second (default: CC1101 data rate)")
+    parser.add_argument("--all", action="store_true", help="List every repeat instead of folding them")
+    parser.add_argument("--bench", action="store_true", help="Benchmark on a synthetic capture")
+    parser.add_argument("--hours", type=float, default=BENCH_HOURS, help="Synthetic capture length for --bench")
+    args = parser.parse_args()
+    if args.bench:
+        bench(args.hours, args.sample_rate)
+    elif args.capture:
+        started = time.perf_counter()
+        results = demodulate(*runs_from_file(args.capture), sample_rate=args.sample_rate)
+        results = fold_repeats(results, 0 if args.all else REPEAT_GAP)
+        for result in results:
+            print(format_result(result))
+        print(f"{len(results)} transmissions in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+    else:
+        parser.error("give a capture file or --bench")
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+
+# pcap_indexer.py
+# Incremental index of the Wi-Fi capture segments written by wifi_capture.py.
+#
+# Tails every wifi_*.pcap* file under PCAP_DIR (closed ring segments and the one
+# tcpdump is still writing), parses the radiotap/802.11 headers of each new
+# record and keeps per-BSSID, per-station, per-frame-type and per-channel
+# counters plus a time -> (file, byte offset) index in a separate SQLite
+# database. The web UI answers questions about capture contents from that
+# database instead of running tshark over the pcaps.
+#
+# Each segment's read offset is committed together with the counters it
+# produced, so the indexer can be stopped at any point and picks up where it
+# left off. Ring segments that tcpdump overwrites are detected and re-indexed.
+#
+#   python3 pcap_indexer.py            # index what is there and exit
+#   python3 pcap_indexer.py --follow   # keep tailing (run alongside wifi_capture.py --ring)
+
+import os
+import sys
+import time
+import struct
+import argparse
+from pathlib import Path
+
+import proxnet_db
+
+# --- Configuration ---
+PCAP_DIR = Path.home() / "proxnet" / "pcaps"
+PCAP_PATTERN = "wifi_*.pcap*"    # Single captures (.pcap) and ring segments (.pcap00, .pcap01, ...)
+INDEX_DB = Path.home() / "proxnet" / "logs" / "pcap_index.db"
+READ_CHUNK = 1024 * 1024         # Bytes read (and committed) per step
+POLL_INTERVAL = 1.0              # Seconds between directory checks in --follow mode
+TIME_INDEX_INTERVAL = 1.0        # Seconds between time-offset index entries per segment
+MAX_RECORD = 256 * 1024          # Larger record lengths mean a corrupt segment
+COUNTER_KINDS = ("bssid", "station", "frame_type", "channel")
+INDEX_SCHEMA_VERSION = 1
+
+# --- pcap Format ---
+PCAP_HEADER_SIZE = 24
+RECORD_HEADER_SIZE = 16
+# magic as read little-endian -> (byte order, timestamp fraction units per microsecond)
+PCAP_MAGICS = {
+    0xA1B2C3D4: ('<', 1), 0xD4C3B2A1: ('>', 1),
+    0xA1B23C4D: ('<', 1000), 0x4D3CB2A1: ('>', 1000), # Nanosecond-resolution variant
+}
+LINKTYPE_IEEE802_11 = 105
+LINKTYPE_RADIOTAP = 127
+
+# Radiotap fields up to dBm antenna signal: (alignment, size) by present bit
+RADIOTAP_FIELDS = [(8, 8), (1, 1), (1, 1), (2, 4), (2, 2), (1, 1)] # TSFT, flags, rate, channel, FHSS, signal
+RADIOTAP_FLAGS_BAD_FCS = 0x40
+
+FRAME_TYPES = {0: "mgmt", 1: "ctrl", 2: "data", 3: "ext"}
+SUBTYPES = {
+    0: {0: "assoc_req", 1: "assoc_resp", 2: "reassoc_req", 3: "reassoc_resp", 4: "probe_req", 5: "probe_resp",
+        8: "beacon", 9: "atim", 10: "disassoc", 11: "auth", 12: "deauth", 13: "action"},
+    1: {8: "block_ack_req", 9: "block_ack", 10: "ps_poll", 11: "rts", 12: "cts", 13: "ack", 14: "cf_end"},
+    2: {0: "data", 4: "null", 8: "qos_data", 12: "qos_null"},
+}
+
+# --- Index Schema ---
+# Counters are kept per segment so a ring segment can be dropped and re-indexed
+# when tcpdump overwrites it; queries sum across segments.
+INDEX_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS segments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        path TEXT NOT NULL UNIQUE,
+        linktype INTEGER,
+        offset INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        packets INTEGER NOT NULL,
+        bytes INTEGER NOT NULL,
+        first_ts_us INTEGER,
+        last_ts_us INTEGER,
+        updated_us INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS counters (
+        segment_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        packets INTEGER NOT NULL,
+        bytes INTEGER NOT NULL,
+        first_us INTEGER NOT NULL,
+        last_us INTEGER NOT NULL,
+        signal_sum INTEGER NOT NULL,
+        signal_count INTEGER NOT NULL,
+        PRIMARY KEY (segment_id, kind, key)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_counters_kind_key ON counters (kind, key);
+    CREATE TABLE IF NOT EXISTS time_index (
+        segment_id INTEGER NOT NULL,
+        ts_us INTEGER NOT NULL,
+        offset INTEGER NOT NULL,
+        packet INTEGER NOT NULL,
+        PRIMARY KEY (segment_id, ts_us)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_time_index_ts ON time_index (ts_us);
+'''
+
+UPSERT_COUNTER_SQL = '''
+    INSERT INTO counters (segment_id, kind, key, packets, bytes, first_us, last_us, signal_sum, signal_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (segment_id, kind, key) DO UPDATE SET
+        packets = packets + excluded.packets,
+        bytes = bytes + excluded.bytes,
+        first_us = min(first_us, excluded.first_us),
+        last_us = max(last_us, excluded.last_us),
+        signal_sum = signal_sum + excluded.signal_sum,
+        signal_count = signal_count + excluded.signal_count
+'''
+
+def setup_index(db_file):
+    """Opens (creating if needed) the pcap index database."""
+    Path(db_file).parent.mkdir(parents=True, exist_ok=True)
+    conn = proxnet_db.connect(db_file)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < INDEX_SCHEMA_VERSION:
+        conn.executescript(INDEX_SCHEMA)
+        conn.execute(f"PRAGMA user_version = {INDEX_SCHEMA_VERSION}")
+        conn.commit()
+    return conn
+
+# --- 802.11 Parsing ---
+def freq_to_channel(mhz):
+    if mhz == 2484:
+        return 14
+    if 2412 <= mhz <= 2472:
+        return (mhz - 2407) // 5
+    if 5950 <= mhz <= 7125:
+        return (mhz - 5950) // 5
+    if 4910 <= mhz <= 5895:
+        return (mhz - 5000) // 5
+    return None
+
+def _mac(data, offset):
+    return data[offset:offset + 6].hex(':')
+
+def _is_group(data, offset):
+    return data[offset] & 1 # Broadcast/multicast bit of the first octet
+
+def parse_frame(data, linktype):
+    """Header fields of one capture record.
+
+    Returns (frame_type, bssid, station, freq_mhz, signal_dbm, transmitter);
+    anything that can't be determined is None. Frames the driver flagged with
+    a bad FCS only count as 'bad_fcs', since their addresses are garbage.
+    """
+    freq = signal = None
+    if linktype == LINKTYPE_RADIOTAP:
+        if len(data) < 8:
+            return "short", None, None, None, None, None
+        rt_len, present = struct.unpack_from('<HI', data, 2)
+        pos, word = 8, present
+        while word & 0x80000000 and pos + 4 <= rt_len: # Extended present bitmaps precede the fields
+            word = struct.unpack_from('<I', data, pos)[0]
+            pos += 4
+        flags = 0
+        for bit, (align, size) in enumerate(RADIOTAP_FIELDS):
+            if not present & (1 << bit):
+                continue
+            pos = (pos + align - 1) & ~(align - 1)
+            if pos + size > rt_len:
+                break
+            if bit == 1:
+                flags = data[pos]
+            elif bit == 3:
+                freq = struct.unpack_from('<H', data, pos)[0]
+            elif bit == 5:
+                signal = struct.unpack_from('<b', data, pos)[0]
+            pos += size
+        if flags & RADIOTAP_FLAGS_BAD_FCS:
+            return "bad_fcs", None, None, freq, None, None
+        data = data[rt_len:]
+    if len(data) < 10:
+        return "short", None, None, freq, signal, None
+    fc = data[0]
+    ftype, subtype = (fc >> 2) & 3, fc >> 4
+    frame_type = f"{FRAME_TYPES[ftype]}/{SUBTYPES.get(ftype, {}).get(subtype, subtype)}"
+    if ftype not in (0, 2) or len(data) < 24:
+        return frame_type, None, None, freq, signal, None
+    a1, a2, a3 = _mac(data, 4), _mac(data, 10), _mac(data, 16)
+    if ftype == 0:
+        bssid = None if _is_group(data, 16) else a3
+        station = a2 if a2 != a3 else (None if _is_group(data, 4) or a1 == a3 else a1)
+    else:
+        ds = data[1] & 3
+        if ds == 0:
+            bssid, station = a3, a2
+        elif ds == 1: # To the AP
+            bssid, station = a1, a2
+        elif ds == 2: # From the AP
+            bssid, station = a2, None if _is_group(data, 4) else a1
+        else: # WDS / mesh
+            bssid, station = None, None
+    return frame_type, bssid, station, freq, signal, a2
+
+# --- Indexer ---
+class PcapIndexer:
+    """Tails pcap segments into the index database, one READ_CHUNK per transaction."""
+
+    def __init__(self, db_file=INDEX_DB, pcap_dir=PCAP_DIR, pattern=PCAP_PATTERN):
+        self.conn = setup_index(db_file)
+        self.pcap_dir = Path(pcap_dir)
+        self.pattern = pattern
+        self.packets = 0
+        self.warned = set()
+
+    def close(self):
+        self.conn.close()
+
+    def _segment(self, path):
+        return self.conn.execute("SELECT * FROM segments WHERE path = ?", (str(path),)).fetchone()
+
+    def _forget(self, segment_id):
+        for table in ("counters", "time_index"):
+            self.conn.execute(f"DELETE FROM {table} WHERE segment_id = ?", (segment_id,))
+        self.conn.execute("DELETE FROM segments WHERE id = ?", (segment_id,))
+
+    def _first_ts_us(self, f, order, ts_scale):
+        f.seek(PCAP_HEADER_SIZE)
+        head = f.read(8)
+        if len(head) < 8:
+            return None
+        sec, frac = struct.unpack(order + 'II', head)
+        return sec * 1_000_000 + frac // ts_scale
+
+    def index_file(self, path):
+        """Indexes whatever is new in one segment; returns the number of packets added."""
+        try:
+            st = os.stat(path)
+            f = open(path, 'rb')
+        except OSError:
+            return 0 # Rotated away or not readable yet
+        with f:
+            segment = self._segment(path)
+            if segment and segment['size'] == st.st_size and segment['mtime_ns'] == st.st_mtime_ns:
+                return 0
+            header = f.read(PCAP_HEADER_SIZE)
+            if len(header) < PCAP_HEADER_SIZE:
+                return 0 # tcpdump has not written the file header yet
+            magic = struct.unpack_from('<I', header)[0]
+            if magic not in PCAP_MAGICS:
+                if path not in self.warned:
+                    print(f"Skipping {path}: not a classic pcap file", file=sys.stderr)
+                    self.warned.add(path)
+                return 0
+            order, ts_scale = PCAP_MAGICS[magic]
+            linktype = struct.unpack_from(order + 'I', header, 20)[0]
+            if segment and (st.st_size < segment['offset'] or segment['linktype'] != linktype
+                            or self._first_ts_us(f, order, ts_scale) != segment['first_ts_us']):
+                # tcpdump has started this ring slot over
+                with self.conn:
+                    self._forget(segment['id'])
+                segment = None
+            if segment is None:
+                with self.conn:
+                    segment_id = self.conn.execute('''
+                        INSERT INTO segments (path, linktype, offset, size, mtime_ns, packets, bytes, updated_us)
+                        VALUES (?, ?, ?, 0, 0, 0, 0, ?)
+                    ''', (str(path), linktype, PCAP_HEADER_SIZE, proxnet_db.now_us())).lastrowid
+                segment = self.conn.execute("SELECT * FROM segments WHERE id = ?", (segment_id,)).fetchone()
+            if linktype not in (LINKTYPE_RADIOTAP, LINKTYPE_IEEE802_11):
+                if path not in self.warned:
+                    print(f"Skipping {path}: link type {linktype} is not 802.11", file=sys.stderr)
+                    self.warned.add(path)
+                return 0
+
+            added = 0
+            state = dict(segment)
+            while True:
+                f.seek(state['offset']) # Each chunk resumes at the first record the last one left over
+                chunk = f.read(READ_CHUNK)
+                used, count = self._index_chunk(state, chunk, order, ts_scale, linktype, st.st_size)
+                added += count
+                if not used:
+                    break
+            with self.conn: # Nothing new (or only a partial record): still remember size/mtime
+                self.conn.execute("UPDATE segments SET size = ?, mtime_ns = ? WHERE id = ?",
+                                  (st.st_size, st.st_mtime_ns, state['id']))
+            self.packets += added
+            return added
+
+    def _index_chunk(self, state, chunk, order, ts_scale, linktype, file_size):
+        """Parses the complete records in `chunk` and commits them; returns (bytes used, packets)."""
+        record = struct.Struct(order + 'IIII')
+        counters = {}
+        times = []
+        interval_us = int(TIME_INDEX_INTERVAL * 1_000_000)
+        last_bucket = state['last_ts_us'] // interval_us if state['last_ts_us'] is not None else None
+        pos, count, corrupt = 0, 0, False
+        while pos + RECORD_HEADER_SIZE <= len(chunk):
+            sec, frac, incl_len, orig_len = record.unpack_from(chunk, pos)
+            if incl_len > MAX_RECORD:
+                print(f"Corrupt record in {state['path']} at offset {state['offset'] + pos}; "
+                      "skipping the rest of the segment", file=sys.stderr)
+                corrupt = True
+                break
+            end = pos + RECORD_HEADER_SIZE + incl_len
+            if end > len(chunk):
+                break # Partial record: tcpdump is still writing it
+            ts_us = sec * 1_000_000 + frac // ts_scale
+            bucket = ts_us // interval_us
+            if bucket != last_bucket:
+                times.append((state['id'], ts_us, state['offset'] + pos, state['packets'] + count))
+                last_bucket = bucket
+            frame_type, bssid, station, freq, signal, transmitter = parse_frame(
+                chunk[pos + RECORD_HEADER_SIZE:end], linktype)
+            channel = freq_to_channel(freq) if freq else None
+            for kind, key in (("frame_type", frame_type), ("bssid", bssid), ("station", station),
+                              ("channel", str(channel) if channel is not None else None)):
+                if key is None:
+                    continue
+                entry = counters.get((kind, key))
+                if entry is None:
+                    entry = counters[(kind, key)] = [0, 0, ts_us, ts_us, 0, 0]
+                entry[0] += 1
+                entry[1] += orig_len
+                entry[3] = ts_us
+                # Signal belongs to whoever sent the frame
+                if signal is not None and (kind in ("channel", "frame_type") or key == transmitter):
+                    entry[4] += signal
+                    entry[5] += 1
+            state['bytes'] += orig_len
+            state['first_ts_us'] = state['first_ts_us'] if state['first_ts_us'] is not None else ts_us
+            state['last_ts_us'] = ts_us
+            count += 1
+            pos = end
+        if not pos and not corrupt:
+            return 0, 0
+        state['offset'] = file_size if corrupt else state['offset'] + pos
+        state['packets'] += count
+        with self.conn:
+            self.conn.executemany(UPSERT_COUNTER_SQL, [(state['id'], kind, key, *entry)
+                                                       for (kind, key), entry in counters.items()])
+            self.conn.executemany("INSERT OR IGNORE INTO time_index (segment_id, ts_us, offset, packet) VALUES (?, ?, ?, ?)",
+                                  times)
+            self.conn.execute('''
+                UPDATE segments SET offset = ?, packets = ?, bytes = ?, first_ts_us = ?, last_ts_us = ?, updated_us = ?
+                WHERE id = ?
+            ''', (state['offset'], state['packets'], state['bytes'], state['first_ts_us'], state['last_ts_us'],
+                  proxnet_db.now_us(), state['id']))
+        return (0 if corrupt else pos), count
+
+    def scan(self):
+        """One pass over PCAP_DIR; drops index rows for segments that no longer exist."""
+        paths = sorted(self.pcap_dir.glob(self.pattern), key=lambda p: p.stat().st_mtime if p.exists() else 0)
+        added = sum(self.index_file(path) for path in paths)
+        present = {str(path) for path in paths}
+        gone = [row['id'] for row in self.conn.execute("SELECT id, path FROM segments") if row['path'] not in present]
+        if gone:
+            with self.conn:
+                for segment_id in gone:
+                    self._forget(segment_id)
+        return added
+
+    def follow(self, interval=POLL_INTERVAL, stop_event=None):
+        last_report, reported = time.monotonic(), self.packets
+        while not (stop_event and stop_event.is_set()):
+            self.scan()
+            now = time.monotonic()
+            if now - last_report >= 60:
+                rate = (self.packets - reported) / (now - last_report)
+                print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] INDEX: {self.packets} packets indexed ({rate:.1f}/s)")
+                last_report, reported = now, self.packets
+            time.sleep(interval)
+
+# --- Queries (used by web_ui.py) ---
+def query_segments(conn):
+    return [dict(row) for row in conn.execute('''
+        SELECT path, linktype, packets, bytes, size, first_ts_us, last_ts_us, updated_us
+        FROM segments ORDER BY first_ts_us
+    ''')]
+
+def query_counters(conn, kind, since_us=None, until_us=None, limit=50):
+    """Top keys of one counter kind, summed over the segments overlapping [since_us, until_us).
+
+    The time filter works at segment granularity: a segment counts whole if
+    any part of it falls in the range.
+    """
+    if kind not in COUNTER_KINDS:
+        raise ValueError(f"unknown counter kind '{kind}', expected one of {list(COUNTER_KINDS)}")
+    where, params = ["c.kind = ?"], [kind]
+    if since_us is not None:
+        where.append("s.last_ts_us >= ?")
+        params.append(since_us)
+    if until_us is not None:
+        where.append("s.first_ts_us < ?")
+        params.append(until_us)
+    rows = conn.execute(f'''
+        SELECT c.key, SUM(c.packets) AS packets, SUM(c.bytes) AS bytes, MIN(c.first_us) AS first_us,
+               MAX(c.last_us) AS last_us, SUM(c.signal_sum) AS signal_sum, SUM(c.signal_count) AS signal_count
+        FROM counters c JOIN segments s ON s.id = c.segment_id
+        WHERE {' AND '.join(where)}
+        GROUP BY c.key ORDER BY packets DESC LIMIT ?
+    ''', params + [limit])
+    return [{'key': row['key'], 'packets': row['packets'], 'bytes': row['bytes'],
+             'first_us': row['first_us'], 'last_us': row['last_us'],
+             'signal_mean': round(row['signal_sum'] / row['signal_count'], 1) if row['signal_count'] else None}
+            for row in rows]
+
+def seek(conn, ts_us):
+    """(path, byte offset, packet number, ts_us) of the last index entry at or before ts_us, or None.
+
+    Reading the pcap from that offset reaches ts_us within TIME_INDEX_INTERVAL.
+    """
+    row = conn.execute('''
+        SELECT s.path, t.offset, t.packet, t.ts_us FROM time_index t JOIN segments s ON s.id = t.segment_id
+        WHERE t.ts_us <= ? ORDER BY t.ts_us DESC LIMIT 1
+    ''', (ts_us,)).fetchone()
+    return dict(row) if row else None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index ProxNet Wi-Fi pcap segments into SQLite")
+    parser.add_argument("--follow", action="store_true", help="Keep tailing the capture directory")
+    parser.add_argument("--pcap-dir", type=Path, default=PCAP_DIR)
+    parser.add_argument("--db", type=Path, default=INDEX_DB)
+    parser.add_argument("--top", choices=COUNTER_KINDS, help="Print the busiest keys of one counter kind and exit")
+    args = parser.parse_args()
+    indexer = PcapIndexer(args.db, args.pcap_dir)
+    try:
+        if args.top:
+            for row in query_counters(indexer.conn, args.top, limit=20):
+                print(f"{row['key']:>20}  {row['packets']:>9} pkts  {row['bytes']:>11} bytes  "
+                      f"signal {row['signal_mean'] if row['signal_mean'] is not None else '-'}")
+        elif args.follow:
+            print(f"Indexing {args.pcap_dir}/{PCAP_PATTERN} into {args.db} (Ctrl+C to stop)")
+            indexer.follow()
+        else:
+            started = time.monotonic()
+            added = indexer.scan()
+            print(f"Indexed {added} new packets in {time.monotonic() - started:.2f}s")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        indexer.close()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+
+# pcapng_writer.py
+# Streaming PCAP-NG output for the ProxNet sniffers, readable by Wireshark/tshark/scapy.
+#
+# One interface (IDB) per channel/frequency, nanosecond timestamps (if_tsresol = 9) and
+# enhanced packet blocks collected in memory and written in large chunks. Segments rotate
+# by size/age; every segment starts with its own section header and interface blocks so
+# it can be opened on its own.
+#
+# Link types come from the private-use range (configure a DLT_USER dissector in Wireshark):
+#   LINKTYPE_USER0 (147) nRF24:  pipe u8 | payload
+#   LINKTYPE_USER1 (148) CC1101: rssi_dbm i8 | lqi u8 | payload
+
+import sys
+import time
+import struct
+from pathlib import Path
+
+# --- Configuration ---
+BUFFER_BYTES = 256 * 1024          # Blocks collected before a write() to the file
+FLUSH_INTERVAL = 1.0               # Seconds; partly filled buffers are written at least this often
+ROTATE_BYTES = 64 * 1024 * 1024    # Start a new segment past this size (0 = never)
+ROTATE_SECONDS = 3600              # ...or after this long (0 = never)
+SNAPLEN = 0xFFFF
+APPLICATION = "ProxNet"
+
+LINKTYPE_NRF24 = 147  # LINKTYPE_USER0
+LINKTYPE_CC1101 = 148 # LINKTYPE_USER1
+NRF24_HEADER = struct.Struct('<B')
+CC1101_HEADER = struct.Struct('<bB')
+
+# --- Block Format ---
+BLOCK_SHB = 0x0A0D0D0A
+BLOCK_IDB = 0x00000001
+BLOCK_EPB = 0x00000006
+BYTE_ORDER_MAGIC = 0x1A2B3C4D
+OPT_ENDOFOPT = 0
+OPT_COMMENT = 1
+OPT_SHB_USERAPPL = 4
+OPT_IF_NAME = 2
+OPT_IF_DESCRIPTION = 3
+OPT_IF_TSRESOL = 9
+
+_BLOCK_HEAD = struct.Struct('<II')
+_TRAILER = struct.Struct('<I')
+_EPB_HEAD = struct.Struct('<IIIIIII') # type, length, interface, ts high, ts low, captured, original
+_OPTION = struct.Struct('<HH')
+_PAD = b"\0\0\0"
+
+def _pad(length):
+    return _PAD[:-length % 4]
+
+def _options(options):
+    out = bytearray()
+    for code, value in options:
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        out += _OPTION.pack(code, len(value)) + value + _pad(len(value))
+    if out:
+        out += _OPTION.pack(OPT_ENDOFOPT, 0)
+    return bytes(out)
+
+def _block(block_type, body):
+    length = _BLOCK_HEAD.size + len(body) + _TRAILER.size
+    return _BLOCK_HEAD.pack(block_type, length) + body + _TRAILER.pack(length)
+
+def section_header(application=APPLICATION):
+    return _block(BLOCK_SHB, struct.pack('<IHHq', BYTE_ORDER_MAGIC, 1, 0, -1)
+                  + _options([(OPT_SHB_USERAPPL, application)]))
+
+def interface_description(linktype, name, description=None, snaplen=SNAPLEN):
+    return _block(BLOCK_IDB, struct.pack('<HHI', linktype, 0, snaplen)
+                  + _options([(OPT_IF_NAME, name), (OPT_IF_DESCRIPTION, description), (OPT_IF_TSRESOL, b"\x09")]))
+
+def enhanced_packet(interface_id, ts_ns, data, comment=None):
+    options = _options([(OPT_COMMENT, comment)]) if comment else b""
+    length = _EPB_HEAD.size + len(data) + (-len(data) % 4) + len(options) + _TRAILER.size
+    return b"".join((
+        _EPB_HEAD.pack(BLOCK_EPB, length, interface_id, ts_ns >> 32, ts_ns & 0xFFFFFFFF, len(data), len(data)),
+        data, _pad(len(data)), options, _TRAILER.pack(length),
+    ))
+
+# --- Writer ---
+class PcapngWriter:
+    """Buffered, rotating PCAP-NG stream with one interface per channel/frequency.
+
+    Segments are named <prefix>_YYYYmmdd_HHMMSS.pcapng. interface() returns
+    a stable id for a key (channel number, frequency...) and registers the
+    IDB on first use; every rotated segment replays all IDBs so ids stay
+    valid across segments. Blocks are packed into an in-memory buffer and
+    handed to the file in BUFFER_BYTES chunks, so a packet costs one
+    struct.pack and a bytearray append rather than a syscall.
+    """
+
+    def __init__(self, prefix, application=APPLICATION, rotate_bytes=ROTATE_BYTES, rotate_seconds=ROTATE_SECONDS,
+                 buffer_bytes=BUFFER_BYTES, flush_interval=FLUSH_INTERVAL):
+        self.prefix = Path(prefix)
+        self.application = application
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.buffer_bytes = buffer_bytes
+        self.flush_interval = flush_interval
+        self.interfaces = [] # IDB bytes in interface-id order
+        self.interface_ids = {}
+        self.buf = bytearray()
+        self.file = None
+        self.path = None
+        self.size = 0
+        self.opened_at = 0.0
+        self.last_flush = time.monotonic()
+        self.packets = 0
+        self.segments = 0
+        self._open()
+
+    def _segment_path(self):
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        path = self.prefix.with_name(f"{self.prefix.name}_{stamp}.pcapng")
+        n = 1
+        while path.exists(): # Several rotations in one second
+            path = self.prefix.with_name(f"{self.prefix.name}_{stamp}-{n}.pcapng")
+            n += 1
+        return path
+
+    def _open(self):
+        self.prefix.parent.mkdir(parents=True, exist_ok=True)
+        self.path = self._segment_path()
+        self.file = open(self.path, 'wb', buffering=0) # Our own buffer already batches writes
+        self.opened_at = time.monotonic()
+        self.size = 0
+        self.segments += 1
+        self._append(section_header(self.application))
+        for idb in self.interfaces:
+            self._append(idb)
+
+    def _append(self, block):
+        self.buf += block
+        self.size += len(block)
+
+    def _rotate(self):
+        self.flush()
+        self.file.close()
+        print(f"PCAP-NG segment closed: {self.path}")
+        self._open()
+
+    def interface(self, key, linktype, name, description=None):
+        """Interface id for `key`, adding an IDB to the stream the first time it is seen."""
+        interface_id = self.interface_ids.get(key)
+        if interface_id is None:
+            interface_id = len(self.interfaces)
+            idb = interface_description(linktype, name, description)
+            self.interfaces.append(idb)
+            self.interface_ids[key] = interface_id
+            self._append(idb)
+        return interface_id
+
+    def write(self, interface_id, ts_ns, data, comment=None):
+        """Queues one packet; ts_ns is wall-clock epoch nanoseconds."""
+        if ((self.rotate_bytes and self.size >= self.rotate_bytes)
+                or (self.rotate_seconds and time.monotonic() - self.opened_at >= self.rotate_seconds)):
+            self._rotate()
+        self._append(enhanced_packet(interface_id, ts_ns, data, comment))
+        self.packets += 1
+        if len(self.buf) >= self.buffer_bytes:
+            self.flush()
+
+    def maybe_flush(self):
+        if self.buf and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.buf:
+            self.file.write(self.buf)
+            self.buf.clear()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        if self.file:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+# --- Reader ---
+def read_pcapng(path):
+    """Yields (interface, ts_ns, data, comment) for every packet block in a little-endian PCAP-NG file.
+
+    `interface` is a dict with linktype, name and description. Good enough for
+    our own segments and for reading them back in the analysis scripts; not a
+    general-purpose parser.
+    """
+    interfaces = []
+    with open(path, 'rb') as f:
+        while True:
+            head = f.read(_BLOCK_HEAD.size)
+            if len(head) < _BLOCK_HEAD.size:
+                return
+            block_type, length = _BLOCK_HEAD.unpack(head)
+            body = f.read(length - _BLOCK_HEAD.size - _TRAILER.size)
+            f.read(_TRAILER.size)
+            if block_type == BLOCK_SHB:
+                if struct.unpack_from('<I', body)[0] != BYTE_ORDER_MAGIC:
+                    raise ValueError(f"{path}: only little-endian PCAP-NG sections are supported")
+                interfaces = [] # Interface ids are per section
+            elif block_type == BLOCK_IDB:
+                linktype, _, _ = struct.unpack_from('<HHI', body)
+                options = _parse_options(body, 8)
+                tsresol = options.get(OPT_IF_TSRESOL, b"\x06")[0]
+                interfaces.append({
+                    'linktype': linktype,
+                    'name': options.get(OPT_IF_NAME, b"").decode('utf-8', 'replace'),
+                    'description': options.get(OPT_IF_DESCRIPTION, b"").decode('utf-8', 'replace'),
+                    'ns_per_tick': 10 ** (9 - tsresol) if tsresol <= 9 else 1,
+                })
+            elif block_type == BLOCK_EPB:
+                interface_id, ts_high, ts_low, captured, _ = struct.unpack_from('<IIIII', body)
+                interface = interfaces[interface_id]
+                data = body[20:20 + captured]
+                comment = _parse_options(body, 20 + captured + (-captured % 4)).get(OPT_COMMENT)
+                yield (interface, ((ts_high << 32) | ts_low) * interface['ns_per_tick'], data,
+                       comment.decode('utf-8', 'replace') if comment else None)
+
+def _parse_options(body, offset):
+    options = {}
+    while offset + _OPTION.size <= len(body):
+        code, length = _OPTION.unpack_from(body, offset)
+        if code == OPT_ENDOFOPT:
+            break
+        offset += _OPTION.size
+        options[code] = bytes(body[offset:offset + length])
+        offset += length + (-length % 4)
+    return options
+
+if __name__ == "__main__":
+    # Quick look at a segment: python3 pcapng_writer.py capture.pcapng
+    for interface, ts_ns, data, comment in read_pcapng(sys.argv[1]):
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts_ns / 1e9))
+        print(f"[{stamp}.{ts_ns % 1_000_000_000:09d}] {interface['name']} ({len(data)} bytes): {data.hex().upper()}"
+              + (f"  # {comment}" if comment else ""))
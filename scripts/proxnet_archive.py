@@ -0,0 +1,637 @@
+#!/usr/bin/env python3
+
+# proxnet_archive.py
+# Retention for proxnet_log.db: rows older than RETENTION_DAYS move out of the hot
+# database into compressed, per-day columnar archive files.
+#
+# Each local day of the scans and packets tables becomes one NumPy .npz file per
+# pass (one array per column, strings dictionary-encoded, NULLs as a mask) under
+# ARCHIVE_DIR. A small SQLite index records which file covers which table, day,
+# time range and id range, so queries only open the files they need and only
+# the columns they filter on. Rows are deleted from the hot DB only after their
+# file is written and indexed, in short chunks so the logger keeps the lock; a
+# pass that is interrupted is finished by the next one. Freed pages are then
+# returned to the filesystem with incremental vacuum steps, and rotated CSV
+# segments past the retention window are removed.
+#
+# web_ui.py reads through ArchiveScanReader/merge_scans, so /api/scans pages and
+# /api/export streams continue from the hot DB into the archive without the client noticing.
+#
+#   python3 proxnet_archive.py               # one pass: archive, delete, vacuum
+#   python3 proxnet_archive.py --follow      # keep running (web_ui.py starts it via the supervisor)
+#   python3 proxnet_archive.py --list        # print the archive index
+#   python3 proxnet_archive.py --enable-incremental-vacuum  # one-off full VACUUM of an older database
+
+import os
+import sys
+import time
+import signal
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+import proxnet_db
+from proxnet_metrics import Metrics
+
+# --- Configuration ---
+PROJECT_DIR = Path.home() / "proxnet"
+LOG_DIR = PROJECT_DIR / "logs"
+DB_FILE = LOG_DIR / "proxnet_log.db"
+CSV_FILE = LOG_DIR / "proxnet_log.csv"   # Rotated segments are proxnet_log-<stamp>.csv[.gz]
+ARCHIVE_DIR = PROJECT_DIR / "archive"
+ARCHIVE_INDEX = ARCHIVE_DIR / "index.db" # Lives with the files so the directory can be moved as a whole
+RETENTION_DAYS = 14          # Whole local days kept in the hot DB (today counts as one)
+CSV_RETENTION_DAYS = 14      # Rotated CSV segments older than this are deleted (0 = keep forever)
+ARCHIVE_INTERVAL = 3600.0    # Seconds between passes in --follow mode
+READ_CHUNK_ROWS = 20000      # Rows fetched per step while building a day file
+SCAN_CHUNK_ROWS = 1000       # Archived rows turned into dicts at a time when reading them back
+DELETE_CHUNK_ROWS = 5000     # Rows deleted from the hot DB per transaction...
+DELETE_PAUSE = 0.05          # ...with this many seconds between them so writers get the lock
+VACUUM_STEP_PAGES = 256      # Pages returned to the filesystem per incremental_vacuum step
+VACUUM_PAUSE = 0.1
+INDEX_SCHEMA_VERSION = 1
+
+# Column name -> kind, in table order. 'int' and 'bytes' columns get a NULL mask
+# when needed, 'float' uses NaN, 'str' is dictionary-encoded with code -1 for NULL.
+ARCHIVE_TABLES = {
+    'scans': {
+        'id': 'int', 'ts_us': 'int', 'timestamp': 'str', 'module_type': 'str', 'protocol': 'str',
+        'uid': 'str', 'uid_len': 'int', 'mac': 'str', 'name': 'str', 'rssi': 'int', 'seen_count': 'int',
+        'first_seen_us': 'int', 'rssi_min': 'int', 'rssi_max': 'int', 'rssi_mean': 'float',
+    },
+    'packets': {
+        'id': 'int', 'ts_us': 'int', 'source': 'str', 'channel': 'int', 'freq_khz': 'int', 'pipe': 'int',
+        'rssi': 'int', 'lqi': 'int', 'payload': 'bytes',
+    },
+}
+
+INDEX_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS archives (
+        path TEXT PRIMARY KEY,       -- file name inside the archive directory
+        source_table TEXT NOT NULL,
+        day TEXT NOT NULL,           -- local date, YYYY-MM-DD
+        part INTEGER NOT NULL,       -- later passes over the same day (late rows) add parts
+        rows INTEGER NOT NULL,
+        first_ts_us INTEGER NOT NULL,
+        last_ts_us INTEGER NOT NULL,
+        min_id INTEGER NOT NULL,
+        max_id INTEGER NOT NULL,
+        bytes INTEGER NOT NULL,
+        created_us INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_archives_table_ts ON archives (source_table, last_ts_us);
+    CREATE INDEX IF NOT EXISTS idx_archives_table_day ON archives (source_table, day);
+'''
+
+def setup_index(index_file=ARCHIVE_INDEX):
+    """Opens (creating if needed) the archive index database."""
+    Path(index_file).parent.mkdir(parents=True, exist_ok=True)
+    conn = proxnet_db.connect(index_file)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < INDEX_SCHEMA_VERSION:
+        conn.executescript(INDEX_SCHEMA)
+        conn.execute(f"PRAGMA user_version = {INDEX_SCHEMA_VERSION}")
+        conn.commit()
+    return conn
+
+# --- Day Boundaries (local time, like the timestamp column and CSV rotation) ---
+def day_start_us(ts_us):
+    day = datetime.fromtimestamp(ts_us / 1_000_000).replace(hour=0, minute=0, second=0, microsecond=0)
+    return int(day.timestamp() * 1_000_000)
+
+def next_day_us(day_us):
+    day = datetime.fromtimestamp(day_us / 1_000_000) + timedelta(days=1)
+    return int(day.replace(hour=0, minute=0, second=0, microsecond=0).timestamp() * 1_000_000)
+
+def retention_cutoff_us(days=RETENTION_DAYS, now_us=None):
+    """Local midnight starting the oldest day that stays hot."""
+    today = datetime.fromtimestamp((now_us or proxnet_db.now_us()) / 1_000_000).date()
+    oldest = datetime.combine(today - timedelta(days=max(days, 1) - 1), datetime.min.time())
+    return int(oldest.timestamp() * 1_000_000)
+
+# --- Columnar Encoding ---
+class ColumnBuilder:
+    """Accumulates one column of SQLite values chunk by chunk into compact NumPy arrays."""
+
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.chunks = []
+        self.nulls = []
+        self.any_null = False
+        self.dictionary = {} # str columns: value -> code
+        self.offsets = [0]   # bytes columns: running end offset of each value
+
+    def add(self, values):
+        if self.kind == 'str':
+            codes = self.dictionary
+            self.chunks.append(np.fromiter((-1 if v is None else codes.setdefault(v, len(codes)) for v in values),
+                                           dtype=np.int32, count=len(values)))
+            return
+        if self.kind == 'float':
+            self.chunks.append(np.array([np.nan if v is None else v for v in values], dtype=np.float64))
+            return
+        null = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+        self.any_null = self.any_null or bool(null.any())
+        self.nulls.append(null)
+        if self.kind == 'int':
+            self.chunks.append(np.fromiter((0 if v is None else v for v in values), dtype=np.int64, count=len(values)))
+            return
+        data = b"".join(b"" if v is None else bytes(v) for v in values)
+        self.chunks.append(np.frombuffer(data, dtype=np.uint8))
+        ends = np.cumsum([0 if v is None else len(v) for v in values], dtype=np.int64) + self.offsets[-1]
+        self.offsets.extend(ends.tolist())
+
+    def arrays(self):
+        """{npz key: array} for this column."""
+        name = self.name
+        empty = {'str': np.int32, 'float': np.float64, 'int': np.int64, 'bytes': np.uint8}[self.kind]
+        values = np.concatenate(self.chunks) if self.chunks else np.zeros(0, dtype=empty)
+        if self.kind == 'str':
+            return {f"{name}__codes": values, f"{name}__values": np.array(list(self.dictionary), dtype=str)}
+        out = {}
+        if self.kind == 'bytes':
+            out[f"{name}__data"] = values
+            out[f"{name}__offsets"] = np.array(self.offsets, dtype=np.int64)
+        else:
+            out[name] = values
+        if self.any_null:
+            out[f"{name}__null"] = np.concatenate(self.nulls)
+        return out
+
+class ArchiveFile:
+    """Lazy, column-at-a-time access to one archive file (np.load only inflates the members asked for)."""
+
+    def __init__(self, path, table):
+        self.path = Path(path)
+        self.kinds = ARCHIVE_TABLES[table]
+        self.npz = np.load(self.path)
+        self.cache = {}
+
+    def close(self):
+        self.npz.close()
+
+    def raw(self, key):
+        if key not in self.cache:
+            self.cache[key] = self.npz[key] if key in self.npz.files else None
+        return self.cache[key]
+
+    def column(self, name):
+        """The whole column as an array: int64 / float64 / str codes (int32), bytes as an offsets array."""
+        kind = self.kinds[name]
+        if kind == 'str':
+            return self.raw(f"{name}__codes")
+        if kind == 'bytes':
+            return self.raw(f"{name}__offsets")
+        return self.raw(name)
+
+    def null(self, name):
+        kind = self.kinds[name]
+        if kind == 'str':
+            return self.column(name) < 0
+        if kind == 'float':
+            return np.isnan(self.column(name))
+        mask = self.raw(f"{name}__null")
+        return mask if mask is not None else np.zeros(len(self.column('id')), dtype=bool)
+
+    def codes_for(self, name, values):
+        """Dictionary codes of `values` in a str column (values missing from this file are skipped)."""
+        dictionary = self.raw(f"{name}__values")
+        return np.nonzero(np.isin(dictionary, list(values)))[0].astype(np.int32)
+
+    def rows(self, order):
+        """Dicts (same keys and types as sqlite3 rows) for the row positions in `order`."""
+        columns = []
+        for name, kind in self.kinds.items():
+            if kind == 'str':
+                codes = self.column(name)[order]
+                dictionary = self.raw(f"{name}__values")
+                values = [None if c < 0 else str(dictionary[c]) for c in codes.tolist()]
+            elif kind == 'float':
+                values = [None if v != v else v for v in self.column(name)[order].tolist()]
+            elif kind == 'bytes':
+                offsets, data = self.column(name), self.raw(f"{name}__data")
+                values = [data[offsets[i]:offsets[i + 1]].tobytes() for i in order.tolist()]
+            else:
+                values = self.column(name)[order].tolist()
+            if kind in ('int', 'bytes') and self.raw(f"{name}__null") is not None:
+                null = self.raw(f"{name}__null")[order].tolist()
+                values = [None if n else v for v, n in zip(values, null)]
+            columns.append(values)
+        names = list(self.kinds)
+        return [dict(zip(names, row)) for row in zip(*columns)]
+
+def write_archive(path, table, cursor, chunk_rows=READ_CHUNK_ROWS):
+    """Writes every row a SELECT of ARCHIVE_TABLES[table]'s columns returns into one .npz.
+
+    The cursor is drained in chunks so only the final arrays are ever held
+    in memory. Returns those arrays by npz key (empty, and no file written,
+    if there were no rows).
+    """
+    builders = [ColumnBuilder(name, kind) for name, kind in ARCHIVE_TABLES[table].items()]
+    count = 0
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        for index, builder in enumerate(builders):
+            builder.add([row[index] for row in rows])
+        count += len(rows)
+    if not count:
+        return {}
+    arrays = {}
+    for builder in builders:
+        arrays.update(builder.arrays())
+    tmp = Path(f"{path}.tmp")
+    with open(tmp, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno()) # The hot rows are deleted next; the file must really be on the card
+    os.replace(tmp, path)
+    return arrays
+
+# --- Archiver ---
+class Archiver:
+    """Moves whole days older than the retention window from proxnet_log.db into the archive."""
+
+    def __init__(self, db_file=DB_FILE, archive_dir=ARCHIVE_DIR, retention_days=RETENTION_DAYS,
+                 csv_retention_days=CSV_RETENTION_DAYS, csv_file=CSV_FILE):
+        self.db_file = Path(db_file)
+        self.archive_dir = Path(archive_dir)
+        self.retention_days = retention_days
+        self.csv_retention_days = csv_retention_days
+        self.csv_file = Path(csv_file)
+        proxnet_db.setup_database(self.db_file)
+        self.conn = proxnet_db.connect(self.db_file)
+        self.index = setup_index(self.archive_dir / ARCHIVE_INDEX.name)
+        self.rows_archived = {table: 0 for table in ARCHIVE_TABLES}
+        self.rows_deleted = {table: 0 for table in ARCHIVE_TABLES}
+        self.files_written = 0
+        self.bytes_written = 0
+        self.pages_vacuumed = 0
+        self.csv_removed = 0
+        self.warned_vacuum = False
+        self.metrics = Metrics('archiver')
+        for table in ARCHIVE_TABLES:
+            self.metrics.counter('archive_rows_total', "Rows written to archive files",
+                                 lambda table=table: self.rows_archived[table], table=table)
+            self.metrics.counter('archive_deleted_rows_total', "Archived rows deleted from the hot DB",
+                                 lambda table=table: self.rows_deleted[table], table=table)
+        self.metrics.counter('archive_files_total', "Archive files written", lambda: self.files_written)
+        self.metrics.counter('archive_bytes_total', "Compressed bytes written to archive files", lambda: self.bytes_written)
+        self.metrics.counter('vacuum_pages_total', "Pages returned to the filesystem", lambda: self.pages_vacuumed)
+        self.metrics.gauge('db_freelist_pages', "Free pages waiting to be vacuumed",
+                           lambda: self.conn.execute("PRAGMA freelist_count").fetchone()[0])
+        self.pass_latency = self.metrics.histogram('archive_pass_seconds', "Time for one archive/delete/vacuum pass")
+
+    def close(self):
+        self.metrics.write()
+        self.index.close()
+        self.conn.close()
+
+    def run_once(self, now_us=None, stop_event=None):
+        started = time.perf_counter_ns()
+        cutoff_us = retention_cutoff_us(self.retention_days, now_us)
+        for table in ARCHIVE_TABLES:
+            while not (stop_event and stop_event.is_set()):
+                oldest = self.conn.execute(f"SELECT MIN(ts_us) FROM {table} WHERE ts_us < ?", (cutoff_us,)).fetchone()[0]
+                if oldest is None:
+                    break
+                self.archive_day(table, day_start_us(oldest), stop_event)
+        self.prune_csv(now_us)
+        self.vacuum(stop_event)
+        self.pass_latency.observe_ns(started)
+        self.metrics.write()
+
+    def archive_day(self, table, day_us, stop_event=None):
+        """Writes the not-yet-archived rows of one local day to a new part file, then deletes the day's archived rows."""
+        end_us = next_day_us(day_us)
+        day = datetime.fromtimestamp(day_us / 1_000_000).strftime('%Y-%m-%d')
+        archived_max_id, parts = self.index.execute(
+            "SELECT COALESCE(MAX(max_id), 0), COUNT(*) FROM archives WHERE source_table = ? AND day = ?",
+            (table, day)).fetchone()
+        # One statement is one snapshot: rows committed meanwhile get higher ids and wait for the next pass
+        cursor = self.conn.execute(f'''
+            SELECT {', '.join(ARCHIVE_TABLES[table])} FROM {table}
+            WHERE ts_us >= ? AND ts_us < ? AND id > ? ORDER BY ts_us, id
+        ''', (day_us, end_us, archived_max_id))
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        path = self.archive_dir / f"{table}-{day}-{parts}.npz"
+        arrays = write_archive(path, table, cursor)
+        if arrays:
+            ts, ids = arrays['ts_us'], arrays['id']
+            count = len(ids)
+            first_ts, last_ts, min_id, max_id = int(ts.min()), int(ts.max()), int(ids.min()), int(ids.max())
+            size = path.stat().st_size
+            with self.index:
+                self.index.execute('''
+                    INSERT OR REPLACE INTO archives (path, source_table, day, part, rows, first_ts_us, last_ts_us,
+                                                     min_id, max_id, bytes, created_us)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (path.name, table, day, parts, count, first_ts, last_ts, min_id, max_id, size, proxnet_db.now_us()))
+            archived_max_id = max_id
+            self.rows_archived[table] += count
+            self.files_written += 1
+            self.bytes_written += size
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] ARCHIVE: {table} {day}: {count} rows -> {path.name} "
+                  f"({size} bytes)")
+        deleted = self.delete_archived(table, day_us, end_us, archived_max_id, stop_event)
+        if deleted:
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] ARCHIVE: {table} {day}: {deleted} rows removed from the hot DB")
+
+    def delete_archived(self, table, day_us, end_us, max_id, stop_event=None):
+        """Deletes the day's rows with id <= max_id (all of them archived) a chunk per transaction."""
+        total = 0
+        while not (stop_event and stop_event.is_set()):
+            with self.conn:
+                deleted = self.conn.execute(f'''
+                    DELETE FROM {table} WHERE id IN (
+                        SELECT id FROM {table} WHERE ts_us >= ? AND ts_us < ? AND id <= ? LIMIT ?)
+                ''', (day_us, end_us, max_id, DELETE_CHUNK_ROWS)).rowcount
+            total += deleted
+            self.rows_deleted[table] += deleted
+            if deleted < DELETE_CHUNK_ROWS:
+                break
+            time.sleep(DELETE_PAUSE)
+        return total
+
+    def vacuum(self, stop_event=None):
+        """Returns free pages to the filesystem a few at a time (needs auto_vacuum=INCREMENTAL)."""
+        if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            if not self.warned_vacuum and self.conn.execute("PRAGMA freelist_count").fetchone()[0]:
+                print("ARCHIVE_WARN: proxnet_log.db predates incremental vacuum; freed pages are reused but the file "
+                      "won't shrink. Run proxnet_archive.py --enable-incremental-vacuum once to convert it.")
+                self.warned_vacuum = True
+            return
+        freed = 0
+        free = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        while free and not (stop_event and stop_event.is_set()):
+            # executescript steps the pragma to completion; execute() would free a single page
+            self.conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES});")
+            remaining = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+            freed += free - remaining
+            self.pages_vacuumed += free - remaining
+            if remaining >= free:
+                break
+            free = remaining
+            time.sleep(VACUUM_PAUSE)
+        if freed:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall() # Otherwise the WAL keeps the space
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] ARCHIVE: vacuumed {freed} pages")
+
+    def prune_csv(self, now_us=None):
+        if not self.csv_retention_days:
+            return
+        cutoff = retention_cutoff_us(self.csv_retention_days, now_us) / 1_000_000
+        for path in self.csv_file.parent.glob(f"{self.csv_file.stem}-*{self.csv_file.suffix}*"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    self.csv_removed += 1
+                    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] ARCHIVE: removed old CSV segment {path.name}")
+            except FileNotFoundError:
+                pass
+
+    def follow(self, interval=ARCHIVE_INTERVAL, stop_event=None):
+        while not (stop_event and stop_event.is_set()):
+            self.run_once(stop_event=stop_event)
+            deadline = time.monotonic() + interval
+            while time.monotonic() < deadline and not (stop_event and stop_event.is_set()):
+                time.sleep(min(1.0, interval))
+
+def enable_incremental_vacuum(db_file=DB_FILE):
+    """One-off conversion of an older database: a full VACUUM, which locks it for the duration."""
+    conn = proxnet_db.connect(db_file)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            print("Incremental vacuum is already enabled.")
+            return
+        print(f"Rebuilding {db_file} with auto_vacuum=INCREMENTAL; stop the logger and bus first...")
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        print("Done.")
+    finally:
+        conn.close()
+
+# --- Queries (used by web_ui.py) ---
+def query_archives(index, table=None):
+    where, params = ("WHERE source_table = ?", [table]) if table else ("", [])
+    return [dict(row) for row in index.execute(f'''
+        SELECT path, source_table, day, part, rows, first_ts_us, last_ts_us, min_id, max_id, bytes, created_us
+        FROM archives {where} ORDER BY source_table, first_ts_us
+    ''', params)]
+
+class ArchiveScanReader:
+    """Archived scans matching a filter dict, ordered by (ts_us, id), one day file at a time.
+
+    Newest first unless newest_first=False. `filters` uses the keys of
+    web_ui.parse_scan_filters. Files are picked from the index by time range
+    and cursor and are only opened when the reader gets to them; bound() is
+    the ts_us of the next row at best, so a merge with the hot DB can defer
+    opening any file at all. Matches are sorted as column arrays and only
+    SCAN_CHUNK_ROWS of them at a time become dicts.
+    """
+
+    def __init__(self, filters, cursor=None, archive_dir=ARCHIVE_DIR, newest_first=True):
+        self.archive_dir = Path(archive_dir)
+        self.filters = filters
+        self.cursor = cursor
+        self.newest_first = newest_first
+        self.files = []
+        self.archives = [] # Open files of the current day
+        self.pending = None # (archive number, row position, ts_us) arrays of the day's matches, in order
+        self.next = 0
+        self.buffer = []
+        index_file = self.archive_dir / ARCHIVE_INDEX.name
+        if index_file.is_file():
+            where, params = ["source_table = 'scans'"], []
+            if filters.get('since_us') is not None:
+                where.append("last_ts_us >= ?"); params.append(filters['since_us'])
+            if filters.get('until_us') is not None:
+                where.append("first_ts_us < ?"); params.append(filters['until_us'])
+            if cursor:
+                where.append("first_ts_us <= ?" if newest_first else "last_ts_us >= ?"); params.append(cursor[0])
+            order = "last_ts_us DESC" if newest_first else "first_ts_us"
+            index = proxnet_db.connect(index_file)
+            try:
+                self.files = [dict(row) for row in index.execute(f'''
+                    SELECT path, first_ts_us, last_ts_us FROM archives WHERE {' AND '.join(where)} ORDER BY {order}
+                ''', params)]
+            finally:
+                index.close()
+
+    def bound(self):
+        if self.buffer:
+            return self.buffer[-1]['ts_us']
+        if self.pending is not None:
+            return int(self.pending[2][self.next])
+        if not self.files:
+            return None
+        return self.files[0]['last_ts_us' if self.newest_first else 'first_ts_us']
+
+    def _overlaps(self, entry, batch):
+        if self.newest_first:
+            return entry['last_ts_us'] >= min(other['first_ts_us'] for other in batch)
+        return entry['first_ts_us'] <= max(other['last_ts_us'] for other in batch)
+
+    def _load(self):
+        # Parts of one day (late rows) can overlap in time, so take every file reaching into the first one's range
+        batch = [self.files.pop(0)]
+        while self.files and self._overlaps(self.files[0], batch):
+            batch.append(self.files.pop(0))
+        sources, positions, ts, ids = [], [], [], []
+        for entry in batch:
+            try:
+                archive = ArchiveFile(self.archive_dir / entry['path'], 'scans')
+                found = np.nonzero(self._mask(archive))[0]
+            except (OSError, ValueError) as e:
+                print(f"ARCHIVE_WARN: Could not read {entry['path']}: {e}", file=sys.stderr)
+                continue
+            if not len(found):
+                archive.close()
+                continue
+            sources.append(np.full(len(found), len(self.archives), dtype=np.int32))
+            positions.append(found)
+            ts.append(archive.column('ts_us')[found])
+            ids.append(archive.column('id')[found])
+            self.archives.append(archive)
+        if not self.archives:
+            return
+        ts = np.concatenate(ts)
+        order = np.lexsort((np.concatenate(ids), ts))
+        if self.newest_first:
+            order = order[::-1]
+        self.pending = (np.concatenate(sources)[order], np.concatenate(positions)[order], ts[order])
+        self.next = 0
+
+    def _fill(self):
+        sources, positions, _ = self.pending
+        chunk = slice(self.next, self.next + SCAN_CHUNK_ROWS)
+        sources, positions = sources[chunk], positions[chunk]
+        rows = [None] * len(sources)
+        for number, archive in enumerate(self.archives):
+            slots = np.nonzero(sources == number)[0]
+            for slot, row in zip(slots.tolist(), archive.rows(positions[slots])):
+                rows[slot] = row
+        rows.reverse() # The next row to return goes last so it pops off the end
+        self.buffer = rows
+        self.next += len(sources)
+        if self.next >= len(self.pending[0]):
+            self._release()
+
+    def _release(self):
+        for archive in self.archives:
+            archive.close()
+        self.archives = []
+        self.pending = None
+
+    def close(self):
+        """Closes the files of a day the caller stopped reading part-way through."""
+        self._release()
+        self.files = []
+        self.buffer = []
+
+    def _mask(self, archive):
+        filters = self.filters
+        ts = archive.column('ts_us')
+        mask = np.ones(len(ts), dtype=bool)
+        if filters.get('since_us') is not None:
+            mask &= ts >= filters['since_us']
+        if filters.get('until_us') is not None:
+            mask &= ts < filters['until_us']
+        if self.cursor:
+            ts_us, row_id = self.cursor
+            if self.newest_first:
+                mask &= (ts < ts_us) | ((ts == ts_us) & (archive.column('id') < row_id))
+            else:
+                mask &= (ts > ts_us) | ((ts == ts_us) & (archive.column('id') > row_id))
+        for column in ('module_type', 'protocol', 'mac', 'uid'):
+            if filters.get(column):
+                wanted = filters[column] if isinstance(filters[column], list) else [filters[column]]
+                mask &= np.isin(archive.column(column), archive.codes_for(column, wanted))
+        if filters.get('min_rssi') is not None:
+            mask &= ~archive.null('rssi') & (archive.column('rssi') >= filters['min_rssi'])
+        return mask
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self.buffer:
+            if self.pending is not None:
+                self._fill()
+            elif self.files:
+                self._load()
+            else:
+                raise StopIteration
+        return self.buffer.pop()
+
+def merge_scans(hot_rows, archive):
+    """Hot DB rows and an ArchiveScanReader as one stream, in the reader's (ts_us, id) order.
+
+    `hot_rows` must already be in that order. A row that is in both
+    (archived but not yet deleted) comes out once. Archive files are only
+    opened once the hot rows get past them.
+    """
+    sign = 1 if archive.newest_first else -1
+    def rank(row): # Larger comes out first
+        return sign * row['ts_us'], sign * row['id']
+    hot = next(hot_rows, None)
+    cold = None
+    last_key = None
+    while True:
+        if cold is None:
+            bound = archive.bound()
+            if hot is not None and (bound is None or sign * hot['ts_us'] > sign * bound):
+                row, hot = hot, next(hot_rows, None)
+            else:
+                cold = next(archive, None)
+                if cold is None and hot is None:
+                    return
+                continue
+        elif hot is not None and rank(hot) >= rank(cold):
+            row, hot = hot, next(hot_rows, None)
+        else:
+            row, cold = cold, None
+        key = (row['ts_us'], row['id'])
+        if key != last_key:
+            last_key = key
+            yield row
+
+def handle_sigterm(signum, frame):
+    raise SystemExit(0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old proxnet_log.db rows into compressed per-day archive files")
+    parser.add_argument("--follow", action="store_true", help=f"Run a pass every {ARCHIVE_INTERVAL:g}s until stopped")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS, help="Days kept in the hot DB")
+    parser.add_argument("--csv-days", type=int, default=CSV_RETENTION_DAYS, help="Days of rotated CSV segments kept (0 = all)")
+    parser.add_argument("--db", type=Path, default=DB_FILE)
+    parser.add_argument("--archive-dir", type=Path, default=ARCHIVE_DIR)
+    parser.add_argument("--list", action="store_true", help="Print the archive index and exit")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="Convert an older database so deleted rows shrink the file (full VACUUM) and exit")
+    args = parser.parse_args()
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum(args.db)
+        sys.exit(0)
+    if args.list:
+        index = setup_index(args.archive_dir / ARCHIVE_INDEX.name)
+        for entry in query_archives(index):
+            print(f"{entry['path']:<32} {entry['rows']:>9} rows {entry['bytes']:>11} bytes  "
+                  f"{proxnet_db.format_ts(entry['first_ts_us'])} .. {proxnet_db.format_ts(entry['last_ts_us'])}")
+        index.close()
+        sys.exit(0)
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    archiver = Archiver(args.db, args.archive_dir, args.days, args.csv_days)
+    print(f"Archiving {args.db} rows older than {args.days} day(s) into {args.archive_dir}")
+    try:
+        if args.follow:
+            archiver.follow()
+        else:
+            archiver.run_once()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        archiver.close()
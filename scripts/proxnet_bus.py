@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+
+# proxnet_bus.py
+# Local ingestion bus: every scanner publishes compact records to one Unix
+# datagram socket, and this daemon is the single consumer that writes them to
+# proxnet_log.db (through the same batched DBWriter, CSV sink and sighting
+# pipeline the ESP32 logger uses) and fans them out to live subscribers.
+#
+# Producers never block: the publisher socket is non-blocking. Datagrams the
+# daemon can't take yet wait in a small in-memory backlog that later flushes
+# retry; past that (or with no daemon running) they are dropped and counted.
+#
+# Records get a bus sequence number in arrival order, so the daemon's output
+# is one ordered stream across all scanners.
+#
+# Datagram: header (magic, version, source, producer pid, datagram seq) followed
+# by records of (kind, payload length, ts_us, payload):
+#   KIND_SCAN    ESP32 message dict as compact JSON
+#   KIND_NRF24   channel u8, pipe u8, payload
+#   KIND_CC1101  frequency kHz u32, RSSI dBm i8, LQI u8, payload
+#
+# Subscribers connect to BUS_SUBSCRIBE_SOCKET and read one JSON object per
+# line; one that stops reading is disconnected rather than slowing the bus.
+#
+#   python3 proxnet_bus.py              # run the daemon (web_ui.py starts it via the supervisor)
+#   python3 proxnet_bus.py --subscribe  # print the live stream
+
+import os
+import sys
+import json
+import time
+import errno
+import signal
+import socket
+import struct
+import argparse
+import selectors
+from collections import deque
+from pathlib import Path
+
+import proxnet_db
+from proxnet_metrics import Metrics, Histogram, SIZE_BUCKETS
+
+# --- Configuration ---
+PROJECT_DIR = Path.home() / "proxnet"
+RUN_DIR = PROJECT_DIR / "run"
+BUS_SOCKET = RUN_DIR / "bus.sock"                  # Producers send datagrams here
+BUS_SUBSCRIBE_SOCKET = RUN_DIR / "bus_events.sock" # Live JSON-lines stream for subscribers
+DB_FILE = PROJECT_DIR / "logs" / "proxnet_log.db"
+BUS_MAX_DATAGRAM = 16 * 1024  # Records are packed into datagrams up to this size...
+BUS_FLUSH_INTERVAL = 0.05     # ...or sent this many seconds after the first pending one
+BUS_BACKLOG = 64              # Datagrams a publisher holds for retry while the daemon's queue is full
+BUS_RECV_BUFFER = 4 * 1024 * 1024 # Daemon socket buffer: seconds of burst at sniffer rates
+SUBSCRIBER_BUFFER = 1024 * 1024   # Unsent bytes a subscriber may fall behind before it is dropped
+STATS_INTERVAL = 60.0
+
+# --- Wire Format ---
+BUS_MAGIC = b"PB"
+BUS_VERSION = 1
+DATAGRAM_HEADER = struct.Struct('<2sBBII')  # magic, version, source, pid, datagram seq
+RECORD_HEADER = struct.Struct('<BHq')       # kind, payload length, ts_us
+NRF24_RECORD = struct.Struct('<BB')         # channel, pipe
+CC1101_RECORD = struct.Struct('<IbB')       # frequency kHz, RSSI dBm, LQI
+
+KIND_SCAN, KIND_NRF24, KIND_CC1101 = 1, 2, 3
+KIND_NAMES = {KIND_SCAN: 'scan', KIND_NRF24: 'nrf24', KIND_CC1101: 'cc1101'}
+SOURCES = {'esp32': 1, 'nrf24': 2, 'cc1101': 3}
+SOURCE_NAMES = {value: name for name, value in SOURCES.items()}
+
+# --- Producer Side ---
+class BusPublisher:
+    """Packs records into datagrams and sends them without ever blocking.
+
+    Not thread-safe: give each producing thread its own publisher. Call
+    flush() (or maybe_flush()) once per burst; publish() only sends by
+    itself when a datagram fills up.
+    """
+
+    def __init__(self, source, path=BUS_SOCKET, max_datagram=BUS_MAX_DATAGRAM, flush_interval=BUS_FLUSH_INTERVAL,
+                 max_backlog=BUS_BACKLOG):
+        self.source = SOURCES[source]
+        self.path = str(path)
+        self.max_datagram = max_datagram
+        self.flush_interval = flush_interval
+        self.max_backlog = max_backlog
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.buf = bytearray(DATAGRAM_HEADER.size)
+        self.backlog = deque() # (datagram, record count) not yet accepted by the daemon
+        self.pending = 0
+        self.first_pending = None
+        self.seq = 0
+        self.published = 0
+        self.dropped = 0
+        self.last_error = None
+
+    def publish(self, kind, ts_us, payload):
+        size = RECORD_HEADER.size + len(payload)
+        if DATAGRAM_HEADER.size + size > self.max_datagram:
+            self.dropped += 1 # Can never fit; larger than any real scanner record
+            return
+        if len(self.buf) + size > self.max_datagram:
+            self.flush()
+        self.buf += RECORD_HEADER.pack(kind, len(payload), ts_us)
+        self.buf += payload
+        self.pending += 1
+        if self.first_pending is None:
+            self.first_pending = time.monotonic()
+
+    def publish_scan(self, ts_us, data):
+        self.publish(KIND_SCAN, ts_us, json.dumps(data, separators=(',', ':')).encode())
+
+    def publish_nrf24(self, ts_us, channel, pipe, payload):
+        self.publish(KIND_NRF24, ts_us, NRF24_RECORD.pack(channel, pipe) + payload)
+
+    def publish_cc1101(self, ts_us, mhz, rssi, lqi, payload):
+        rssi = max(-128, min(127, round(rssi)))
+        self.publish(KIND_CC1101, ts_us, CC1101_RECORD.pack(round(mhz * 1000), rssi, lqi) + payload)
+
+    def maybe_flush(self):
+        if self.backlog or (self.first_pending is not None
+                            and time.monotonic() - self.first_pending >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Sends the pending records and retries the backlog; never waits."""
+        if self.pending:
+            DATAGRAM_HEADER.pack_into(self.buf, 0, BUS_MAGIC, BUS_VERSION, self.source, os.getpid() & 0xFFFFFFFF,
+                                      self.seq & 0xFFFFFFFF)
+            self.seq += 1
+            self.backlog.append((bytes(self.buf), self.pending))
+            del self.buf[DATAGRAM_HEADER.size:]
+            self.pending = 0
+            self.first_pending = None
+            if len(self.backlog) > self.max_backlog:
+                self._dropped(self.backlog.popleft()[1], errno.ENOBUFS)
+        while self.backlog:
+            datagram, count = self.backlog[0]
+            try:
+                self.sock.sendto(datagram, self.path)
+            except BlockingIOError:
+                return # Daemon's queue is full; try again on the next flush
+            except OSError as e: # ENOENT/ECONNREFUSED: daemon not running
+                self.backlog.popleft()
+                self._dropped(count, e.errno)
+                continue
+            self.backlog.popleft()
+            self.published += count
+            self.last_error = None
+
+    def register_metrics(self, metrics):
+        metrics.counter('bus_published_total', "Records accepted by the bus daemon", lambda: self.published)
+        metrics.counter('bus_dropped_total', "Records dropped because the bus was full or not running", lambda: self.dropped)
+        metrics.gauge('bus_backlog_datagrams', "Datagrams waiting to be retried", lambda: len(self.backlog))
+
+    def _dropped(self, count, error):
+        self.dropped += count
+        if error != self.last_error:
+            print(f"BUS_WARN: publish failed ({os.strerror(error) if error else 'unknown error'}); "
+                  f"{self.dropped} record(s) dropped so far", file=sys.stderr)
+            self.last_error = error
+
+    def close(self):
+        self.flush()
+        self.sock.close()
+
+def decode_datagram(data):
+    """(source, pid, seq, [(kind, ts_us, payload), ...]) of one datagram; raises ValueError if malformed."""
+    if len(data) < DATAGRAM_HEADER.size:
+        raise ValueError("short datagram")
+    magic, version, source, pid, seq = DATAGRAM_HEADER.unpack_from(data)
+    if magic != BUS_MAGIC or version != BUS_VERSION:
+        raise ValueError(f"bad datagram header {magic!r} v{version}")
+    records = []
+    pos = DATAGRAM_HEADER.size
+    while pos < len(data):
+        if pos + RECORD_HEADER.size > len(data):
+            raise ValueError("truncated record header")
+        kind, length, ts_us = RECORD_HEADER.unpack_from(data, pos)
+        pos += RECORD_HEADER.size
+        if pos + length > len(data):
+            raise ValueError("truncated record payload")
+        records.append((kind, ts_us, data[pos:pos + length]))
+        pos += length
+    return source, pid, seq, records
+
+def record_fields(kind, payload):
+    """The typed fields of one record as a dict (raw payload bytes for nRF24/CC1101)."""
+    if kind == KIND_SCAN:
+        fields = json.loads(payload)
+        if not isinstance(fields, dict):
+            raise ValueError(f"scan record is a JSON {type(fields).__name__}, not an object")
+        return fields
+    if kind == KIND_NRF24:
+        channel, pipe = NRF24_RECORD.unpack_from(payload)
+        return {'channel': channel, 'pipe': pipe, 'payload': bytes(payload[NRF24_RECORD.size:])}
+    if kind == KIND_CC1101:
+        freq_khz, rssi, lqi = CC1101_RECORD.unpack_from(payload)
+        return {'freq_khz': freq_khz, 'rssi': rssi, 'lqi': lqi, 'payload': bytes(payload[CC1101_RECORD.size:])}
+    raise ValueError(f"unknown record kind {kind}")
+
+# --- Consumer Side ---
+class Subscriber:
+    def __init__(self, sock):
+        self.sock = sock
+        self.out = bytearray()
+
+class BusDaemon:
+    """The one consumer: datagrams in, batched SQLite rows and subscriber lines out."""
+
+    def __init__(self, path=BUS_SOCKET, subscribe_path=BUS_SUBSCRIBE_SOCKET, db_file=DB_FILE, raw=False,
+                 write_csv=True):
+        # Imported here so producers (which only need BusPublisher) don't pull in pyserial
+        import esp32_logger
+        self.path, self.subscribe_path = Path(path), Path(subscribe_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        proxnet_db.setup_database(db_file)
+        self.db_writer = esp32_logger.DBWriter(db_file)
+        self.db_writer.start()
+        self.csv_sink = esp32_logger.CSVSink() if write_csv else None
+        self.pipeline = esp32_logger.ScanPipeline(self.db_writer, self.csv_sink or esp32_logger.NullSink(), raw=raw)
+
+        self.sock = self._bind(socket.SOCK_DGRAM, self.path)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, BUS_RECV_BUFFER)
+        self.listener = self._bind(socket.SOCK_STREAM, self.subscribe_path)
+        self.listener.listen(8)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ, 'bus')
+        self.selector.register(self.listener, selectors.EVENT_READ, 'listen')
+        self.subscribers = {}
+        self.seq = 0            # Bus-wide record sequence, in arrival order
+        self.last_datagram = {} # (source, pid) -> last datagram seq, to count losses between producer and bus
+        self.records = 0
+        self.lost_datagrams = 0
+        self.bad_datagrams = 0
+        self.metrics = Metrics('bus')
+        self.db_writer.register_metrics(self.metrics)
+        self.metrics.counter('bus_records_total', "Records received from producers", lambda: self.records)
+        self.metrics.counter('bus_lost_datagrams_total', "Datagrams missing from a producer's sequence",
+                             lambda: self.lost_datagrams)
+        self.metrics.counter('bus_bad_datagrams_total', "Malformed datagrams or records", lambda: self.bad_datagrams)
+        self.metrics.gauge('bus_subscribers', "Connected live-stream subscribers", lambda: len(self.subscribers))
+        self.dispatch_latency = self.metrics.histogram('bus_dispatch_seconds', "Time to handle one burst of datagrams")
+        self.burst_datagrams = self.metrics.histogram('bus_burst_datagrams', "Datagrams handled per wake",
+                                                      Histogram(SIZE_BUCKETS))
+
+    def _bind(self, kind, path):
+        sock = socket.socket(socket.AF_UNIX, kind)
+        try:
+            path.unlink() # Stale socket from a previous run
+        except FileNotFoundError:
+            pass
+        sock.bind(str(path))
+        sock.setblocking(False)
+        return sock
+
+    def run(self, stop_event=None):
+        print(f"Bus listening on {self.path}, subscribers on {self.subscribe_path}")
+        last_stats = time.monotonic()
+        while not (stop_event and stop_event.is_set()):
+            for key, events in self.selector.select(timeout=0.5):
+                if key.data == 'bus':
+                    self._receive()
+                elif key.data == 'listen':
+                    self._accept()
+                elif events & selectors.EVENT_WRITE:
+                    self._send(key.data)
+                else:
+                    self._drop(key.data) # Subscribers only read; readable means closed
+            self.pipeline.tick()
+            self.metrics.maybe_write()
+            if time.monotonic() - last_stats >= STATS_INTERVAL:
+                print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] BUS: {self.records} records, "
+                      f"{self.lost_datagrams} datagram(s) lost, {self.bad_datagrams} malformed, "
+                      f"{len(self.subscribers)} subscriber(s), {self.db_writer.rows_written} rows written")
+                last_stats = time.monotonic()
+
+    def _receive(self):
+        # Drain everything queued so one wake handles a whole burst
+        started = time.perf_counter_ns()
+        datagrams = 0
+        while True:
+            try:
+                data = self.sock.recv(BUS_MAX_DATAGRAM)
+            except BlockingIOError:
+                if datagrams:
+                    self.dispatch_latency.observe_ns(started)
+                    self.burst_datagrams.observe(datagrams)
+                return
+            datagrams += 1
+            try:
+                source, pid, seq, records = decode_datagram(data)
+            except ValueError as e:
+                self.bad_datagrams += 1
+                print(f"BUS_WARN: {e}", file=sys.stderr)
+                continue
+            last = self.last_datagram.get((source, pid))
+            if last is not None and seq != (last + 1) & 0xFFFFFFFF:
+                self.lost_datagrams += (seq - last - 1) & 0xFFFFFFFF
+            self.last_datagram[(source, pid)] = seq
+            for kind, ts_us, payload in records:
+                self._dispatch(SOURCE_NAMES.get(source, str(source)), kind, ts_us, payload)
+
+    def _dispatch(self, source, kind, ts_us, payload):
+        try:
+            fields = record_fields(kind, payload)
+        except (ValueError, struct.error) as e:
+            self.bad_datagrams += 1
+            print(f"BUS_WARN: bad {KIND_NAMES.get(kind, kind)} record from {source}: {e}", file=sys.stderr)
+            return
+        if kind == KIND_SCAN:
+            if 'status' not in fields and 'error' not in fields: # Same filter as the logger's handle_message
+                try:
+                    self.pipeline.add(ts_us, fields)
+                except Exception as e: # One producer's odd message must not take the only DB writer down
+                    self.bad_datagrams += 1
+                    print(f"BUS_WARN: bad scan record from {source}: {e!r}", file=sys.stderr)
+                    return
+        elif kind == KIND_NRF24:
+            self.db_writer.submit((ts_us, 'nrf24', fields['channel'], None, fields['pipe'], None, None,
+                                   fields['payload']), proxnet_db.INSERT_PACKET_SQL)
+        else:
+            self.db_writer.submit((ts_us, 'cc1101', None, fields['freq_khz'], None, fields['rssi'], fields['lqi'],
+                                   fields['payload']), proxnet_db.INSERT_PACKET_SQL)
+        self.seq += 1
+        self.records += 1
+        if self.subscribers:
+            if kind != KIND_SCAN:
+                fields['payload'] = fields['payload'].hex()
+            line = json.dumps({'seq': self.seq, 'ts_us': ts_us, 'kind': KIND_NAMES[kind], 'source': source,
+                               **fields}).encode() + b'\n'
+            for subscriber in list(self.subscribers.values()):
+                self._queue(subscriber, line)
+
+    def _accept(self):
+        try:
+            sock, _ = self.listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        subscriber = Subscriber(sock)
+        self.subscribers[sock.fileno()] = subscriber
+        self.selector.register(sock, selectors.EVENT_READ, subscriber)
+
+    def _queue(self, subscriber, line):
+        if len(subscriber.out) + len(line) > SUBSCRIBER_BUFFER:
+            print("BUS_WARN: subscriber fell behind, disconnecting it", file=sys.stderr)
+            self._drop(subscriber)
+            return
+        was_empty = not subscriber.out
+        subscriber.out += line
+        if was_empty:
+            self._send(subscriber)
+
+    def _send(self, subscriber):
+        try:
+            sent = subscriber.sock.send(subscriber.out)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._drop(subscriber)
+            return
+        del subscriber.out[:sent]
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if subscriber.out else 0)
+        self.selector.modify(subscriber.sock, events, subscriber)
+
+    def _drop(self, subscriber):
+        if self.subscribers.pop(subscriber.sock.fileno(), None) is None:
+            return
+        self.selector.unregister(subscriber.sock)
+        subscriber.sock.close()
+
+    def close(self):
+        for subscriber in list(self.subscribers.values()):
+            self._drop(subscriber)
+        for sock, path in ((self.sock, self.path), (self.listener, self.subscribe_path)):
+            sock.close()
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        self.pipeline.close()
+        self.db_writer.close()
+        if self.csv_sink:
+            self.csv_sink.close()
+        self.metrics.write()
+        print(f"Bus closed: {self.records} records, {self.db_writer.rows_written} rows written, "
+              f"{self.db_writer.rows_dropped} dropped.")
+
+def subscribe(path=BUS_SUBSCRIBE_SOCKET, timeout=None):
+    """Connects to the daemon and returns a generator of live bus events (dicts).
+
+    Connection errors are raised here rather than on first iteration. With
+    a timeout, the generator yields None whenever nothing arrived for that
+    long, so callers can send keepalives; it ends when the daemon closes
+    the connection.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        raise
+
+    def events():
+        buf = b""
+        try:
+            while True:
+                try:
+                    chunk = sock.recv(65536)
+                except socket.timeout:
+                    yield None
+                    continue
+                if not chunk:
+                    return
+                buf += chunk
+                *lines, buf = buf.split(b'\n')
+                for line in lines:
+                    yield json.loads(line)
+        finally:
+            sock.close()
+
+    return events()
+
+def handle_sigterm(signum, frame):
+    raise SystemExit(0) # Lets the finally block flush the DB writer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ProxNet ingestion bus")
+    parser.add_argument("--subscribe", action="store_true", help="Print the live event stream instead of running the daemon")
+    parser.add_argument("--raw", action="store_true", help="Log every BT/BLE sighting instead of summary rows")
+    parser.add_argument("--no-csv", action="store_true", help="Don't write proxnet_log.csv")
+    args = parser.parse_args()
+    if args.subscribe:
+        try:
+            for event in subscribe():
+                print(json.dumps(event))
+        except (FileNotFoundError, ConnectionRefusedError):
+            print(f"Error: the bus daemon is not running ({BUS_SUBSCRIBE_SOCKET}).", file=sys.stderr)
+            sys.exit(1)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    daemon = BusDaemon(raw=args.raw, write_csv=not args.no_csv)
+    try:
+        daemon.run()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        daemon.close()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+# proxnet_db.py
+# Shared SQLite schema for proxnet_log.db, used by esp32_logger.py, proxnet_bus.py and web_ui.py.
+# Version 2 schema: autoincrement key, epoch-microsecond time column and indexes.
+# Version 3 schema: sighting summary columns (seen_count, first_seen_us, rssi_min/max/mean).
+# Version 4 schema: per-device RSSI rollup tables at 1-minute and 1-hour resolution.
+# Version 5 schema: packets table for nRF24/CC1101 frames written by proxnet_bus.py.
+# New databases use auto_vacuum=INCREMENTAL so proxnet_archive.py can shrink the file after moving old rows out.
+# Run directly to upgrade an existing database ahead of time:
+#   python3 proxnet_db.py [path/to/proxnet_log.db]
+
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# --- Configuration ---
+SCHEMA_VERSION = 5
+MIGRATION_CHUNK_ROWS = 20000 # Rows copied per transaction while upgrading old tables
+MIGRATION_PAUSE = 0.02       # Seconds between chunks so the logger/UI can get the lock
+
+# ts_us is the sort/filter key (UTC epoch microseconds); timestamp stays as the
+# human-readable local time for the UI and CSV. A row can summarise several
+# sightings of one device: seen_count sightings between first_seen_us and ts_us,
+# with RSSI stats over that window (rssi is the latest reading).
+SCANS_COLUMNS = '''
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts_us INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    module_type TEXT,
+    protocol TEXT,
+    uid TEXT,
+    uid_len INTEGER,
+    mac TEXT,
+    name TEXT,
+    rssi INTEGER,
+    seen_count INTEGER,
+    first_seen_us INTEGER,
+    rssi_min INTEGER,
+    rssi_max INTEGER,
+    rssi_mean REAL
+'''
+
+# Columns added after version 2, applied with ALTER TABLE on upgrade
+ADDED_COLUMNS = [
+    ("seen_count", "INTEGER"),
+    ("first_seen_us", "INTEGER"),
+    ("rssi_min", "INTEGER"),
+    ("rssi_max", "INTEGER"),
+    ("rssi_mean", "REAL"),
+]
+
+SCANS_INDEXES = [
+    ("idx_scans_ts", "(ts_us)"),
+    ("idx_scans_module_ts", "(module_type, ts_us)"),
+    ("idx_scans_mac_ts", "(mac, ts_us)"),
+]
+
+INSERT_SCAN_SQL = '''
+    INSERT INTO scans (ts_us, timestamp, module_type, protocol, uid, uid_len, mac, name, rssi,
+                       seen_count, first_seen_us, rssi_min, rssi_max, rssi_mean)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Per-device RSSI rollups, maintained incrementally by esp32_logger.py.
+# (name, bucket width in seconds), finest first.
+ROLLUP_RESOLUTIONS = [("1m", 60), ("1h", 3600)]
+
+ROLLUP_COLUMNS = '''
+    device TEXT NOT NULL,
+    bucket_us INTEGER NOT NULL,
+    module_type TEXT,
+    count INTEGER NOT NULL,
+    rssi_min INTEGER NOT NULL,
+    rssi_max INTEGER NOT NULL,
+    rssi_sum INTEGER NOT NULL,
+    rssi_last INTEGER NOT NULL,
+    last_us INTEGER NOT NULL,
+    PRIMARY KEY (device, bucket_us)
+'''
+
+# Partial buckets from the logger are merged into whatever is already stored
+UPSERT_ROLLUP_SQL = '''
+    INSERT INTO {table} (device, bucket_us, module_type, count, rssi_min, rssi_max, rssi_sum, rssi_last, last_us)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (device, bucket_us) DO UPDATE SET
+        count = count + excluded.count,
+        rssi_min = min(rssi_min, excluded.rssi_min),
+        rssi_max = max(rssi_max, excluded.rssi_max),
+        rssi_sum = rssi_sum + excluded.rssi_sum,
+        rssi_last = CASE WHEN excluded.last_us >= last_us THEN excluded.rssi_last ELSE rssi_last END,
+        last_us = max(last_us, excluded.last_us)
+'''
+
+# Raw radio frames from the sniffers, one row per packet, written by the bus daemon.
+# channel/pipe are set for nRF24, freq_khz/rssi/lqi for CC1101.
+PACKETS_COLUMNS = '''
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts_us INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    channel INTEGER,
+    freq_khz INTEGER,
+    pipe INTEGER,
+    rssi INTEGER,
+    lqi INTEGER,
+    payload BLOB
+'''
+
+PACKETS_INDEXES = [
+    ("idx_packets_source_ts", "(source, ts_us)"),
+]
+
+INSERT_PACKET_SQL = '''
+    INSERT INTO packets (ts_us, source, channel, freq_khz, pipe, rssi, lqi, payload)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+def rollup_table(resolution):
+    return f"rssi_rollup_{resolution}"
+
+# Legacy rows only have the local-time TEXT timestamp (second resolution)
+LEGACY_TS_US_SQL = "COALESCE(CAST(strftime('%s', timestamp, 'utc') AS INTEGER), 0) * 1000000"
+LEGACY_COLUMNS = "timestamp, module_type, protocol, uid, uid_len, mac, name, rssi"
+
+# --- Helpers ---
+def now_us():
+    """Current time as integer epoch microseconds."""
+    return time.time_ns() // 1000
+
+def format_ts(ts_us):
+    """Local '%Y-%m-%d %H:%M:%S' string for an epoch-microsecond timestamp."""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts_us / 1_000_000))
+
+def connect(db_file, timeout=30.0):
+    """Opens proxnet_log.db the way every ProxNet process should (WAL, row access by name, incremental vacuum)."""
+    conn = sqlite3.connect(db_file, timeout=timeout)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL") # No-op unless the file is new; must precede the switch to WAL
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def _create_scans(conn, table):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({SCANS_COLUMNS})")
+    for index_name, columns in SCANS_INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} {columns}")
+
+def _copy_chunk(conn, last_id, limit=None):
+    """Copies legacy rows after rowid `last_id` into scans_migrating; returns rows copied."""
+    sql = f'''
+        INSERT OR IGNORE INTO scans_migrating (id, ts_us, {LEGACY_COLUMNS})
+        SELECT rowid, {LEGACY_TS_US_SQL}, {LEGACY_COLUMNS}
+        FROM scans WHERE rowid > ? ORDER BY rowid
+    '''
+    if limit is None:
+        return conn.execute(sql, (last_id,)).rowcount
+    return conn.execute(sql + " LIMIT ?", (last_id, limit)).rowcount
+
+def migrate_scans(conn, chunk_rows=MIGRATION_CHUNK_ROWS):
+    """Upgrades a pre-version-2 scans table to the current layout in bounded chunks.
+
+    Rows are copied into scans_migrating (rowid becomes id, so existing order
+    is kept) one short transaction at a time, which leaves the database
+    usable between chunks. Rows the logger keeps adding meanwhile are picked
+    up by the final pass, which also swaps the tables in one short
+    transaction. An interrupted migration resumes from where it stopped.
+    """
+    # Very old tables predate the BT/BLE columns
+    for column, col_type in (("mac", "TEXT"), ("name", "TEXT"), ("rssi", "INTEGER")):
+        if column not in _columns(conn, "scans"):
+            conn.execute(f"ALTER TABLE scans ADD COLUMN {column} {col_type}")
+    conn.commit()
+
+    _create_scans(conn, "scans_migrating")
+    conn.commit()
+    total = conn.execute("SELECT COUNT(*) FROM scans").fetchone()[0]
+    print(f"Migrating {total} scan rows to schema v{SCHEMA_VERSION}...")
+    while True:
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM scans_migrating").fetchone()[0]
+        with conn:
+            copied = _copy_chunk(conn, last_id, chunk_rows)
+        if copied < chunk_rows:
+            break
+        time.sleep(MIGRATION_PAUSE)
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM scans_migrating").fetchone()[0]
+        _copy_chunk(conn, last_id)
+        conn.execute("DROP TABLE scans")
+        conn.execute("ALTER TABLE scans_migrating RENAME TO scans")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    print("Scan table migration complete.")
+
+# --- Database Setup ---
+def setup_database(db_file):
+    """Creates proxnet_log.db at the current schema, upgrading older layouts in place."""
+    Path(db_file).parent.mkdir(parents=True, exist_ok=True)
+    conn = connect(db_file)
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        columns = _columns(conn, "scans")
+        if columns and "id" not in columns:
+            migrate_scans(conn)
+        elif columns:
+            for column, col_type in ADDED_COLUMNS:
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE scans ADD COLUMN {column} {col_type}")
+        _create_scans(conn, "scans")
+        for resolution, _ in ROLLUP_RESOLUTIONS:
+            # Clustered on (device, bucket_us) so one device's range is a single seek
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {rollup_table(resolution)} ({ROLLUP_COLUMNS}) WITHOUT ROWID")
+        conn.execute(f"CREATE TABLE IF NOT EXISTS packets ({PACKETS_COLUMNS})")
+        for index_name, columns in PACKETS_INDEXES:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON packets {columns}")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    db_path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path.home() / "proxnet" / "logs" / "proxnet_log.db"
+    setup_database(db_path)
+    print(f"Database initialized/verified at: {db_path}")
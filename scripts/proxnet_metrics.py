@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+# proxnet_metrics.py
+# Low-overhead pipeline metrics shared by the scanners, the bus daemon and web_ui.py.
+#
+# Hot paths only bump plain integer attributes the scanners already keep (RxStats, DBWriter,
+# FrameDecoder, ...) and, once per batch/burst rather than per message, observe a fixed-bucket
+# Histogram. A Metrics registry points at those attributes and samples them every
+# METRICS_INTERVAL seconds into ~/proxnet/run/metrics/<process>.json (atomic replace, like the
+# sweep reports); web_ui.py reads the files and serves them in the Prometheus text format at
+# /metrics. Nothing is locked: each value has a single writer and readers only need a recent value.
+#
+#   python3 proxnet_metrics.py       # print the current snapshots as Prometheus text
+
+import os
+import sys
+import json
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+# --- Configuration ---
+PROJECT_DIR = Path.home() / "proxnet"
+METRICS_DIR = PROJECT_DIR / "run" / "metrics"
+METRICS_INTERVAL = 5.0 # Seconds between snapshot writes
+METRICS_PREFIX = "proxnet_"
+STALE_AFTER = 3        # Snapshots older than this many intervals (or from a dead pid) report up=0
+# Seconds, 50 us .. 2.5 s: covers an SPI burst read up to a slow SD-card commit
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000) # Items per batch
+
+# --- Recording ---
+class Histogram:
+    """Fixed-bucket histogram: observe() is one bisect and three additions."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def observe_ns(self, started_ns, now_ns=None):
+        """Observes the seconds since a time.perf_counter_ns() reading."""
+        self.observe(((now_ns or time.perf_counter_ns()) - started_ns) / 1e9)
+
+    def snapshot(self):
+        return {'buckets': list(self.buckets), 'counts': list(self.counts), 'count': self.count, 'sum': self.sum}
+
+class Metrics:
+    """One process's metrics: sampled counters and gauges plus Histograms, snapshotted to a JSON file.
+
+    counter()/gauge() take a function returning the current value, so the
+    code being measured keeps its own attributes and pays nothing extra;
+    histogram() registers (or creates) a Histogram that code observes into.
+    """
+
+    def __init__(self, process, directory=METRICS_DIR, interval=METRICS_INTERVAL):
+        self.process = process
+        self.path = Path(directory) / f"{process}.json"
+        self.interval = interval
+        self.metrics = [] # (name, type, help, labels, source)
+        self.started = time.time()
+        self.last_write = 0.0
+
+    def counter(self, name, help, fn, **labels):
+        self.metrics.append((name, 'counter', help, labels, fn))
+
+    def gauge(self, name, help, fn, **labels):
+        self.metrics.append((name, 'gauge', help, labels, fn))
+
+    def histogram(self, name, help, histogram=None, **labels):
+        histogram = histogram or Histogram()
+        self.metrics.append((name, 'histogram', help, labels, histogram))
+        return histogram
+
+    def snapshot(self):
+        values = []
+        for name, kind, help, labels, source in self.metrics:
+            try:
+                value = source.snapshot() if kind == 'histogram' else source()
+            except Exception:
+                continue # A component that isn't set up (yet) just leaves its metric out
+            if value is not None:
+                values.append({'name': name, 'type': kind, 'help': help, 'labels': labels, 'value': value})
+        return {'process': self.process, 'pid': os.getpid(), 'time': time.time(), 'started': self.started,
+                'interval': self.interval, 'metrics': values}
+
+    def maybe_write(self):
+        now = time.monotonic()
+        if now - self.last_write >= self.interval:
+            self.last_write = now
+            self.write()
+
+    def write(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = Path(f"{self.path}.tmp")
+            with open(tmp, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, self.path) # Readers never see a half-written file
+        except OSError as e:
+            print(f"METRICS_WARN: Could not write {self.path}: {e}")
+
+# --- Reading / Exposition ---
+def read_snapshots(directory=METRICS_DIR):
+    """Every process's latest snapshot, with `up` and `age` filled in."""
+    snapshots = []
+    for path in sorted(Path(directory).glob("*.json")):
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        snapshot['age'] = max(0.0, time.time() - snapshot['time'])
+        snapshot['up'] = snapshot['age'] < STALE_AFTER * snapshot['interval'] and pid_alive(snapshot['pid'])
+        snapshots.append(snapshot)
+    return snapshots
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass # Someone else's process (e.g. the Wi-Fi capture under sudo)
+    return True
+
+def quantile(histogram, q):
+    """Upper bucket bound holding quantile `q` of a histogram snapshot (None if empty or in +Inf)."""
+    if not histogram['count']:
+        return None
+    target = q * histogram['count']
+    seen = 0
+    for bound, count in zip(histogram['buckets'], histogram['counts']):
+        seen += count
+        if seen >= target:
+            return bound
+    return None
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+def render_prometheus(snapshots, extra=()):
+    """Prometheus text exposition (version 0.0.4) of the snapshots; `extra` adds (name, type, help, labels, value) samples."""
+    families = {} # name -> (type, help, [lines])
+    def add(name, kind, help, labels, value):
+        name = METRICS_PREFIX + name
+        family = families.setdefault(name, (kind, help, []))
+        if kind != 'histogram':
+            family[2].append(f"{name}{_labels(labels)} {_number(value)}")
+            return
+        cumulative = 0
+        for bound, count in zip(value['buckets'] + ['+Inf'], value['counts']):
+            cumulative += count
+            family[2].append(f"{name}_bucket{_labels({**labels, 'le': bound})} {cumulative}")
+        family[2].append(f"{name}_sum{_labels(labels)} {_number(float(value['sum']))}")
+        family[2].append(f"{name}_count{_labels(labels)} {value['count']}")
+
+    for snapshot in snapshots:
+        process = {'process': snapshot['process']}
+        add('up', 'gauge', "1 if the process wrote a snapshot recently and is still running", process, int(snapshot['up']))
+        add('metrics_age_seconds', 'gauge', "Seconds since the process's last snapshot", process, round(snapshot['age'], 3))
+        add('process_start_time_seconds', 'gauge', "Unix time the process started", process, snapshot['started'])
+        for metric in snapshot['metrics']:
+            add(metric['name'], metric['type'], metric['help'], {**process, **metric['labels']}, metric['value'])
+    for name, kind, help, labels, value in extra:
+        add(name, kind, help, labels, value)
+
+    out = []
+    for name, (kind, help, lines) in families.items():
+        out.append(f"# HELP {name} {help}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(lines)
+    return "\n".join(out) + "\n"
+
+if __name__ == "__main__":
+    snapshots = read_snapshots(Path(sys.argv[1]) if len(sys.argv) > 1 else METRICS_DIR)
+    sys.stdout.write(render_prometheus(snapshots))
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+
+# scanner_bench.py
+# End-to-end throughput benchmark for esp32_logger.py, nrf24_sniffer.py and cc1101_sniffer.py on the
+# hw_sim.py stand-ins. Each scanner runs unmodified in its own process with HOME pointed at a scratch
+# directory, fed stamped synthetic traffic; nRF24/CC1101 packets reach proxnet_log.db through a
+# proxnet_bus.py daemon, the ESP32 logger writes the DB itself (or via the bus with --esp32-bus).
+# The DB is polled while the run goes on, and every stamped row gives one latency sample.
+#
+# Reported per scanner:
+#   sustained msg/s  rows that reached the DB / the longer of the spans they were offered and became visible in
+#   drop rate        messages offered but never stored, split into hardware (stand-in FIFO or UART
+#                    overrun, CC1101 frames lost on the air or while off-frequency) and pipeline losses
+#   latency          message available to the host -> scanner timestamp (capture) and -> row
+#                    visible in the DB (end to end), p50/p95/p99/max
+#   DB bytes         growth of proxnet_log.db + WAL, and the writer process's disk writes (from
+#                    rusage; includes the CSV in the ESP32 logger's direct mode, 0 on tmpfs)
+#
+#   python3 scanner_bench.py                          # all three at the default loads
+#   python3 scanner_bench.py nrf24 --speed 20 --duration 30
+#   python3 scanner_bench.py --save bench.json        # later: --baseline bench.json flags regressions
+
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import sqlite3
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+from hw_sim import read_stamp
+
+# --- Configuration ---
+SCRIPT_DIR = Path(__file__).resolve().parent
+# Default load per scanner: synthetic rate (messages/s) x speed. The CC1101 config sends 257-byte
+# frames at ~10 kbaud (~0.2 s on the air each), so its load stays below the air capacity.
+PROFILES = {
+    'esp32': {'rate': 100.0, 'speed': 5.0, 'table': 'scans', 'args': ['--raw', '--no-csv']},
+    'nrf24': {'rate': 200.0, 'speed': 5.0, 'table': 'packets', 'args': ['--bus']},
+    'cc1101': {'rate': 2.0, 'speed': 1.0, 'table': 'packets', 'args': ['--bus']},
+}
+DEFAULT_DURATION = 10.0   # Seconds of traffic per scanner
+POLL_INTERVAL = 0.02      # DB polling period; bounds the end-to-end latency resolution
+SETTLE_TIMEOUT = 5.0      # After the traffic, stop once no new rows arrived for this long
+START_TIMEOUT = 20.0      # Longest wait for the bus socket / first traffic
+STOP_TIMEOUT = 10.0       # SIGTERM -> SIGKILL grace per process
+REGRESSION_TOLERANCE = 0.10 # --baseline: relative throughput loss that fails the run
+LATENCY_TOLERANCE = 0.50    # --baseline: relative p95 latency gain that fails the run (the 1 s group commit makes it noisy)
+DROP_TOLERANCE = 0.01       # --baseline: absolute drop-rate increase that fails the run
+
+# --- Measurement ---
+class DBWatcher:
+    """Polls one table for new rows and records when each stamped message became visible."""
+
+    def __init__(self, db_file, table):
+        self.db_file = db_file
+        self.table = table
+        self.conn = None
+        self.last_id = 0
+        self.rows = {} # seq -> (stamp_us, row ts_us, visible_us)
+        self.unstamped = 0
+
+    def poll(self):
+        if self.conn is None:
+            if not self.db_file.exists():
+                return 0
+            self.conn = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True, timeout=1.0)
+        columns = "payload" if self.table == 'packets' else "coalesce(name, uid)"
+        try:
+            rows = self.conn.execute(f"SELECT id, ts_us, {columns} FROM {self.table} WHERE id > ? ORDER BY id",
+                                     (self.last_id,)).fetchall()
+        except sqlite3.OperationalError:
+            return 0 # Table not created yet, or the writer holds a lock
+        visible_us = time.time_ns() // 1000
+        for row_id, ts_us, value in rows:
+            self.last_id = row_id
+            stamp = read_stamp(value)
+            if stamp is None:
+                self.unstamped += 1
+            else:
+                self.rows.setdefault(stamp[0], (stamp[1], ts_us, visible_us))
+        return len(rows)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99), 'max': values[-1]}
+
+def db_size(db_file):
+    return sum(Path(f"{db_file}{suffix}").stat().st_size for suffix in ('', '-wal')
+               if Path(f"{db_file}{suffix}").exists())
+
+# --- Processes ---
+def spawn(command, home, log):
+    env = {**os.environ, 'HOME': str(home), 'PYTHONUNBUFFERED': '1'}
+    return subprocess.Popen([sys.executable] + command, cwd=SCRIPT_DIR, env=env, stdout=log,
+                            stderr=subprocess.STDOUT, start_new_session=True)
+
+def reap(proc):
+    """True once `proc` has exited; reaps it with wait4 so its rusage (disk writes) is kept."""
+    if proc.returncode is None:
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        if not pid:
+            return False
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        proc.disk_bytes = usage.ru_oublock * 512
+    return True
+
+def stop(proc):
+    """SIGTERM (then SIGKILL) and reap; returns the process's disk writes in bytes from rusage."""
+    if not reap(proc):
+        proc.send_signal(signal.SIGTERM)
+    deadline = time.monotonic() + STOP_TIMEOUT
+    while not reap(proc):
+        if time.monotonic() > deadline:
+            proc.kill()
+            deadline = float('inf')
+        time.sleep(0.05)
+    return proc.disk_bytes
+
+def run_scanner(scanner, workdir, duration, rate=None, speed=None, esp32_bus=False, wire='json'):
+    """Runs one scanner on its stand-in and returns its result dict."""
+    profile = PROFILES[scanner]
+    rate = rate or profile['rate']
+    speed = speed or profile['speed']
+    count = max(1, round(rate * speed * duration))
+    home = workdir / scanner
+    shutil.rmtree(home, ignore_errors=True)
+    home.mkdir(parents=True)
+    db_file = home / "proxnet" / "logs" / "proxnet_log.db"
+    stats_file = home / "sim_stats.json"
+    log = open(home / "bench.log", 'w')
+    use_bus = scanner != 'esp32' or esp32_bus
+    scanner_args = list(profile['args']) + (['--bus'] if scanner == 'esp32' and esp32_bus else [])
+    bus = None
+    try:
+        if use_bus:
+            bus = spawn(['proxnet_bus.py', '--raw', '--no-csv'], home, log)
+            socket_path = home / "proxnet" / "run" / "bus.sock"
+            deadline = time.monotonic() + START_TIMEOUT
+            while not socket_path.exists():
+                if reap(bus) or time.monotonic() > deadline:
+                    raise RuntimeError(f"bus daemon did not start, see {home / 'bench.log'}")
+                time.sleep(0.05)
+        sim = spawn(['hw_sim.py', scanner, '--rate', str(rate), '--speed', str(speed), '--count', str(count),
+                     '--stamp', '--stats-file', str(stats_file), '--wire', wire, '--'] + scanner_args, home, log)
+        watcher = DBWatcher(db_file, profile['table'])
+        size_before = None
+        # Traffic starts once the scanner is listening (the ESP32 logger first waits 2 s for a boot message)
+        expected_end = time.monotonic() + START_TIMEOUT + count / (rate * speed)
+        last_new = time.monotonic()
+        while True:
+            if size_before is None and db_file.exists():
+                size_before = db_size(db_file)
+            if watcher.poll():
+                last_new = time.monotonic()
+            now = time.monotonic()
+            if len(watcher.rows) >= count or reap(sim):
+                break
+            if watcher.rows and now - last_new > SETTLE_TIMEOUT:
+                break # Traffic is over (or the pipeline stalled)
+            if not watcher.rows and now > expected_end:
+                break
+            time.sleep(POLL_INTERVAL)
+        # Stop the producer first so the writer gets everything it flushes on exit
+        writer_io = stop(sim)
+        if bus:
+            writer_io = stop(bus)
+        watcher.poll()
+        watcher.close()
+        sim_stats = json.loads(stats_file.read_text())[0] if stats_file.exists() else {}
+        return summarize(scanner, rate, speed, watcher, sim_stats, db_size(db_file) - (size_before or 0), writer_io)
+    finally:
+        if bus:
+            stop(bus)
+        log.close()
+
+def summarize(scanner, rate, speed, watcher, sim, db_bytes, writer_io):
+    offered = sim.get('offered', 0)
+    stored = len(watcher.rows)
+    hw_lost = sum(sim.get(key, 0) for key in ('overruns', 'fifo_overflows', 'air_lost', 'off_channel'))
+    if scanner == 'cc1101':
+        hw_lost += sim.get('aborted', 0)
+    # A pipeline that keeps up stores rows over the same span they were offered in; one that falls
+    # behind stretches the span over which they become visible
+    stamps = [stamp for stamp, _, _ in watcher.rows.values()]
+    visible = [visible for _, _, visible in watcher.rows.values()]
+    window = max(max(stamps) - min(stamps), max(visible) - min(visible)) / 1e6 if stamps else 0
+    return {
+        'scanner': scanner,
+        'offered': offered,
+        'offered_rate': round(rate * speed, 1),
+        'stored': stored,
+        'sustained_rate': round(stored / window, 1) if window > 0 else None,
+        'drop_rate': round(1 - stored / offered, 4) if offered else None,
+        'hw_dropped': hw_lost,
+        'pipeline_dropped': max(0, offered - hw_lost - stored),
+        'capture_ms': _ms(percentiles([ts - stamp for stamp, ts, _ in watcher.rows.values()])),
+        'latency_ms': _ms(percentiles([visible - stamp for stamp, _, visible in watcher.rows.values()])),
+        'db_bytes': db_bytes,
+        'db_bytes_per_msg': round(db_bytes / stored, 1) if stored else None,
+        'writer_disk_bytes': writer_io,
+        'unstamped_rows': watcher.unstamped,
+        'sim': sim,
+    }
+
+def _ms(stats):
+    return {k: round(v / 1000, 2) for k, v in stats.items()} if stats else None
+
+# --- Reporting ---
+def print_result(r):
+    print(f"{r['scanner']}: offered {r['offered']} at {r['offered_rate']:g}/s, stored {r['stored']}, "
+          f"sustained {r['sustained_rate']}/s")
+    drop = f"{r['drop_rate'] * 100:.2f}%" if r['drop_rate'] is not None else "n/a"
+    print(f"  drops      {drop} ({r['hw_dropped']} hardware, {r['pipeline_dropped']} pipeline)")
+    for key, label in (('capture_ms', 'capture'), ('latency_ms', 'end-to-end')):
+        p = r[key]
+        print(f"  {label:<10} " + (f"p50 {p['p50']} ms, p95 {p['p95']} ms, p99 {p['p99']} ms, max {p['max']} ms"
+                                   if p else "no samples"))
+    print(f"  DB         +{r['db_bytes']} bytes ({r['db_bytes_per_msg']} per row), "
+          f"writer disk writes {r['writer_disk_bytes']} bytes")
+
+def compare(results, baseline):
+    """Prints changes against a saved run; returns True if any scanner regressed."""
+    regressed = False
+    previous = {r['scanner']: r for r in baseline}
+    for r in results:
+        old = previous.get(r['scanner'])
+        if not old:
+            continue
+        problems = []
+        if old['sustained_rate'] and (r['sustained_rate'] or 0) < old['sustained_rate'] * (1 - REGRESSION_TOLERANCE):
+            problems.append(f"throughput {old['sustained_rate']} -> {r['sustained_rate']}/s")
+        if (r['drop_rate'] or 0) > (old['drop_rate'] or 0) + DROP_TOLERANCE:
+            problems.append(f"drop rate {old['drop_rate']} -> {r['drop_rate']}")
+        if old['latency_ms'] and r['latency_ms'] and \
+                r['latency_ms']['p95'] > old['latency_ms']['p95'] * (1 + LATENCY_TOLERANCE):
+            problems.append(f"p95 latency {old['latency_ms']['p95']} -> {r['latency_ms']['p95']} ms")
+        print(f"{r['scanner']}: " + ("REGRESSED: " + "; ".join(problems) if problems else "within tolerance of baseline"))
+        regressed = regressed or bool(problems)
+    return regressed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end scanner benchmarks on simulated hardware")
+    parser.add_argument("scanners", nargs="*", help=f"Scanners to run: any of {', '.join(PROFILES)} (default: all)")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="Seconds of traffic per scanner")
+    parser.add_argument("--rate", type=float, help="Synthetic messages/s before --speed (default: per scanner)")
+    parser.add_argument("--speed", type=float, help="Schedule speed-up (default: per scanner)")
+    parser.add_argument("--esp32-bus", action="store_true", help="Run the ESP32 logger with --bus instead of writing the DB itself")
+    parser.add_argument("--wire", choices=('json', 'binary'), default='json', help="ESP32 UART format")
+    parser.add_argument("--workdir", type=Path, help="Scratch directory (default: a new temp dir); put it on the "
+                                                     "target's SD card for realistic DB numbers")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory (logs, DBs)")
+    parser.add_argument("--save", type=Path, help="Write the results as JSON")
+    parser.add_argument("--baseline", type=Path, help="Compare with results saved by --save; exit 1 on regression")
+    args = parser.parse_args()
+    unknown = set(args.scanners) - set(PROFILES)
+    if unknown:
+        parser.error(f"unknown scanner(s): {', '.join(sorted(unknown))}")
+
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="proxnet_bench_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    results = []
+    try:
+        for scanner in args.scanners or PROFILES:
+            result = run_scanner(scanner, workdir, args.duration, args.rate, args.speed, args.esp32_bus, args.wire)
+            print_result(result)
+            results.append(result)
+    finally:
+        if args.keep or args.workdir:
+            print(f"Scratch files: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+        print(f"Results saved to {args.save}")
+    if args.baseline and compare(results, json.loads(args.baseline.read_text())):
+        sys.exit(1)
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+
+# supervisor.py
+# Keeps the ProxNet scanners (ESP32 logger, nRF24, CC1101, Wi-Fi capture, the
+# ingestion bus and the pcap indexer) running on behalf of web_ui.py.
+#
+# Request handlers only record what they want (start/stop/restart) and return;
+# one supervisor thread spawns, signals and reaps the processes. A scanner that
+# exits with an error is restarted with exponential backoff, and one that keeps
+# dying right after starting is given up on until it is started again. Each
+# process's stdout/stderr goes to its log in logs/, rotated at a fixed size, and
+# its CPU and resident memory are sampled from /proc.
+
+import os
+import sys
+import time
+import signal
+import threading
+import subprocess
+import logging
+import logging.handlers
+from collections import deque
+from pathlib import Path
+
+# --- Configuration ---
+PROJECT_DIR = Path.home() / "proxnet"
+SCRIPT_DIR = PROJECT_DIR / "scripts"
+LOG_DIR = PROJECT_DIR / "logs"
+VENV_PYTHON = PROJECT_DIR / "venv" / "bin" / "python3"
+LOOP_INTERVAL = 0.5       # Seconds between reaps/health checks when nothing is requested
+SAMPLE_INTERVAL = 2.0     # Seconds between CPU/RSS samples
+STOP_TIMEOUT = 5.0        # Seconds after SIGTERM before SIGKILL
+BACKOFF_INITIAL = 1.0     # First restart delay after a crash...
+BACKOFF_MAX = 60.0        # ...doubling up to this
+STABLE_AFTER = 30.0       # A run this long resets the backoff and the fast-failure count
+MAX_FAST_FAILURES = 8     # Consecutive short-lived runs before giving up
+LOG_MAX_BYTES = 5 * 1024 * 1024 # Per-process output log size before rotation...
+LOG_BACKUPS = 3                 # ...and rotated files kept (<name>.log.1 ... .3)
+OUTPUT_LINES = 200        # Recent output lines kept in memory per process
+
+# name -> output log, label, command, extra arguments per mode (and whether it starts with the supervisor)
+PROCESSES = {
+    'logger': {
+        'log': "esp32_logger.log",
+        'label': "ESP32 RFID/NFC/BT/BLE Logger",
+        'command': [str(VENV_PYTHON), str(SCRIPT_DIR / "esp32_logger.py")],
+        # CSV comes from web_ui.py's /api/export rather than being written next to every DB row
+        'modes': {'default': ['--no-csv'], 'raw': ['--raw', '--no-csv'], 'bus': ['--bus']},
+    },
+    'nrf24': {
+        'log': "nrf24_sniffer.log",
+        'label': "nRF24L01+ Sniffer",
+        'command': [str(VENV_PYTHON), str(SCRIPT_DIR / "nrf24_sniffer.py")],
+        'modes': {'default': [], 'sweep': ['--sweep'], 'pcapng': ['--pcapng'], 'bus': ['--bus']},
+    },
+    'cc1101': {
+        'log': "cc1101_sniffer.log",
+        'label': "CC1101 Sub-GHz Sniffer",
+        'command': [str(VENV_PYTHON), str(SCRIPT_DIR / "cc1101_sniffer.py")],
+        'modes': {'default': [], 'scan': ['--scan'], 'pcapng': ['--pcapng'], 'bus': ['--bus']},
+    },
+    'wifi': {
+        'log': "wifi_capture.log",
+        'label': "Wi-Fi Capture",
+        # tcpdump needs root; sudo -n fails instead of prompting if it isn't configured
+        'command': ["sudo", "-n", str(VENV_PYTHON), str(SCRIPT_DIR / "wifi_capture.py")],
+        'modes': {'default': [], 'ring': ['--ring']},
+    },
+    'bus': {
+        'log': "proxnet_bus.log",
+        'label': "Ingestion Bus (DB writer)",
+        'command': [str(VENV_PYTHON), str(SCRIPT_DIR / "proxnet_bus.py"), "--no-csv"],
+        'modes': {'default': [], 'raw': ['--raw']},
+    },
+    'pcap_indexer': {
+        'log': "pcap_indexer.log",
+        'label': "Wi-Fi pcap Indexer",
+        'command': [str(VENV_PYTHON), str(SCRIPT_DIR / "pcap_indexer.py"), "--follow"],
+        'modes': {'default': []},
+    },
+    'archiver': {
+        'log': "proxnet_archive.log",
+        'label': "DB Retention / Archiver",
+        'command': [str(VENV_PYTHON), str(SCRIPT_DIR / "proxnet_archive.py"), "--follow"],
+        'modes': {'default': []},
+        'autostart': True, # Housekeeping, not a scanner: retention should run without anyone clicking Start
+    },
+}
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def read_proc_usage(pid):
+    """(CPU seconds used, resident bytes) of one process from /proc, or None if it is gone."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split() # The command name may contain spaces
+        with open(f"/proc/{pid}/statm") as f:
+            resident = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    # utime and stime are fields 14 and 15 of stat; fields[0] here is field 3
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS, resident * PAGE_SIZE
+
+class OutputLog:
+    """Size-rotated log file plus the last few lines in memory for one process."""
+
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS, lines=OUTPUT_LINES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.handler = logging.handlers.RotatingFileHandler(self.path, maxBytes=max_bytes, backupCount=backups,
+                                                            encoding='utf-8')
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+        self.recent = deque(maxlen=lines)
+        self.lock = threading.Lock() # Written by the reader thread, read by status()
+
+    def write(self, line):
+        with self.lock:
+            self.recent.append(line)
+        self.handler.handle(logging.makeLogRecord({'msg': line})) # Holds the handler lock across rollover
+
+    def tail(self, lines):
+        with self.lock:
+            return list(self.recent)[-lines:]
+
+    def note(self, message):
+        """Supervisor events go in the same log, marked so they stand out from process output."""
+        self.write(f"--- [{time.strftime('%Y-%m-%d %H:%M:%S')}] {message} ---")
+
+    def close(self):
+        self.handler.close()
+
+class ManagedProcess:
+    """State of one supervised scanner. Only the supervisor thread changes it (under Supervisor.lock)."""
+
+    def __init__(self, name, spec, log_dir):
+        self.name = name
+        self.spec = spec
+        self.log = OutputLog(Path(log_dir) / spec.get('log', f"{name}.log"))
+        self.state = 'stopped'  # stopped, running, stopping, backoff, failed, exited
+        self.desired = False
+        self.mode = 'default'
+        self.popen = None
+        self.reader = None
+        self.started_at = None  # Monotonic
+        self.stop_deadline = None
+        self.restart_at = None
+        self.restart_requested = False
+        self.backoff = BACKOFF_INITIAL
+        self.fast_failures = 0
+        self.restarts = 0
+        self.last_exit = None
+        self.last_error = None
+        self.cpu_percent = None
+        self.rss_bytes = None
+        self._last_sample = None # (monotonic, cpu seconds)
+
+    def status(self, lines=0):
+        now = time.monotonic()
+        running = self.popen is not None and self.state in ('running', 'stopping')
+        status = {
+            'name': self.name,
+            'label': self.spec['label'],
+            'state': self.state,
+            'running': running,
+            'desired': self.desired,
+            'mode': self.mode,
+            'modes': list(self.spec['modes']),
+            'pid': self.popen.pid if running else None,
+            'uptime': round(now - self.started_at, 1) if running and self.started_at else None,
+            'restarts': self.restarts,
+            'restart_in': round(max(0.0, self.restart_at - now), 1) if self.state == 'backoff' else None,
+            'last_exit': self.last_exit,
+            'last_error': self.last_error,
+            'cpu_percent': self.cpu_percent if running else None,
+            'rss_bytes': self.rss_bytes if running else None,
+            'log': str(self.log.path),
+        }
+        if lines:
+            status['output'] = self.log.tail(lines)
+        return status
+
+class Supervisor:
+    """Runs the scanners in PROCESSES from a single background thread.
+
+    start()/stop()/restart() return immediately; the thread picks the
+    request up within milliseconds (it is woken, not polled), so web
+    requests never wait on a fork, a sleep or a child's shutdown.
+    """
+
+    def __init__(self, processes=PROCESSES, log_dir=LOG_DIR, autostart=True):
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.processes = {name: ManagedProcess(name, spec, log_dir) for name, spec in processes.items()}
+        self.closing = False
+        self.thread = threading.Thread(target=self._run, name="supervisor", daemon=True)
+        self.thread.start()
+        for name, spec in processes.items():
+            if autostart and spec.get('autostart'):
+                self.start(name)
+
+    # --- Control (any thread) ---
+    def _get(self, name):
+        if name not in self.processes:
+            raise KeyError(f"unknown process '{name}', expected one of {list(self.processes)}")
+        return self.processes[name]
+
+    def start(self, name, mode='default'):
+        proc = self._get(name)
+        if mode not in proc.spec['modes']:
+            raise ValueError(f"unknown mode '{mode}' for {name}, expected one of {list(proc.spec['modes'])}")
+        with self.lock:
+            if proc.desired and proc.state in ('running', 'backoff'):
+                return False
+            proc.desired, proc.mode = True, mode
+            proc.restart_requested = proc.state == 'stopping' # Start again as soon as the old one is gone
+            self._reset(proc)
+        self.wake.set()
+        return True
+
+    def stop(self, name):
+        proc = self._get(name)
+        with self.lock:
+            was_running = proc.desired or proc.popen is not None
+            proc.desired = False
+        self.wake.set()
+        return was_running
+
+    def restart(self, name, mode=None):
+        proc = self._get(name)
+        with self.lock:
+            if mode is not None:
+                if mode not in proc.spec['modes']:
+                    raise ValueError(f"unknown mode '{mode}' for {name}, expected one of {list(proc.spec['modes'])}")
+                proc.mode = mode
+            proc.desired, proc.restart_requested = True, True
+            self._reset(proc)
+        self.wake.set()
+
+    def _reset(self, proc):
+        proc.fast_failures, proc.backoff, proc.restart_at = 0, BACKOFF_INITIAL, None
+        if proc.state in ('failed', 'exited', 'backoff'):
+            proc.state = 'stopped'
+
+    def is_running(self, name):
+        proc = self._get(name)
+        with self.lock:
+            return proc.desired and proc.state in ('running', 'backoff')
+
+    def status(self, name=None, lines=0):
+        with self.lock:
+            if name is not None:
+                return self._get(name).status(lines)
+            return {name: proc.status(lines) for name, proc in self.processes.items()}
+
+    def shutdown(self, timeout=STOP_TIMEOUT + 1):
+        """Stops every process and the supervisor thread; waits up to `timeout` seconds."""
+        with self.lock:
+            self.closing = True
+            for proc in self.processes.values():
+                proc.desired = False
+        self.wake.set()
+        self.thread.join(timeout)
+
+    # --- Supervisor thread ---
+    def _run(self):
+        next_sample = time.monotonic()
+        while True:
+            self.wake.wait(LOOP_INTERVAL)
+            self.wake.clear()
+            now = time.monotonic()
+            with self.lock:
+                for proc in self.processes.values():
+                    try:
+                        self._step(proc, now)
+                    except Exception as e: # One broken spec must not take the others down
+                        proc.last_error = str(e)
+                        print(f"SUPERVISOR: {proc.name}: {e}", file=sys.stderr)
+                if now >= next_sample:
+                    for proc in self.processes.values():
+                        self._sample(proc, now)
+                    next_sample = now + SAMPLE_INTERVAL
+                if self.closing and all(proc.popen is None for proc in self.processes.values()):
+                    break
+        for proc in self.processes.values():
+            if proc.reader:
+                proc.reader.join(1)
+            proc.log.close()
+
+    def _step(self, proc, now):
+        if proc.popen is not None:
+            code = proc.popen.poll()
+            if code is not None:
+                self._reaped(proc, code, now)
+            elif not proc.desired or proc.restart_requested:
+                if proc.state != 'stopping':
+                    self._signal(proc, signal.SIGTERM)
+                    proc.state, proc.stop_deadline = 'stopping', now + STOP_TIMEOUT
+                elif now >= proc.stop_deadline:
+                    proc.log.note(f"no exit {STOP_TIMEOUT:.0f}s after SIGTERM, killing")
+                    self._signal(proc, signal.SIGKILL)
+                    proc.stop_deadline = now + STOP_TIMEOUT
+            return
+        if proc.restart_requested:
+            proc.restart_requested = False
+        if not proc.desired:
+            if proc.state in ('backoff', 'running', 'stopping'):
+                proc.state = 'stopped'
+            return
+        if proc.state == 'failed' or (proc.state == 'backoff' and now < proc.restart_at):
+            return
+        self._spawn(proc, now)
+
+    def _spawn(self, proc, now):
+        command = proc.spec['command'] + proc.spec['modes'][proc.mode]
+        proc.log.note(f"starting {' '.join(command)}")
+        try:
+            proc.popen = subprocess.Popen(
+                command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                start_new_session=True, # Own process group, so children (tcpdump) are signalled too
+                env={**os.environ, 'PYTHONUNBUFFERED': '1'},
+            )
+        except OSError as e:
+            proc.last_error = f"could not start: {e}"
+            proc.log.note(proc.last_error)
+            self._schedule_restart(proc, now, ran_for=0)
+            return
+        proc.state, proc.started_at, proc.last_error = 'running', now, None
+        proc._last_sample = None
+        proc.reader = threading.Thread(target=self._read_output, args=(proc, proc.popen),
+                                       name=f"supervisor-{proc.name}", daemon=True)
+        proc.reader.start()
+
+    def _read_output(self, proc, popen):
+        for raw in iter(popen.stdout.readline, b''):
+            proc.log.write(raw.decode('utf-8', 'replace').rstrip('\r\n'))
+        popen.stdout.close()
+
+    def _signal(self, proc, signum):
+        try:
+            os.killpg(proc.popen.pid, signum)
+        except PermissionError:
+            proc.popen.send_signal(signum) # Root children (sudo) relay signals themselves
+        except ProcessLookupError:
+            pass
+
+    def _reaped(self, proc, code, now):
+        ran_for = now - proc.started_at
+        proc.popen, proc.stop_deadline = None, None
+        proc.last_exit = code
+        proc.cpu_percent = proc.rss_bytes = None
+        proc.log.note(f"exited with code {code} after {ran_for:.1f}s")
+        if not proc.desired:
+            proc.state = 'stopped'
+        elif proc.restart_requested:
+            proc.state = 'stopped' # _step spawns it again on the next pass
+            self.wake.set()
+        elif code == 0:
+            proc.state, proc.desired = 'exited', False # Finished on its own; nothing to recover
+        else:
+            self._schedule_restart(proc, now, ran_for)
+
+    def _schedule_restart(self, proc, now, ran_for):
+        if ran_for >= STABLE_AFTER:
+            proc.backoff, proc.fast_failures = BACKOFF_INITIAL, 0
+        else:
+            proc.fast_failures += 1
+        if proc.fast_failures >= MAX_FAST_FAILURES:
+            proc.state = 'failed'
+            proc.last_error = f"gave up after {proc.fast_failures} failed starts in a row"
+            proc.log.note(proc.last_error)
+            return
+        proc.state, proc.restart_at = 'backoff', now + proc.backoff
+        proc.restarts += 1
+        proc.log.note(f"restarting in {proc.backoff:.0f}s")
+        proc.backoff = min(proc.backoff * 2, BACKOFF_MAX)
+
+    def _sample(self, proc, now):
+        if proc.popen is None:
+            return
+        usage = read_proc_usage(proc.popen.pid)
+        if usage is None:
+            return
+        cpu, proc.rss_bytes = usage
+        if proc._last_sample is not None:
+            then, last_cpu = proc._last_sample
+            proc.cpu_percent = round(100 * (cpu - last_cpu) / max(now - then, 1e-6), 1)
+        proc._last_sample = (now, cpu)
+
+if __name__ == "__main__":
+    # Quick manual check: supervise one process from the command line and print its status
+    import json
+    import argparse
+    parser = argparse.ArgumentParser(description="Run one ProxNet scanner under the supervisor")
+    parser.add_argument("name", choices=list(PROCESSES))
+    parser.add_argument("--mode", default='default')
+    args = parser.parse_args()
+    supervisor = Supervisor(autostart=False)
+    supervisor.start(args.name, args.mode)
+    try:
+        while True:
+            time.sleep(SAMPLE_INTERVAL)
+            print(json.dumps(supervisor.status(args.name, lines=3)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.shutdown()
@@ -4,14 +4,35 @@
 # Milestone 5, Action 7 (Final)
 # Disables CC1101 functionality due to hardware fault.
 
-import subprocess
-import signal
 import time
 import sqlite3
 import os
+import io
+import csv
+import json
+import zlib
+import base64
+import atexit
+import threading
+import itertools
+from datetime import datetime
+from collections import deque
+import proxnet_db
+import pcap_indexer
+import proxnet_bus
+import proxnet_metrics
+import proxnet_archive
+from supervisor import Supervisor
 # NOTE: spidev is no longer needed here as CC1101 check is removed
 from pathlib import Path
-from flask import Flask, render_template_string, redirect, url_for, flash, request
+from flask import Flask, Response, jsonify, render_template_string, redirect, url_for, flash, request
+
+# --- Optional Parquet Export ---
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None # /api/export?format=parquet reports it; CSV and JSONL don't need it
 
 # --- Configuration ---
 HOST_IP = '0.0.0.0'
@@ -19,44 +40,58 @@ HOST_PORT = 5000
 PROJECT_DIR = Path.home() / "proxnet"
 LOG_DIR = PROJECT_DIR / "logs"
 DB_FILE = LOG_DIR / "proxnet_log.db"
-LOGGER_SCRIPT = PROJECT_DIR / "scripts" / "esp32_logger.py"
-NRF24_SNIFFER_SCRIPT = PROJECT_DIR / "scripts" / "nrf24_sniffer.py"
-# CC1101_SNIFFER_SCRIPT path is no longer needed
-VENV_PYTHON = PROJECT_DIR / "venv" / "bin" / "python3"
-
-# --- Global process trackers ---
-logger_process = None
-nrf24_sniffer_process = None
-# cc1101_sniffer_process is no longer needed
+NRF24_SWEEP_FILE = LOG_DIR / "nrf24_sweep.json" # Written by nrf24_sniffer.py --sweep
+PCAP_INDEX_DB = LOG_DIR / "pcap_index.db"       # Written by pcap_indexer.py
+STREAM_POLL_INTERVAL = 0.5 # Seconds between checks for new rows/status (shared by all viewers)
+STREAM_BACKLOG = 500       # Recent rows kept in memory for clients resuming after a reconnect
+STREAM_KEEPALIVE = 15      # Seconds of silence before a keepalive comment is sent
+LIVE_TABLE_ROWS = 100      # Rows kept in the page's live table
+API_DEFAULT_LIMIT = 100    # /api/scans page size when ?limit= is not given
+API_MAX_LIMIT = 10000      # Largest page /api/scans will stream
+API_FETCH_SIZE = 500       # Rows pulled from SQLite per step while streaming
+SQLITE_INT_MAX = 2**63 - 1 # Query values past this raise OverflowError instead of matching nothing
+TIME_LIMIT_S = SQLITE_INT_MAX // 1_000_000
+RSSI_DEFAULT_RANGE = 24 * 3600 # Seconds of history /api/rssi returns when ?since= is not given
+RSSI_MAX_POINTS = 500          # Default point budget used to pick the rollup resolution
+LOG_TAIL_INITIAL = 16 * 1024   # Bytes from the end shown when a log is first opened
+LOG_TAIL_DEFAULT = 64 * 1024   # Largest response per /api/logs poll unless ?max_bytes= asks for less/more...
+LOG_TAIL_MAX = 1024 * 1024     # ...up to this
+LOG_TAIL_POLL = 2000           # Milliseconds between polls in the page's log viewer
+EXPORT_CHUNK_ROWS = 2000       # Rows formatted per chunk of a CSV/JSONL export...
+EXPORT_PARQUET_ROWS = 50000    # ...and per Parquet row group (bounds the export's memory use)
+EXPORT_GZIP_LEVEL = 6
+METRICS_POLL = 5000            # Milliseconds between polls in the page's metrics panel
 
 # --- Create Flask App ---
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 
-# --- Database Setup ---
+# --- Database Setup (shared schema in proxnet_db.py) ---
 def setup_database():
     if not DB_FILE.is_file():
         LOG_DIR.mkdir(parents=True, exist_ok=True)
         print(f"Database file not found, creating at: {DB_FILE}")
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS scans (
-                timestamp TEXT NOT NULL, module_type TEXT, protocol TEXT,
-                uid TEXT, uid_len INTEGER, mac TEXT, name TEXT, rssi INTEGER
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        proxnet_db.setup_database(DB_FILE)
         print(f"Database initialized/verified at: {DB_FILE}")
     except sqlite3.Error as e:
         print(f"DB_ERROR: Failed to initialize database - {e}")
 
+# --- Process Supervision (scanners run under supervisor.py) ---
+supervisor = None
+supervisor_lock = threading.Lock()
+
+def get_supervisor():
+    global supervisor
+    with supervisor_lock:
+        if supervisor is None:
+            supervisor = Supervisor()
+            atexit.register(supervisor.shutdown)
+        return supervisor
+
 # --- Helper Functions ---
 def is_logger_running():
-    global logger_process
-    return logger_process is not None and logger_process.poll() is None
+    return get_supervisor().is_running('logger')
 
 def get_latest_scans(limit=15):
     scans = []
@@ -67,7 +102,7 @@ def get_latest_scans(limit=15):
         conn = sqlite3.connect(DB_FILE)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM scans ORDER BY timestamp DESC LIMIT ?", (limit,))
+        cursor.execute("SELECT * FROM scans ORDER BY ts_us DESC, id DESC LIMIT ?", (limit,))
         scans = cursor.fetchall()
         conn.close()
     except sqlite3.Error as e:
@@ -77,13 +112,346 @@ def get_latest_scans(limit=15):
 
 # --- nRF24 Sniffer Control Helpers ---
 def is_nrf24_sniffer_running():
-    global nrf24_sniffer_process
-    if nrf24_sniffer_process:
-         poll_result = nrf24_sniffer_process.poll()
-         is_running = poll_result is None
-         if not is_running: nrf24_sniffer_process = None
-    else: is_running = False
-    return is_running
+    return get_supervisor().is_running('nrf24')
+
+# --- Live Updates (Server-Sent Events) ---
+def fetch_scans_after(conn, cursor, limit=STREAM_BACKLOG):
+    """Rows with id > cursor, oldest first, as plain dicts."""
+    rows = conn.execute("SELECT * FROM scans WHERE id > ? ORDER BY id LIMIT ?", (cursor, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+def get_process_status():
+    status = {'logger_running': is_logger_running(), 'nrf24_sniffer_running': is_nrf24_sniffer_running()}
+    for name in ('cc1101', 'wifi', 'bus', 'pcap_indexer', 'archiver'):
+        status[f'{name}_running'] = get_supervisor().is_running(name)
+    return status
+
+def supervisor_samples():
+    """Per-process CPU/RSS/running gauges from the supervisor, as extra /metrics samples."""
+    samples = []
+    for name, status in get_supervisor().status().items():
+        labels = {'process': name}
+        samples.append(('supervised_running', 'gauge', "1 if the supervisor has the process running", labels,
+                        int(status['running'])))
+        samples.append(('supervised_restarts_total', 'counter', "Restarts by the supervisor", labels, status['restarts']))
+        if status['cpu_percent'] is not None:
+            samples.append(('supervised_cpu_percent', 'gauge', "CPU use over the last sample", labels,
+                            float(status['cpu_percent'])))
+        if status['rss_bytes'] is not None:
+            samples.append(('supervised_rss_bytes', 'gauge', "Resident memory", labels, status['rss_bytes']))
+    return samples
+
+def summarize_metrics(snapshot):
+    """One process's snapshot flattened for the page: counter/gauge values, histogram count/mean/p50/p95."""
+    values, histograms = {}, {}
+    for metric in snapshot['metrics']:
+        key = metric['name'] + "".join(f",{k}={v}" for k, v in metric['labels'].items())
+        value = metric['value']
+        if metric['type'] != 'histogram':
+            values[key] = value
+            continue
+        histograms[key] = {'count': value['count'],
+                           'mean': value['sum'] / value['count'] if value['count'] else None,
+                           'p50': proxnet_metrics.quantile(value, 0.5), 'p95': proxnet_metrics.quantile(value, 0.95)}
+    return {'process': snapshot['process'], 'up': snapshot['up'], 'age': round(snapshot['age'], 1),
+            'time': snapshot['time'], 'values': values, 'histograms': histograms}
+
+class ScanBroadcaster:
+    """Single poller that fans new scan rows and process status out to every SSE client.
+
+    Only this thread touches the database, on a fixed interval, so the cost
+    stays the same no matter how many pages are open; clients just wait on
+    the condition for rows past their cursor.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.recent = deque(maxlen=STREAM_BACKLOG) # Scan dicts, ascending id
+        self.last_id = 0
+        self.status = get_process_status()
+        self.status_version = 0
+        if DB_FILE.is_file():
+            conn = proxnet_db.connect(DB_FILE)
+            try: self.last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM scans").fetchone()[0]
+            finally: conn.close()
+        self.thread = threading.Thread(target=self._poll, name="scan-broadcaster", daemon=True)
+        self.thread.start()
+
+    def _poll(self):
+        conn = None
+        while True:
+            try:
+                if conn is None and DB_FILE.is_file():
+                    conn = proxnet_db.connect(DB_FILE)
+                while conn:
+                    # One page per tick would cap the stream at STREAM_BACKLOG rows per interval; read until caught up
+                    rows = fetch_scans_after(conn, self.last_id)
+                    if rows:
+                        with self.cond:
+                            self.recent.extend(rows)
+                            self.last_id = rows[-1]['id']
+                            self.cond.notify_all()
+                    if len(rows) < STREAM_BACKLOG:
+                        break
+            except sqlite3.Error as e:
+                print(f"DB_ERROR: Stream poller failed - {e}")
+                if conn: conn.close()
+                conn = None
+            status = get_process_status()
+            if status != self.status:
+                with self.cond:
+                    self.status = status
+                    self.status_version += 1
+                    self.cond.notify_all()
+            time.sleep(STREAM_POLL_INTERVAL)
+
+    def wait(self, cursor, status_version, timeout):
+        """Blocks until there are rows past `cursor` or a newer status.
+
+        Returns (rows, status, status_version); rows is None when the cursor
+        is older than the in-memory backlog and the caller must read the DB.
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.last_id > cursor or self.status_version != status_version, timeout)
+            if self.last_id <= cursor:
+                rows = []
+            elif not self.recent or self.recent[0]['id'] > cursor + 1:
+                rows = None # Cursor predates the backlog
+            else:
+                rows = [row for row in self.recent if row['id'] > cursor]
+            return rows, self.status, self.status_version
+
+broadcaster = None
+broadcaster_lock = threading.Lock()
+
+def get_broadcaster():
+    global broadcaster
+    with broadcaster_lock:
+        if broadcaster is None:
+            broadcaster = ScanBroadcaster()
+        return broadcaster
+
+def sse_event(event, data, event_id=None):
+    message = f"event: {event}\n"
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    return message + f"data: {json.dumps(data)}\n\n"
+
+# --- Log Tail Helpers ---
+def _read_span(path, start, end, max_bytes):
+    """Bytes [start, end) of `path`, capped to the last `max_bytes` and cut at line boundaries.
+
+    Returns (text, next offset, bytes skipped). Only the returned span is
+    read, so the cost doesn't depend on the file size.
+    """
+    skipped = 0
+    if end - start > max_bytes:
+        skipped = end - max_bytes - start
+        start = end - max_bytes
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    if skipped:
+        # Landed mid-line: drop the partial first line
+        newline = data.find(b'\n')
+        if 0 <= newline < len(data) - 1:
+            skipped += newline + 1
+            start += newline + 1
+            data = data[newline + 1:]
+    # Hold back a trailing partial line until it is complete (unless it alone fills the cap)
+    newline = data.rfind(b'\n')
+    if newline >= 0:
+        data = data[:newline + 1]
+    elif len(data) < max_bytes:
+        data = b""
+    return data.decode('utf-8', 'replace'), start + len(data), skipped
+
+def read_log_tail(path, offset=None, inode=None, max_bytes=LOG_TAIL_DEFAULT):
+    """New lines of a (possibly rotating) log since the client's (inode, offset).
+
+    Without an offset the last LOG_TAIL_INITIAL bytes are returned. If the
+    file was rotated (the client's inode is now <path>.1) the rest of the
+    rotated file is returned first; if it was truncated or replaced, reading
+    starts over from the beginning of the current file with reset=True.
+    """
+    st = os.stat(path)
+    result = {'inode': st.st_ino, 'size': st.st_size, 'reset': False, 'skipped': 0}
+    if offset is None:
+        text, next_offset, skipped = _read_span(path, max(0, st.st_size - LOG_TAIL_INITIAL), st.st_size,
+                                                min(max_bytes, LOG_TAIL_INITIAL))
+        return {**result, 'text': text, 'offset': next_offset}
+    if inode is not None and inode != st.st_ino:
+        rotated = Path(f"{path}.1")
+        try:
+            old = os.stat(rotated)
+        except FileNotFoundError:
+            old = None
+        if old is not None and old.st_ino == inode and offset < old.st_size:
+            # Finish the rotated file; the next poll (with the new inode) moves on to the current one
+            text, _, skipped = _read_span(rotated, offset, old.st_size, max_bytes)
+            return {**result, 'text': text, 'offset': 0, 'skipped': skipped}
+        offset, result['reset'] = 0, True
+    elif offset > st.st_size:
+        offset, result['reset'] = 0, True # Truncated in place
+    text, next_offset, skipped = _read_span(path, offset, st.st_size, max_bytes)
+    return {**result, 'text': text, 'offset': next_offset, 'skipped': skipped}
+
+# --- Scan Query API Helpers ---
+def parse_time_us(value):
+    """Accepts epoch seconds or an ISO 8601 date/time (local time if no offset) and returns epoch microseconds."""
+    try:
+        seconds = float(value)
+    except ValueError:
+        return int(datetime.fromisoformat(value).timestamp() * 1_000_000)
+    if not -TIME_LIMIT_S < seconds < TIME_LIMIT_S: # Also false for inf and nan
+        raise ValueError(f"time out of range: {value!r}")
+    return int(seconds * 1_000_000)
+
+def encode_cursor(ts_us, row_id):
+    return base64.urlsafe_b64encode(f"{ts_us}:{row_id}".encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    ts_us, row_id = (int(part) for part in raw.split(':'))
+    if max(abs(ts_us), abs(row_id)) > SQLITE_INT_MAX:
+        raise ValueError("cursor out of range")
+    return ts_us, row_id
+
+def parse_scan_filters(args):
+    """Turns query-string filters into a dict shared by the SQL and archive queries; raises ValueError on bad input.
+
+    Supported: module_type / protocol (comma-separated lists), mac and uid
+    (exact match), since / until (see parse_time_us) and min_rssi.
+    """
+    filters = {}
+    for column in ('module_type', 'protocol'):
+        if args.get(column):
+            filters[column] = [v.strip() for v in args[column].split(',') if v.strip()]
+    for column in ('mac', 'uid'):
+        if args.get(column):
+            filters[column] = args[column].strip()
+    if args.get('since'):
+        filters['since_us'] = parse_time_us(args['since'])
+    if args.get('until'):
+        filters['until_us'] = parse_time_us(args['until'])
+    if args.get('min_rssi'):
+        filters['min_rssi'] = max(-SQLITE_INT_MAX, min(int(args['min_rssi']), SQLITE_INT_MAX))
+    return filters
+
+def build_scan_filters(filters):
+    """(WHERE clause, params) for a parse_scan_filters dict."""
+    clauses, params = [], []
+    for column in ('module_type', 'protocol'):
+        if filters.get(column):
+            clauses.append(f"{column} IN ({','.join('?' * len(filters[column]))})")
+            params += filters[column]
+    for column in ('mac', 'uid'):
+        if filters.get(column):
+            # Plain equality so (mac, ts_us) can serve both the filter and the ordering
+            clauses.append(f"{column} = ?"); params.append(filters[column])
+    if 'since_us' in filters:
+        clauses.append("ts_us >= ?"); params.append(filters['since_us'])
+    if 'until_us' in filters:
+        clauses.append("ts_us < ?"); params.append(filters['until_us'])
+    if 'min_rssi' in filters:
+        clauses.append("rssi >= ?"); params.append(filters['min_rssi'])
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def iter_scan_rows(conn, where, params, cursor=None, limit=None, newest_first=True):
+    """Yields matching scans newest (or oldest) first, resuming strictly after a keyset cursor (ts_us, id)."""
+    op, order = ("<", " DESC") if newest_first else (">", "")
+    if cursor:
+        ts_us, row_id = cursor
+        # Row-value form: SQLite turns it into an index range, the expanded OR form into a full index scan
+        where += (" AND " if where else " WHERE ") + f"(ts_us, id) {op} (?, ?)"
+        params = params + [ts_us, row_id]
+    sql = f"SELECT * FROM scans{where} ORDER BY ts_us{order}, id{order}"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params = params + [limit]
+    result = conn.execute(sql, params)
+    while True:
+        rows = result.fetchmany(API_FETCH_SIZE)
+        if not rows:
+            break
+        for row in rows:
+            yield dict(row)
+
+# --- Export ---
+EXPORT_COLUMNS = list(proxnet_archive.ARCHIVE_TABLES['scans'])
+EXPORT_FORMATS = { # format -> (mimetype, file extension)
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+def _batches(rows, size):
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+def export_csv(rows):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(EXPORT_COLUMNS)
+    yield out.getvalue().encode()
+    for batch in _batches(rows, EXPORT_CHUNK_ROWS):
+        out.seek(0)
+        out.truncate()
+        writer.writerows([row[column] for column in EXPORT_COLUMNS] for row in batch)
+        yield out.getvalue().encode()
+
+def export_jsonl(rows):
+    for batch in _batches(rows, EXPORT_CHUNK_ROWS):
+        yield "".join(json.dumps(row) + "\n" for row in batch).encode()
+
+class _ChunkSink:
+    """Write-only file for ParquetWriter: keeps the bytes written since the last take() and a running position."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def export_parquet(rows):
+    types = {'int': pa.int64(), 'str': pa.string(), 'float': pa.float64()}
+    schema = pa.schema([(name, types[kind]) for name, kind in proxnet_archive.ARCHIVE_TABLES['scans'].items()])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema)
+    for batch in _batches(rows, EXPORT_PARQUET_ROWS):
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema)) # One row group per batch
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+def gzip_chunks(chunks, level=EXPORT_GZIP_LEVEL):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
 
 # --- Hardware Status Check Functions (REMOVED CC1101) ---
 # NOTE: check_cc1101_connection function is REMOVED
@@ -120,7 +488,6 @@ HTML_TEMPLATE = """
         .flash.error { background-color: #f8d7da; color: #721c24; border-color: #f5c6cb; }
         .flash.success { background-color: #d4edda; color: #155724; border-color: #c3e6cb; }
     </style>
-    <meta http-equiv="refresh" content="10">
 </head>
 <body>
     <div class="container">
@@ -140,30 +507,61 @@ HTML_TEMPLATE = """
         <hr>
 
         <h2>ESP32 RFID/NFC/BT/BLE Logger Control</h2>
-        <div class="status {{ 'running' if logger_running else 'stopped' }}">Status: {{ 'Running' if logger_running else 'Stopped' }}</div>
+        <div id="logger_running" class="status {{ 'running' if logger_running else 'stopped' }}">Status: {{ 'Running' if logger_running else 'Stopped' }}</div>
         <div>
-            <form action="{{ url_for('start_logger') }}" method="post" style="display: inline;"><button type="submit" class="start-btn" {{ 'disabled' if logger_running else '' }}>Start Logger</button></form>
-            <form action="{{ url_for('stop_logger') }}" method="post" style="display: inline;"><button type="submit" class="stop-btn" {{ '' if logger_running else 'disabled' }}>Stop Logger</button></form>
+            <form action="{{ url_for('start_logger') }}" method="post" style="display: inline;"><button type="submit" class="start-btn" data-start="logger_running" {{ 'disabled' if logger_running else '' }}>Start Logger</button></form>
+            <form action="{{ url_for('stop_logger') }}" method="post" style="display: inline;"><button type="submit" class="stop-btn" data-stop="logger_running" {{ '' if logger_running else 'disabled' }}>Stop Logger</button></form>
         </div>
         <hr>
 
         <h2>nRF24L01+ (2.4GHz) Sniffer Control</h2>
-        <div class="status {{ 'running' if nrf24_sniffer_running else 'stopped' }}">Status: {{ 'Running' if nrf24_sniffer_running else 'Stopped' }}</div>
+        <div id="nrf24_sniffer_running" class="status {{ 'running' if nrf24_sniffer_running else 'stopped' }}">Status: {{ 'Running' if nrf24_sniffer_running else 'Stopped' }}</div>
          {% if nrf24_status == 'Ready (Check Manually)' %}
          <div>
-            <form action="{{ url_for('start_nrf24_sniffer') }}" method="post" style="display: inline;"><button type="submit" class="start-btn" {{ 'disabled' if nrf24_sniffer_running else '' }}>Start Sniffer</button></form>
-            <form action="{{ url_for('stop_nrf24_sniffer') }}" method="post" style="display: inline;"><button type="submit" class="stop-btn" {{ '' if nrf24_sniffer_running else 'disabled' }}>Stop Sniffer</button></form>
+            <form action="{{ url_for('start_nrf24_sniffer') }}" method="post" style="display: inline;"><button type="submit" class="start-btn" data-start="nrf24_sniffer_running" {{ 'disabled' if nrf24_sniffer_running else '' }}>Start Sniffer</button></form>
+            <form action="{{ url_for('start_nrf24_sniffer') }}" method="post" style="display: inline;"><input type="hidden" name="mode" value="sweep"><button type="submit" class="start-btn" data-start="nrf24_sniffer_running" {{ 'disabled' if nrf24_sniffer_running else '' }}>Start Channel Sweep</button></form>
+            <form action="{{ url_for('stop_nrf24_sniffer') }}" method="post" style="display: inline;"><button type="submit" class="stop-btn" data-stop="nrf24_sniffer_running" {{ '' if nrf24_sniffer_running else 'disabled' }}>Stop Sniffer</button></form>
          </div>
          {% else %}
          <p style="color: grey;">Module status indicates an issue. Controls disabled.</p>
          {% endif %}
+         <div id="sweep-panel" style="display: none;">
+            <h3>Channel Activity (sweep)</h3>
+            <table><thead><tr><th>Channel</th><th>Rate</th><th>Packets</th><th>RPD Hits</th><th>Visits</th><th>Dwell (s)</th></tr></thead><tbody id="sweep-rows"></tbody></table>
+         </div>
         <hr>
 
-        <h2>Latest Scans (Last {{ scans|length }})</h2>
-        {% if scans %}
-        <table>
-            <thead><tr><th>Timestamp</th><th>Module</th><th>Protocol</th><th>UID</th><th>UID Len</th><th>MAC</th><th>Name</th><th>RSSI</th></tr></thead>
-            <tbody>
+        <h2>DB Retention / Archiver</h2>
+        <div id="archiver_running" class="status {{ 'running' if archiver_running else 'stopped' }}">Status: {{ 'Running' if archiver_running else 'Stopped' }}</div>
+        <div>
+            <button type="button" class="start-btn" data-start="archiver_running" data-process="archiver" data-action="start" {{ 'disabled' if archiver_running else '' }}>Start Archiver</button>
+            <button type="button" class="stop-btn" data-stop="archiver_running" data-process="archiver" data-action="stop" {{ '' if archiver_running else 'disabled' }}>Stop Archiver</button>
+            <a href="{{ url_for('api_archive') }}">(archived days)</a>
+        </div>
+        <hr>
+
+        <h2>Scanner Output</h2>
+        <select id="log-name">
+            {% for name in log_names %}<option value="{{ name }}" {{ 'selected' if name == 'nrf24' else '' }}>{{ name }}</option>{% endfor %}
+        </select>
+        <span id="log-state" style="font-size: 0.9em; color: grey;"></span>
+        <pre id="log-view" style="height: 240px; overflow-y: auto; background: #222; color: #ddd; padding: 8px; font-size: 0.8em;"></pre>
+        <hr>
+
+        <h2>Pipeline Metrics <a href="{{ url_for('metrics') }}" style="font-size: 0.6em;">(Prometheus)</a></h2>
+        <p id="no-metrics" style="color: grey;">No scanner has written metrics yet.</p>
+        <table id="metrics-table" style="display: none;">
+            <thead><tr><th>Process</th><th>Metric</th><th>Value</th><th>Rate (/s)</th><th>p50</th><th>p95</th></tr></thead>
+            <tbody id="metrics-rows"></tbody>
+        </table>
+        <hr>
+
+        <h2>Latest Scans <span id="live-state" style="font-size: 0.6em; color: grey;">(live)</span>
+            <a href="{{ url_for('api_export', format='csv', gzip=1) }}" style="font-size: 0.6em;">(export CSV)</a></h2>
+        <p id="no-scans" {{ 'style=display:none' if scans else '' }}>No scans found in the database yet, or the database file cannot be read.</p>
+        <table id="scan-table" {{ '' if scans else 'style=display:none' }}>
+            <thead><tr><th>Timestamp</th><th>Module</th><th>Protocol</th><th>UID</th><th>UID Len</th><th>MAC</th><th>Name</th><th>RSSI</th><th>Seen</th></tr></thead>
+            <tbody id="scan-rows">
                 {% for scan in scans %}
                 <tr>
                     <td>{{ scan['timestamp'] }}</td><td>{{ scan['module_type'] }}</td>
@@ -173,14 +571,134 @@ HTML_TEMPLATE = """
                     <td>{{ scan['mac'] if scan['mac'] else 'N/A' }}</td>
                     <td>{{ scan['name'] if scan['name'] else 'N/A' }}</td>
                     <td>{{ scan['rssi'] if scan['rssi'] is not none else 'N/A' }}</td>
+                    <td>{{ scan['seen_count'] if scan['seen_count'] is not none else 1 }}</td>
                 </tr>
                 {% endfor %}
             </tbody>
         </table>
-        {% else %}
-        <p>No scans found in the database yet, or the database file cannot be read.</p>
-        {% endif %}
     </div>
+    <script>
+        // Live updates: new rows and process status arrive over /stream (SSE).
+        const MAX_ROWS = {{ max_rows }};
+        const rowsEl = document.getElementById('scan-rows');
+        const source = new EventSource("{{ url_for('stream') }}?cursor={{ cursor }}");
+
+        function cell(value, zeroOk) {
+            const td = document.createElement('td');
+            td.textContent = (value === null || value === undefined || (!zeroOk && value === '')) ? 'N/A' : value;
+            return td;
+        }
+
+        source.addEventListener('scans', (e) => {
+            for (const scan of JSON.parse(e.data)) {
+                const tr = document.createElement('tr');
+                tr.append(cell(scan.timestamp), cell(scan.module_type), cell(scan.protocol), cell(scan.uid),
+                          cell(scan.uid_len, true), cell(scan.mac), cell(scan.name), cell(scan.rssi, true),
+                          cell(scan.seen_count ?? 1, true));
+                rowsEl.prepend(tr);
+            }
+            while (rowsEl.rows.length > MAX_ROWS) rowsEl.deleteRow(-1);
+            document.getElementById('scan-table').style.display = '';
+            document.getElementById('no-scans').style.display = 'none';
+        });
+
+        source.addEventListener('status', (e) => {
+            for (const [key, running] of Object.entries(JSON.parse(e.data))) {
+                const el = document.getElementById(key);
+                if (!el) continue;
+                el.className = 'status ' + (running ? 'running' : 'stopped');
+                el.textContent = 'Status: ' + (running ? 'Running' : 'Stopped');
+                document.querySelectorAll(`[data-start="${key}"]`).forEach((b) => b.disabled = running);
+                document.querySelectorAll(`[data-stop="${key}"]`).forEach((b) => b.disabled = !running);
+            }
+        });
+
+        // Processes without routes of their own go through the supervisor API; the status event updates the buttons
+        document.querySelectorAll('[data-process]').forEach((button) => button.addEventListener('click', () => {
+            fetch(`{{ url_for('api_processes') }}/${button.dataset.process}/${button.dataset.action}`, {method: 'POST'});
+        }));
+
+        // Sweep histogram: busiest channels first, refreshed while a sweep report exists
+        function loadSweep() {
+            fetch("{{ url_for('api_nrf24_sweep') }}").then((r) => r.ok ? r.json() : null).then((report) => {
+                if (!report || !report.slots) return;
+                const body = document.getElementById('sweep-rows');
+                body.replaceChildren();
+                report.slots.filter((s) => s.packets || s.rpd_hits).slice(0, 10).forEach((s) => {
+                    const tr = document.createElement('tr');
+                    tr.append(cell(s.channel, true), cell(s.data_rate), cell(s.packets, true), cell(s.rpd_hits, true),
+                              cell(s.visits, true), cell(s.dwell, true));
+                    body.append(tr);
+                });
+                document.getElementById('sweep-panel').style.display = '';
+            }).catch(() => {});
+        }
+        loadSweep();
+        setInterval(loadSweep, 5000);
+
+        // Log viewer: only bytes written since the last poll are fetched
+        const LOG_LINES = 1000;
+        const logView = document.getElementById('log-view');
+        const logSelect = document.getElementById('log-name');
+        let logPos = null;
+        function appendLog(text) {
+            const atBottom = logView.scrollTop + logView.clientHeight >= logView.scrollHeight - 4;
+            const lines = (logView.textContent + text).split('\n');
+            logView.textContent = lines.slice(-LOG_LINES).join('\n');
+            if (atBottom) logView.scrollTop = logView.scrollHeight;
+        }
+        function pollLog() {
+            const name = logSelect.value;
+            const query = logPos ? `?offset=${logPos.offset}&inode=${logPos.inode ?? ''}` : '';
+            fetch(`/api/logs/${encodeURIComponent(name)}${query}`).then((r) => r.ok ? r.json() : null).then((data) => {
+                if (!data || name !== logSelect.value) return;
+                if (data.reset) logView.textContent = '';
+                if (data.skipped) appendLog(`... ${data.skipped} bytes skipped ...\n`);
+                if (data.text) appendLog(data.text);
+                logPos = {offset: data.offset, inode: data.inode};
+                document.getElementById('log-state').textContent = `${data.size} bytes`;
+            }).catch(() => {});
+        }
+        logSelect.addEventListener('change', () => { logPos = null; logView.textContent = ''; pollLog(); });
+        pollLog();
+        setInterval(pollLog, {{ log_poll_ms }});
+
+        // Metrics panel: rates are computed between polls from the counters' snapshot times
+        const lastMetrics = {};
+        function fmtSeconds(v) { return v === null ? 'N/A' : (v < 0.001 ? (v * 1e6).toFixed(0) + ' us' : (v * 1000).toFixed(1) + ' ms'); }
+        function pollMetrics() {
+            fetch("{{ url_for('api_metrics') }}").then((r) => r.ok ? r.json() : null).then((data) => {
+                if (!data) return;
+                const body = document.getElementById('metrics-rows');
+                body.replaceChildren();
+                for (const p of data.processes) {
+                    const label = p.process + (p.up ? '' : ' (down)');
+                    const prev = lastMetrics[p.process];
+                    for (const [key, value] of Object.entries(p.values)) {
+                        const dt = prev ? p.time - prev.time : 0;
+                        const rate = key.includes('_total') && dt > 0 ? ((value - prev.values[key]) / dt).toFixed(1) : '';
+                        const tr = document.createElement('tr');
+                        tr.append(cell(label), cell(key), cell(value, true), cell(rate, true), cell('', true), cell('', true));
+                        body.append(tr);
+                    }
+                    for (const [key, h] of Object.entries(p.histograms)) {
+                        const fmt = key.includes('_seconds') ? fmtSeconds : (v) => v ?? 'N/A';
+                        const tr = document.createElement('tr');
+                        tr.append(cell(label), cell(key), cell(h.count, true), cell('', true), cell(fmt(h.p50)), cell(fmt(h.p95)));
+                        body.append(tr);
+                    }
+                    if (!prev || prev.time !== p.time) lastMetrics[p.process] = p;
+                }
+                document.getElementById('metrics-table').style.display = data.processes.length ? '' : 'none';
+                document.getElementById('no-metrics').style.display = data.processes.length ? 'none' : '';
+            }).catch(() => {});
+        }
+        pollMetrics();
+        setInterval(pollMetrics, {{ metrics_poll_ms }});
+
+        source.onopen = () => document.getElementById('live-state').textContent = '(live)';
+        source.onerror = () => document.getElementById('live-state').textContent = '(reconnecting...)';
+    </script>
 </body>
 </html>
 """
@@ -199,75 +717,405 @@ def index():
         HTML_TEMPLATE,
         logger_running=running,
         nrf24_sniffer_running=nrf24_running,
+        archiver_running=get_supervisor().is_running('archiver'),
         scans=latest_scans,
+        cursor=max((scan['id'] for scan in latest_scans), default=0),
+        max_rows=LIVE_TABLE_ROWS,
+        log_names=list(get_supervisor().processes),
+        log_poll_ms=LOG_TAIL_POLL,
+        metrics_poll_ms=METRICS_POLL,
         esp32_status=esp32_status_check,
         nrf24_status=nrf24_status_check,
         cc1101_status=cc1101_status_check
     )
 
+@app.route('/stream')
+def stream():
+    """SSE feed of new scans and process status; resumes from Last-Event-ID (a scan id)."""
+    source = get_broadcaster()
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    try: cursor = int(cursor)
+    except (TypeError, ValueError): cursor = source.last_id
+
+    def generate(cursor):
+        status_version = -1 # Always send the current status first
+        yield "retry: 3000\n\n"
+        while True:
+            rows, status, version = source.wait(cursor, status_version, STREAM_KEEPALIVE)
+            if rows is None:
+                try:
+                    conn = proxnet_db.connect(DB_FILE)
+                    try: rows = fetch_scans_after(conn, cursor)
+                    finally: conn.close()
+                except sqlite3.Error as e:
+                    print(f"DB_ERROR: Failed to replay scans - {e}")
+                    rows = []
+            if version != status_version:
+                status_version = version
+                yield sse_event('status', status)
+            if rows:
+                cursor = rows[-1]['id']
+                yield sse_event('scans', rows, cursor)
+            elif version == status_version:
+                yield ": keepalive\n\n"
+
+    return Response(generate(cursor), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/bus/stream')
+def bus_stream():
+    """SSE relay of the ingestion bus: every record from every scanner, in bus order (event 'bus')."""
+    try:
+        events = proxnet_bus.subscribe(timeout=STREAM_KEEPALIVE)
+    except OSError:
+        return jsonify(error="The ingestion bus is not running."), 503
+
+    def generate():
+        yield "retry: 3000\n\n"
+        try:
+            # Ends when the daemon goes away; the browser reconnects after `retry`
+            for event in events:
+                yield sse_event('bus', event, event['seq']) if event else ": keepalive\n\n"
+        finally:
+            events.close()
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # --- ESP32 Logger Routes ---
 @app.route('/start_logger', methods=['POST'])
 def start_logger():
-    global logger_process
-    if is_logger_running(): flash("Logger is already running.", "error")
-    else:
-        try:
-            setup_database()
-            logger_process = subprocess.Popen([str(VENV_PYTHON), str(LOGGER_SCRIPT)])
-            flash("Logger started successfully!", "success"); print("Logger process started.")
-            time.sleep(1)
-        except Exception as e:
-            flash(f"Error starting logger: {e}", "error"); print(f"Error starting logger: {e}")
-            logger_process = None
+    setup_database()
+    if get_supervisor().start('logger'):
+        flash("Logger starting...", "success"); print("Logger start requested.")
+    else: flash("Logger is already running.", "error")
     return redirect(url_for('index'))
 
 @app.route('/stop_logger', methods=['POST'])
 def stop_logger():
-    global logger_process
-    if is_logger_running():
-        try:
-            logger_process.terminate()
-            try: logger_process.wait(timeout=5)
-            except subprocess.TimeoutExpired: logger_process.kill(); print("Logger process killed.")
-            flash("Logger stopped successfully!", "success"); print("Logger process stopped.")
-        except Exception as e:
-            flash(f"Error stopping logger: {e}", "error"); print(f"Error stopping logger: {e}")
-        finally: logger_process = None
+    if get_supervisor().stop('logger'):
+        flash("Logger stopping...", "success"); print("Logger stop requested.")
     else: flash("Logger is not running.", "error")
     return redirect(url_for('index'))
 
 # --- nRF24 Sniffer Routes ---
 @app.route('/start_nrf24_sniffer', methods=['POST'])
 def start_nrf24_sniffer():
-    global nrf24_sniffer_process
-    if is_nrf24_sniffer_running(): flash("nRF24 Sniffer is already running.", "error")
-    elif not NRF24_SNIFFER_SCRIPT.is_file(): flash(f"Error: Script not found {NRF24_SNIFFER_SCRIPT}", "error")
-    else:
-        try:
-            log_file = LOG_DIR / "nrf24_sniffer.log"
-            with open(log_file, 'w') as f: f.write(f"Starting nRF24 Sniffer at {time.strftime('%Y-%m-%d %H:%M:%S')}...\n")
-            nrf24_sniffer_process = subprocess.Popen([str(VENV_PYTHON), str(NRF24_SNIFFER_SCRIPT)], stdout=open(log_file, 'a'), stderr=subprocess.STDOUT)
-            flash("nRF24 Sniffer started! Outputting to log file.", "success"); print("nRF24 Sniffer process started.")
-        except Exception as e:
-            flash(f"Error starting nRF24 Sniffer: {e}", "error"); print(f"Error starting nRF24 Sniffer: {e}")
-            nrf24_sniffer_process = None
+    mode = 'sweep' if request.form.get('mode') == 'sweep' else 'default'
+    if get_supervisor().start('nrf24', mode):
+        flash("nRF24 Sniffer starting! Outputting to log file.", "success"); print("nRF24 Sniffer start requested.")
+    else: flash("nRF24 Sniffer is already running.", "error")
     return redirect(url_for('index'))
 
 @app.route('/stop_nrf24_sniffer', methods=['POST'])
 def stop_nrf24_sniffer():
-    global nrf24_sniffer_process
-    if is_nrf24_sniffer_running():
-        try:
-            nrf24_sniffer_process.terminate()
-            try: nrf24_sniffer_process.wait(timeout=5)
-            except subprocess.TimeoutExpired: nrf24_sniffer_process.kill(); print("nRF24 Sniffer killed.")
-            flash("nRF24 Sniffer stopped successfully!", "success"); print("nRF24 Sniffer process stopped.")
-        except Exception as e:
-            flash(f"Error stopping nRF24 Sniffer: {e}", "error"); print(f"Error stopping nRF24 Sniffer: {e}")
-        finally: nrf24_sniffer_process = None
+    if get_supervisor().stop('nrf24'):
+        flash("nRF24 Sniffer stopping...", "success"); print("nRF24 Sniffer stop requested.")
     else: flash("nRF24 Sniffer is not running.", "error")
     return redirect(url_for('index'))
 
+# --- JSON API Routes ---
+@app.route('/api/scans')
+def api_scans():
+    """Filtered scans, newest first, one keyset page at a time.
+
+    Pass the returned next_cursor as ?cursor= to get the following page; deep
+    pages cost the same as the first because no OFFSET is involved. The page
+    is streamed, so large limits don't build the whole response in memory.
+    Pages run on from the hot DB into the day files proxnet_archive.py moved
+    out of it; ?archive=0 restricts the query to the hot DB.
+    """
+    try:
+        filters = parse_scan_filters(request.args)
+        where, params = build_scan_filters(filters)
+        limit = max(1, min(int(request.args.get('limit', API_DEFAULT_LIMIT)), API_MAX_LIMIT))
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify(error=f"Bad query parameter: {e}"), 400
+    conn = archive = None
+    try:
+        if DB_FILE.is_file():
+            conn = proxnet_db.connect(DB_FILE)
+            rows = iter_scan_rows(conn, where, params, cursor, limit)
+        else:
+            rows = iter(())
+        if request.args.get('archive', '1') != '0':
+            archive = proxnet_archive.ArchiveScanReader(filters, cursor)
+            rows = itertools.islice(proxnet_archive.merge_scans(rows, archive), limit)
+        first = next(rows, None) # Surface query errors before the response starts
+    except sqlite3.Error as e:
+        if conn:
+            conn.close()
+        if archive:
+            archive.close()
+        return jsonify(error=f"Database error: {e}"), 500
+
+    def generate():
+        try:
+            count, last = 0, None
+            yield '{"scans": ['
+            row = first
+            while row is not None:
+                yield (', ' if count else '') + json.dumps(row)
+                count, last = count + 1, row
+                row = next(rows, None)
+            next_cursor = encode_cursor(last['ts_us'], last['id']) if count == limit else None
+            yield f'], "next_cursor": {json.dumps(next_cursor)}, "count": {count}}}'
+        finally:
+            if conn:
+                conn.close()
+            if archive:
+                archive.close()
+
+    return Response(generate(), mimetype='application/json')
+
+@app.route('/api/export')
+def api_export():
+    """Every scan matching the /api/scans filters as one CSV, JSONL or Parquet download (?format=, default csv).
+
+    Rows are pulled off a SQLite cursor (then the archive, sorted as column
+    arrays a day at a time) and turned into dicts and formatted a chunk at a
+    time by generators, so memory use doesn't grow with the number of rows. ?gzip=1 compresses the stream, ?order=desc
+    puts the newest rows first and ?archive=0 skips archived days. The read
+    holds one WAL snapshot until the download finishes.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify(error=f"Unknown format '{fmt}', expected one of {list(EXPORT_FORMATS)}"), 400
+    if fmt == 'parquet' and pq is None:
+        return jsonify(error="Parquet export needs pyarrow (pip install pyarrow)"), 400
+    try:
+        filters = parse_scan_filters(request.args)
+        where, params = build_scan_filters(filters)
+    except ValueError as e:
+        return jsonify(error=f"Bad query parameter: {e}"), 400
+    newest_first = request.args.get('order', 'asc') == 'desc'
+    compress = request.args.get('gzip', '0') not in ('0', '')
+    conn = archive = None
+    try:
+        if DB_FILE.is_file():
+            conn = proxnet_db.connect(DB_FILE)
+            rows = iter_scan_rows(conn, where, params, newest_first=newest_first)
+        else:
+            rows = iter(())
+        if request.args.get('archive', '1') != '0':
+            archive = proxnet_archive.ArchiveScanReader(filters, newest_first=newest_first)
+            rows = proxnet_archive.merge_scans(rows, archive)
+        first = next(rows, None) # Surface query errors before the response starts
+    except sqlite3.Error as e:
+        if conn:
+            conn.close()
+        if archive:
+            archive.close()
+        return jsonify(error=f"Database error: {e}"), 500
+    rows = itertools.chain([first] if first is not None else [], rows)
+
+    def generate():
+        try:
+            chunks = {'csv': export_csv, 'jsonl': export_jsonl, 'parquet': export_parquet}[fmt](rows)
+            yield from gzip_chunks(chunks) if compress else chunks
+        finally:
+            if conn:
+                conn.close()
+            if archive:
+                archive.close()
+
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    filename = f"proxnet_scans_{time.strftime('%Y%m%d_%H%M%S')}.{extension}" + (".gz" if compress else "")
+    return Response(generate(), mimetype='application/gzip' if compress else mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/api/archive')
+def api_archive():
+    """Day files proxnet_archive.py has moved out of proxnet_log.db (?table=scans|packets), oldest first."""
+    table = request.args.get('table')
+    if table is not None and table not in proxnet_archive.ARCHIVE_TABLES:
+        return jsonify(error=f"Unknown table '{table}', expected one of {list(proxnet_archive.ARCHIVE_TABLES)}"), 400
+    if not proxnet_archive.ARCHIVE_INDEX.is_file():
+        return jsonify(files=[], retention_days=proxnet_archive.RETENTION_DAYS)
+    try:
+        conn = proxnet_db.connect(proxnet_archive.ARCHIVE_INDEX)
+        try:
+            files = proxnet_archive.query_archives(conn, table)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        return jsonify(error=f"Database error: {e}"), 500
+    return jsonify(files=files, retention_days=proxnet_archive.RETENTION_DAYS)
+
+@app.route('/api/rssi/<device>')
+def api_rssi(device):
+    """RSSI over time for one MAC/UID, read from the per-device rollup tables.
+
+    Uses the finest resolution whose bucket count for the requested range
+    stays within ?max_points= (the coarsest one if none does), so a
+    week-long chart reads a few hundred hourly rows rather than raw scans.
+    ?resolution= forces a specific table.
+    """
+    try:
+        until_us = parse_time_us(request.args['until']) if request.args.get('until') else proxnet_db.now_us()
+        since_us = (parse_time_us(request.args['since']) if request.args.get('since')
+                    else until_us - RSSI_DEFAULT_RANGE * 1_000_000)
+        max_points = max(1, int(request.args.get('max_points', RSSI_MAX_POINTS)))
+    except ValueError as e:
+        return jsonify(error=f"Bad query parameter: {e}"), 400
+    widths = dict(proxnet_db.ROLLUP_RESOLUTIONS)
+    resolution = request.args.get('resolution')
+    if resolution is None:
+        span = max(0, until_us - since_us) / 1_000_000
+        resolution = next((name for name, seconds in proxnet_db.ROLLUP_RESOLUTIONS if span / seconds <= max_points),
+                          proxnet_db.ROLLUP_RESOLUTIONS[-1][0])
+    elif resolution not in widths:
+        return jsonify(error=f"Unknown resolution '{resolution}', expected one of {list(widths)}"), 400
+    width_us = widths[resolution] * 1_000_000
+    if not DB_FILE.is_file():
+        return jsonify(device=device, resolution=resolution, bucket_seconds=widths[resolution], points=[])
+    try:
+        conn = proxnet_db.connect(DB_FILE)
+        try:
+            rows = conn.execute(f'''
+                SELECT bucket_us, count, rssi_min, rssi_max, rssi_sum, rssi_last
+                FROM {proxnet_db.rollup_table(resolution)}
+                WHERE device = ? AND bucket_us >= ? AND bucket_us < ? ORDER BY bucket_us
+            ''', (device, since_us - since_us % width_us, until_us)).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        return jsonify(error=f"Database error: {e}"), 500
+    points = [{'t': row['bucket_us'], 'count': row['count'], 'min': row['rssi_min'], 'max': row['rssi_max'],
+               'mean': round(row['rssi_sum'] / row['count'], 1), 'last': row['rssi_last']} for row in rows]
+    return jsonify(device=device, resolution=resolution, bucket_seconds=widths[resolution], points=points)
+
+@app.route('/api/nrf24/sweep')
+def api_nrf24_sweep():
+    """Latest per-channel activity histogram from nrf24_sniffer.py --sweep, busiest first."""
+    try:
+        with open(NRF24_SWEEP_FILE) as f:
+            report = json.load(f)
+    except FileNotFoundError:
+        return jsonify(error="No sweep has been run yet."), 404
+    except (OSError, ValueError) as e:
+        return jsonify(error=f"Could not read sweep report: {e}"), 500
+    report['slots'].sort(key=lambda slot: (slot['packets'], slot['rpd_hits']), reverse=True)
+    return jsonify(report)
+
+@app.route('/api/pcap/<kind>')
+def api_pcap(kind):
+    """Wi-Fi capture contents from the pcap_indexer.py database, without touching the pcaps.
+
+    'segments' lists the indexed capture files; 'bssid', 'station',
+    'frame_type' and 'channel' return the busiest keys (optionally limited to
+    segments overlapping ?since=/?until=); 'seek' returns the file and byte
+    offset to start reading at for ?at=.
+    """
+    if kind not in ('segments', 'seek') + pcap_indexer.COUNTER_KINDS:
+        return jsonify(error=f"Unknown view '{kind}'"), 404
+    try:
+        since_us = parse_time_us(request.args['since']) if request.args.get('since') else None
+        until_us = parse_time_us(request.args['until']) if request.args.get('until') else None
+        at_us = parse_time_us(request.args['at']) if request.args.get('at') else None
+        limit = max(1, min(int(request.args.get('limit', API_DEFAULT_LIMIT)), API_MAX_LIMIT))
+    except ValueError as e:
+        return jsonify(error=f"Bad query parameter: {e}"), 400
+    if kind == 'seek' and at_us is None:
+        return jsonify(error="seek needs ?at="), 400
+    if not PCAP_INDEX_DB.is_file():
+        return jsonify(error="No pcap index yet; run pcap_indexer.py."), 404
+    try:
+        conn = proxnet_db.connect(PCAP_INDEX_DB)
+        try:
+            if kind == 'segments':
+                return jsonify(segments=pcap_indexer.query_segments(conn))
+            if kind == 'seek':
+                return jsonify(position=pcap_indexer.seek(conn, at_us))
+            return jsonify(kind=kind, rows=pcap_indexer.query_counters(conn, kind, since_us, until_us, limit))
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        return jsonify(error=f"Database error: {e}"), 500
+
+@app.route('/api/logs/<name>')
+def api_log_tail(name):
+    """Incremental tail of one supervised process's output log.
+
+    Pass back the returned inode and offset as ?inode=&offset= to get only
+    what was written since; omit them for the last few KB. At most
+    ?max_bytes= (default LOG_TAIL_DEFAULT) come back per call: a client that
+    fell further behind skips ahead and is told how much it missed.
+    """
+    try:
+        path = get_supervisor().status(name)['log']
+        offset = int(request.args['offset']) if request.args.get('offset') else None
+        inode = int(request.args['inode']) if request.args.get('inode') else None
+        max_bytes = min(max(1024, int(request.args.get('max_bytes', LOG_TAIL_DEFAULT))), LOG_TAIL_MAX)
+    except KeyError as e:
+        return jsonify(error=e.args[0]), 404
+    except ValueError as e:
+        return jsonify(error=f"Bad query parameter: {e}"), 400
+    if offset is not None and offset < 0:
+        return jsonify(error="Bad query parameter: offset must not be negative"), 400
+    try:
+        return jsonify(name=name, **read_log_tail(path, offset, inode, max_bytes))
+    except FileNotFoundError:
+        return jsonify(name=name, text="", offset=0, inode=None, size=0, reset=offset is not None, skipped=0)
+    except OSError as e:
+        return jsonify(error=f"Could not read log: {e}"), 500
+
+@app.route('/metrics')
+def metrics():
+    """Every process's latest metrics snapshot plus supervisor gauges, in the Prometheus text format."""
+    text = proxnet_metrics.render_prometheus(proxnet_metrics.read_snapshots(), extra=supervisor_samples())
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/metrics')
+def api_metrics():
+    """The same snapshots as JSON for the page: values plus histogram p50/p95 (bucket upper bounds)."""
+    return jsonify(processes=[summarize_metrics(snapshot) for snapshot in proxnet_metrics.read_snapshots()])
+
+@app.route('/api/processes')
+def api_processes():
+    """Status of every supervised scanner: state, pid, uptime, restarts, last exit, CPU % and RSS."""
+    return jsonify(get_supervisor().status())
+
+@app.route('/api/processes/<name>')
+def api_process(name):
+    """Status of one scanner; ?lines=N adds its last N output lines."""
+    try:
+        lines = max(0, int(request.args.get('lines', 0)))
+        return jsonify(get_supervisor().status(name, lines))
+    except ValueError as e:
+        return jsonify(error=f"Bad query parameter: {e}"), 400
+    except KeyError as e:
+        return jsonify(error=e.args[0]), 404
+
+@app.route('/api/processes/<name>/<action>', methods=['POST'])
+def api_process_control(name, action):
+    """start / stop / restart one scanner (optional mode= in the JSON body or form).
+
+    Returns 202 straight away; the supervisor carries the request out in
+    the background and the status endpoints/SSE show when it has.
+    """
+    body = request.get_json(silent=True) or request.form
+    mode = body.get('mode')
+    sv = get_supervisor()
+    try:
+        if action == 'start':
+            if name == 'logger':
+                setup_database()
+            changed = sv.start(name, mode or 'default')
+        elif action == 'stop':
+            changed = sv.stop(name)
+        elif action == 'restart':
+            sv.restart(name, mode)
+            changed = True
+        else:
+            return jsonify(error=f"Unknown action '{action}', expected start, stop or restart"), 404
+    except KeyError as e:
+        return jsonify(error=e.args[0]), 404
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(accepted=changed, status=sv.status(name)), 202
+
 # --- REMOVED CC1101 Sniffer Routes ---
 
 # --- Main Execution ---
@@ -275,8 +1123,7 @@ if __name__ == '__main__':
     print(f"Starting ProxNet Web UI...")
     setup_database()
     print(f"Using database: {DB_FILE}")
-    print(f"Controlling script: {LOGGER_SCRIPT}")
-    print(f"nRF24 sniffer script: {NRF24_SNIFFER_SCRIPT}")
+    print(f"Supervising: {', '.join(get_supervisor().processes)}")
     # Removed CC1101 script path printout
     print(f"Access it at: http://<Your_Pi_IP_Address>:{HOST_PORT}")
     print(f"Or from the Pi itself: http://localhost:{HOST_PORT}")
@@ -2,18 +2,25 @@
 
 # wifi_capture.py
 # Version 2: Uses tcpdump instead of tshark.
+#
+# --ring keeps a fixed number of fixed-size segments (tcpdump -C/-W) so long
+# sessions can't fill the SD card; pcap_indexer.py --follow indexes the
+# segments as they are written.
 
 import subprocess
 import signal
 import time
 import sys
 import os
+import argparse
 from pathlib import Path
 
 # --- Configuration ---
 MONITOR_INTERFACE = "wlan1" # Make sure this matches your monitor interface
 PCAP_DIR = Path.home() / "proxnet" / "pcaps"
 TCPDUMP_PATH = "/usr/bin/tcpdump" # Verify path with 'which tcpdump'
+RING_FILE_MB = 50   # --ring: segment size in millions of bytes (tcpdump -C)
+RING_FILES = 20     # --ring: segments kept before the oldest is overwritten (tcpdump -W)
 
 # Ensure pcap directory exists
 PCAP_DIR.mkdir(parents=True, exist_ok=True)
@@ -44,7 +51,7 @@ signal.signal(signal.SIGINT, cleanup)
 signal.signal(signal.SIGTERM, cleanup)
 
 # --- Main Capture Function ---
-def start_capture():
+def start_capture(ring=False, file_mb=RING_FILE_MB, files=RING_FILES):
     global tcpdump_process
     timestamp = time.strftime("%Y%m%d_%H%M%S")
     pcap_file = PCAP_DIR / f"wifi_capture_{timestamp}.pcap"
@@ -64,9 +71,15 @@ def start_capture():
         "-w", str(pcap_file),
         "-U",
     ]
+    if ring:
+        # tcpdump appends the segment number (.pcap00, .pcap01, ...) and wraps after `files`
+        command += ["-C", str(file_mb), "-W", str(files)]
 
     print(f"Starting Wi-Fi capture on {MONITOR_INTERFACE} using tcpdump...")
-    print(f"Saving packets to: {pcap_file}")
+    if ring:
+        print(f"Ring buffer: {files} x {file_mb} MB segments at {pcap_file}NN (oldest overwritten)")
+    else:
+        print(f"Saving packets to: {pcap_file}")
     print("Command:", " ".join(command))
     print("Press Ctrl+C to stop.")
     print("-" * 30)
@@ -86,9 +99,16 @@ def start_capture():
             cleanup(None, None)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ProxNet Wi-Fi capture (tcpdump)")
+    parser.add_argument("--ring", action="store_true", help="Write a fixed ring of segments instead of one growing file")
+    parser.add_argument("--file-mb", type=int, default=RING_FILE_MB, help="With --ring, segment size in MB")
+    parser.add_argument("--files", type=int, default=RING_FILES, help="With --ring, number of segments kept")
+    args = parser.parse_args()
+    if args.file_mb < 1 or args.files < 2:
+        parser.error("--file-mb must be at least 1 and --files at least 2")
     # Script now expects to be run with sudo
     if os.geteuid() != 0:
         print("Error: This script needs root privileges to run tcpdump.", file=sys.stderr)
         print("Please run using: sudo python3 wifi_capture.py", file=sys.stderr)
         sys.exit(1)
-    start_capture()
+    start_capture(args.ring, args.file_mb, args.files)
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+
+# wifi_pcap.py
+# Offline analytics over wifi_capture.py pcaps without tshark.
+#
+# The capture is memory-mapped and walked once to find where every record
+# starts. The radiotap and 802.11 MAC header fields of all frames are then
+# gathered with NumPy, a batch of records at a time, into one columnar record
+# array (timestamp, signal, channel, type/subtype, addr1-3, ...). Questions
+# like "busiest BSSIDs on channel 6" then become array operations.
+#
+# Usage:
+#   python3 wifi_pcap.py ~/proxnet/pcaps/wifi_capture_<timestamp>.pcap
+#   python3 wifi_pcap.py --bench            # compare against the per-frame parser and tshark
+
+import os
+import sys
+import mmap
+import time
+import shutil
+import random
+import struct
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+import numpy as np
+
+from pcap_indexer import (PCAP_HEADER_SIZE, RECORD_HEADER_SIZE, PCAP_MAGICS, LINKTYPE_IEEE802_11,
+                          LINKTYPE_RADIOTAP, RADIOTAP_FIELDS, RADIOTAP_FLAGS_BAD_FCS, FRAME_TYPES, SUBTYPES,
+                          MAX_RECORD, parse_frame, freq_to_channel)
+
+# --- Configuration ---
+BATCH_SIZE = 262144   # Records decoded per NumPy pass; bounds the temporaries to a few tens of MB
+MAX_PRESENT_WORDS = 8 # Radiotap present bitmaps followed before giving up on a record
+TOP_N = 10
+BENCH_COUNT = 200000
+BENCH_PYTHON_COUNT = 20000 # The per-frame reference parser only gets a sample
+
+NO_ADDR = -1      # addr/bssid/station columns when the frame doesn't carry one
+NO_SIGNAL = -128  # signal column when radiotap has no dBm antenna signal
+NO_CHANNEL = -1
+CTRL_WITH_TA = (8, 9, 10, 11, 14) # Control subtypes that carry a transmitter address (addr2)
+
+FRAME_DTYPE = np.dtype([
+    ('ts_us', '<i8'),     # Capture timestamp, epoch microseconds
+    ('offset', '<i8'),    # Byte offset of the record header in the file
+    ('length', '<u4'),    # Original frame length on air
+    ('signal', 'i1'),     # dBm, NO_SIGNAL if absent
+    ('freq', '<u2'),      # MHz, 0 if absent
+    ('channel', '<i2'),   # NO_CHANNEL if unknown
+    ('rt_flags', 'u1'),   # Radiotap flags field (bad FCS, FCS present, ...)
+    ('type', 'u1'),       # 0 mgmt, 1 ctrl, 2 data, 3 ext; 255 if the frame is too short
+    ('subtype', 'u1'),
+    ('ds', 'u1'),         # ToDS/FromDS bits of the frame control flags
+    ('addr1', '<i8'),     # MAC addresses as 48-bit integers, NO_ADDR if absent
+    ('addr2', '<i8'),
+    ('addr3', '<i8'),
+])
+
+# --- Record Offsets ---
+def record_offsets(buf, order):
+    """Start offsets and included lengths of every complete record, in one pass over the file.
+
+    Stops at a truncated last record (tcpdump still writing) or at an
+    impossible record length (corrupt tail).
+    """
+    unpack = struct.Struct(order + 'I').unpack_from
+    offsets = []
+    append = offsets.append
+    pos, size = PCAP_HEADER_SIZE, len(buf)
+    while pos + RECORD_HEADER_SIZE <= size:
+        incl_len = unpack(buf, pos + 8)[0]
+        if incl_len > MAX_RECORD or pos + RECORD_HEADER_SIZE + incl_len > size:
+            if incl_len > MAX_RECORD:
+                print(f"Corrupt record at offset {pos}; ignoring the rest of the file", file=sys.stderr)
+            break
+        append(pos)
+        pos += RECORD_HEADER_SIZE + incl_len
+    offsets = np.array(offsets, dtype=np.int64)
+    # Records are back to back, so the lengths fall out of the offsets
+    lengths = np.diff(offsets, append=pos) - RECORD_HEADER_SIZE
+    return offsets, lengths
+
+# --- Vectorized Decoder ---
+def _gather(buf, pos, size, big=False):
+    """Unsigned `size`-byte integers at every position in `pos` (int64 array)."""
+    value = np.zeros(len(pos), dtype=np.int64)
+    for i in range(size):
+        shift = 8 * (size - 1 - i) if big else 8 * i
+        value |= buf[pos + i].astype(np.int64) << shift
+    return value
+
+def _radiotap(buf, data, incl_len, frames):
+    """Fills freq/signal/rt_flags from the radiotap headers; returns the radiotap lengths."""
+    short = incl_len < 8
+    rt = np.where(short, 0, data) # Point short records at a harmless position
+    rt_len = np.where(short, incl_len, np.minimum(_gather(buf, rt + 2, 2), incl_len))
+    present = np.where(short, 0, _gather(buf, rt + 4, 4))
+
+    # Count the present words; fields are laid out after the last one
+    words = np.ones(len(data), dtype=np.int64)
+    word = present
+    for _ in range(MAX_PRESENT_WORDS):
+        more = ((word >> 31) & 1).astype(bool) & (4 + 4 * (words + 1) <= rt_len)
+        if not more.any():
+            break
+        word = np.where(more, _gather(buf, np.where(more, rt + 4 + 4 * words, 0), 4), 0)
+        words += more
+
+    # Field positions only depend on (first present word, word count), and a
+    # capture has a handful of those, so the layout is worked out once per combination
+    layouts, inverse = np.unique((words << 6) | (present & 0x3F), return_inverse=True)
+    for index, layout in enumerate(layouts.tolist()):
+        rows = np.nonzero(inverse == index)[0]
+        bits, pos = layout & 0x3F, 4 + 4 * (layout >> 6)
+        for bit, (align, size) in enumerate(RADIOTAP_FIELDS):
+            if not bits & (1 << bit):
+                continue
+            pos = (pos + align - 1) & ~(align - 1)
+            ok = rows[pos + size <= rt_len[rows]]
+            if bit == 1:
+                frames['rt_flags'][ok] = buf[rt[ok] + pos]
+            elif bit == 3:
+                frames['freq'][ok] = _gather(buf, rt[ok] + pos, 2)
+            elif bit == 5:
+                frames['signal'][ok] = buf[rt[ok] + pos].view(np.int8)
+            pos += size
+    return rt_len
+
+def _channels(freq):
+    return np.select(
+        [freq == 2484, (freq >= 2412) & (freq <= 2472), (freq >= 5950) & (freq <= 7125), (freq >= 4910) & (freq <= 5895)],
+        [14, (freq - 2407) // 5, (freq - 5950) // 5, (freq - 5000) // 5],
+        NO_CHANNEL,
+    )
+
+def decode_records(buf, offsets, incl_len, order, ts_scale, linktype):
+    """Decodes the records at `offsets` into a FRAME_DTYPE array."""
+    frames = np.zeros(len(offsets), dtype=FRAME_DTYPE)
+    big = order == '>'
+    frames['offset'] = offsets
+    frames['ts_us'] = _gather(buf, offsets, 4, big) * 1_000_000 + _gather(buf, offsets + 4, 4, big) // ts_scale
+    frames['length'] = _gather(buf, offsets + 12, 4, big)
+    frames['signal'] = NO_SIGNAL
+    data = offsets + RECORD_HEADER_SIZE
+    mac = data
+    if linktype == LINKTYPE_RADIOTAP:
+        mac = data + _radiotap(buf, data, incl_len, frames)
+    frames['channel'] = _channels(frames['freq'].astype(np.int64))
+
+    avail = data + incl_len - mac
+    has_fc = avail >= 2
+    fc_pos = np.where(has_fc, mac, 0)
+    fc = buf[fc_pos]
+    frames['type'] = np.where(has_fc, (fc >> 2) & 3, 255)
+    frames['subtype'] = np.where(has_fc, fc >> 4, 0)
+    frames['ds'] = np.where(has_fc, buf[fc_pos + 1] & 3, 0)
+    ftype, subtype = frames['type'], frames['subtype']
+    mgmt_or_data = (ftype == 0) | (ftype == 2)
+    present = {
+        'addr1': avail >= 10,
+        'addr2': (avail >= 16) & (mgmt_or_data | ((ftype == 1) & np.isin(subtype, CTRL_WITH_TA))),
+        'addr3': (avail >= 24) & mgmt_or_data,
+    }
+    for name, start in (('addr1', 4), ('addr2', 10), ('addr3', 16)):
+        ok = present[name]
+        frames[name] = np.where(ok, _gather(buf, np.where(ok, mac + start, 0), 6, big=True), NO_ADDR)
+    return frames
+
+def parse_pcap(path, batch_size=BATCH_SIZE):
+    """Memory-maps a classic pcap and returns (frames, linktype) with one FRAME_DTYPE row per record."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < PCAP_HEADER_SIZE:
+            raise ValueError(f"{path} is too short to be a pcap file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic = struct.unpack_from('<I', mm)[0]
+            if magic not in PCAP_MAGICS:
+                raise ValueError(f"{path} is not a classic pcap file")
+            order, ts_scale = PCAP_MAGICS[magic]
+            linktype = struct.unpack_from(order + 'I', mm, 20)[0]
+            if linktype not in (LINKTYPE_RADIOTAP, LINKTYPE_IEEE802_11):
+                raise ValueError(f"{path}: link type {linktype} is not 802.11")
+            offsets, incl_len = record_offsets(mm, order)
+            buf = np.frombuffer(mm, dtype=np.uint8)
+            try:
+                frames = np.empty(len(offsets), dtype=FRAME_DTYPE)
+                for start in range(0, len(offsets), batch_size):
+                    end = start + batch_size
+                    frames[start:end] = decode_records(buf, offsets[start:end], incl_len[start:end],
+                                                       order, ts_scale, linktype)
+            finally:
+                del buf # The mmap can't close while a view of it is alive
+    return frames, linktype
+
+# --- Derived Columns ---
+def _is_group(addr):
+    return (addr >= 0) & (((addr >> 40) & 1) == 1)
+
+def bssids(frames):
+    """BSSID of every frame (NO_ADDR if none), by the same rules as pcap_indexer.parse_frame()."""
+    a1, a2, a3, ds = frames['addr1'], frames['addr2'], frames['addr3'], frames['ds']
+    good = (frames['rt_flags'] & RADIOTAP_FLAGS_BAD_FCS) == 0
+    mgmt = good & (frames['type'] == 0) & (a3 != NO_ADDR) & ~_is_group(a3)
+    data = good & (frames['type'] == 2) & (a3 != NO_ADDR)
+    return np.select([mgmt, data & (ds == 0), data & (ds == 1), data & (ds == 2)], [a3, a3, a1, a2], NO_ADDR)
+
+def stations(frames):
+    """Client station of every frame (NO_ADDR if none), by the same rules as pcap_indexer.parse_frame()."""
+    a1, a2, a3, ds = frames['addr1'], frames['addr2'], frames['addr3'], frames['ds']
+    good = (frames['rt_flags'] & RADIOTAP_FLAGS_BAD_FCS) == 0
+    mgmt = good & (frames['type'] == 0) & (a3 != NO_ADDR)
+    data = good & (frames['type'] == 2) & (a3 != NO_ADDR)
+    mgmt_a1 = np.where(_is_group(a1) | (a1 == a3), NO_ADDR, a1)
+    return np.select(
+        [mgmt & (a2 != a3), mgmt, data & (ds <= 1), data & (ds == 2)],
+        [a2, mgmt_a1, a2, np.where(_is_group(a1), NO_ADDR, a1)],
+        NO_ADDR,
+    )
+
+def frame_type_name(ftype, subtype):
+    if ftype not in FRAME_TYPES:
+        return "short"
+    return f"{FRAME_TYPES[ftype]}/{SUBTYPES.get(ftype, {}).get(subtype, subtype)}"
+
+def format_mac(addr):
+    return int(addr).to_bytes(6, 'big').hex(':')
+
+def top_counts(values, top=TOP_N, skip=None):
+    """(value, count) pairs of the most frequent values, optionally ignoring `skip`."""
+    if skip is not None:
+        values = values[values != skip]
+    keys, counts = np.unique(values, return_counts=True)
+    order = np.argsort(counts)[::-1][:top]
+    return list(zip(keys[order].tolist(), counts[order].tolist()))
+
+def summarize(frames, top=TOP_N):
+    """Prints the usual first questions about a capture; every line is a handful of array operations."""
+    if not len(frames):
+        print("No frames.")
+        return
+    span = (frames['ts_us'].max() - frames['ts_us'].min()) / 1e6
+    bad = int(np.count_nonzero(frames['rt_flags'] & RADIOTAP_FLAGS_BAD_FCS))
+    print(f"{len(frames)} frames, {int(frames['length'].sum())} bytes over {span:.1f}s ({bad} with bad FCS)")
+
+    print("\nFrame types:")
+    for key, count in top_counts(frames['type'].astype(np.int64) * 16 + frames['subtype'], top=len(frames)):
+        print(f"  {frame_type_name(key // 16, key % 16):>20}  {count}")
+
+    print("\nChannels:")
+    for channel, count in sorted(top_counts(frames['channel'], top=len(frames), skip=NO_CHANNEL)):
+        print(f"  {channel:>4}  {count}")
+
+    bssid = bssids(frames)
+    has_signal = frames['signal'] != NO_SIGNAL
+    print(f"\nTop {top} BSSIDs:")
+    for key, count in top_counts(bssid, top, skip=NO_ADDR):
+        # Signal of the AP's own transmissions
+        own = (bssid == key) & (frames['addr2'] == key) & has_signal
+        signal = f"{frames['signal'][own].mean():.1f} dBm" if own.any() else "-"
+        beacons = int(np.count_nonzero((bssid == key) & (frames['type'] == 0) & (frames['subtype'] == 8)))
+        print(f"  {format_mac(key)}  {count:>9} frames  {beacons:>7} beacons  signal {signal}")
+
+    station = stations(frames)
+    print(f"\nTop {top} stations:")
+    for key, count in top_counts(station, top, skip=NO_ADDR):
+        aps = np.unique(bssid[(station == key) & (bssid != NO_ADDR)])
+        print(f"  {format_mac(key)}  {count:>9} frames  BSSIDs {', '.join(format_mac(a) for a in aps[:3]) or '-'}")
+
+# --- Benchmark ---
+def _radiotap_header(rng, freq, signal):
+    if rng.random() < 0.5: # Two layouts, like a capture mixing TSFT and non-TSFT frames
+        body = struct.pack('<QBBHHb', rng.getrandbits(64), 0, 2, freq, 0x00A0, signal)
+        present = 0x2F # TSFT, flags, rate, channel, signal
+    else:
+        body = struct.pack('<BBHHb', 0, 2, freq, 0x00A0, signal)
+        present = 0x2E # flags, rate, channel, signal
+    return struct.pack('<BBHI', 0, 0, 8 + len(body), present) + body
+
+def synthetic_pcap(path, count, seed=1):
+    """Writes a radiotap pcap of beacons, probes, data frames and ACKs from a few APs and stations."""
+    rng = random.Random(seed)
+    aps = [bytes([0x02, 0, 0, 0, 0, i]) for i in range(8)]
+    clients = [bytes([0x06, 0, 0, 0, 1, i]) for i in range(40)]
+    broadcast = b'\xff' * 6
+    ts = 1_700_000_000_000_000
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, 65535, LINKTYPE_RADIOTAP))
+        for _ in range(count):
+            ts += rng.randrange(50, 2000)
+            ap, client = rng.choice(aps), rng.choice(clients)
+            kind = rng.random()
+            if kind < 0.3:
+                mac = bytes([0x80, 0, 0, 0]) + broadcast + ap + ap + b'\0\0' + rng.randbytes(rng.randrange(40, 200))
+                sender = ap
+            elif kind < 0.4:
+                mac = bytes([0x40, 0, 0, 0]) + broadcast + client + broadcast + b'\0\0' + rng.randbytes(30)
+                sender = client
+            elif kind < 0.85:
+                to_ap = rng.random() < 0.5
+                fc1 = 0x01 if to_ap else 0x02
+                a1, a2 = (ap, client) if to_ap else (client, ap)
+                mac = bytes([0x88, fc1, 0, 0]) + a1 + a2 + (client if not to_ap else ap) + b'\0\0\0\0' \
+                    + rng.randbytes(rng.randrange(20, 1500))
+                sender = a2
+            else:
+                mac = bytes([0xD4, 0, 0, 0]) + rng.choice((ap, client))
+                sender = None
+            signal = -30 - (aps.index(sender) * 5 if sender in aps else rng.randrange(60))
+            freq = 2412 + 5 * 5 * (aps.index(ap) % 3) # Channels 1, 6 and 11
+            frame = _radiotap_header(rng, freq, signal) + mac
+            f.write(struct.pack('<IIII', ts // 1_000_000, ts % 1_000_000, len(frame), len(frame)) + frame)
+
+def _reference(path, limit):
+    """The pcap_indexer per-frame parser over the first `limit` records."""
+    results = []
+    with open(path, 'rb') as f:
+        f.seek(PCAP_HEADER_SIZE)
+        for _ in range(limit):
+            head = f.read(RECORD_HEADER_SIZE)
+            if len(head) < RECORD_HEADER_SIZE:
+                break
+            incl_len = struct.unpack_from('<I', head, 8)[0]
+            results.append(parse_frame(f.read(incl_len), LINKTYPE_RADIOTAP))
+    return results
+
+def bench(count=BENCH_COUNT):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.pcap"
+        synthetic_pcap(path, count)
+        size = path.stat().st_size
+        print(f"Synthetic capture: {count} frames, {size / 1e6:.1f} MB")
+
+        started = time.perf_counter()
+        frames, _ = parse_pcap(path)
+        parsed = time.perf_counter() - started
+        started = time.perf_counter()
+        busiest = top_counts(bssids(frames), 1, skip=NO_ADDR)
+        per_channel = np.bincount(frames['channel'][frames['channel'] >= 0])
+        aggregated = time.perf_counter() - started
+        print(f"NumPy:  {count / parsed:10.0f} frames/s, {size / parsed / 1e6:7.1f} MB/s ({parsed:.2f}s parse, "
+              f"{aggregated * 1000:.1f} ms for top BSSID + channel histogram)")
+
+        sample = min(BENCH_PYTHON_COUNT, count)
+        started = time.perf_counter()
+        reference = _reference(path, sample)
+        py_elapsed = time.perf_counter() - started
+        bssid = bssids(frames[:sample])
+        agree = all(
+            frame_type_name(int(row['type']), int(row['subtype'])) == ref[0]
+            and (format_mac(b) if b != NO_ADDR else None) == ref[1]
+            and (freq_to_channel(int(row['freq'])) or NO_CHANNEL) == row['channel']
+            and (int(row['signal']) if row['signal'] != NO_SIGNAL else None) == ref[4]
+            for row, b, ref in zip(frames[:sample], bssid, reference)
+        )
+        print(f"Python: {sample / py_elapsed:10.0f} frames/s ({sample} frames, "
+              f"{'matches' if agree else 'DIFFERS FROM'} NumPy) -> {py_elapsed / sample * count / parsed:.0f}x speedup")
+
+        tshark = shutil.which("tshark")
+        if not tshark:
+            print("tshark: not installed, skipped")
+        else:
+            command = [tshark, "-r", str(path), "-T", "fields", "-e", "frame.time_epoch",
+                       "-e", "radiotap.dbm_antsignal", "-e", "wlan_radio.channel", "-e", "wlan.fc.type_subtype",
+                       "-e", "wlan.addr", "-e", "wlan.bssid"]
+            started = time.perf_counter()
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=False)
+            ts_elapsed = time.perf_counter() - started
+            lines = result.stdout.count(b'\n')
+            print(f"tshark: {lines / ts_elapsed:10.0f} frames/s ({ts_elapsed:.2f}s, {lines} lines) "
+                  f"-> {ts_elapsed / parsed:.1f}x slower than NumPy")
+        if busiest:
+            print(f"Busiest BSSID {format_mac(busiest[0][0])} ({busiest[0][1]} frames), "
+                  f"channel histogram {per_channel[per_channel > 0].tolist()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Columnar 802.11 analytics over wifi_capture.py pcaps")
+    parser.add_argument("pcap", nargs="?", type=Path, help="Classic pcap (radiotap or raw 802.11)")
+    parser.add_argument("--top", type=int, default=TOP_N, help="Rows per ranking")
+    parser.add_argument("--save", type=Path, help="Also save the frame columns as a .npy file")
+    parser.add_argument("--bench", action="store_true", help="Benchmark on a synthetic capture")
+    parser.add_argument("--count", type=int, default=BENCH_COUNT, help="Synthetic frames for --bench")
+    args = parser.parse_args()
+    if args.bench:
+        bench(args.count)
+    elif args.pcap:
+        started = time.perf_counter()
+        try:
+            frames, _ = parse_pcap(args.pcap)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Parsed {args.pcap} in {time.perf_counter() - started:.2f}s\n", file=sys.stderr)
+        if args.save:
+            np.save(args.save, frames)
+        summarize(frames, args.top)
+    else:
+        parser.error("give a pcap file or --bench")
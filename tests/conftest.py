@@ -0,0 +1,10 @@
+# Test setup: the scripts are plain modules in scripts/, and most of them place their
+# files under ~/proxnet at import time, so HOME points at a throwaway directory first.
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+os.environ['HOME'] = tempfile.mkdtemp(prefix="proxnet-test-home-")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
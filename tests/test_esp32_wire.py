@@ -0,0 +1,84 @@
+import json
+import random
+
+import pytest
+
+from esp32_wire import FrameDecoder, MAGIC, TYPE_BLE, TYPE_RFID, decode_payload, encode_record
+
+BLE = {'type': 'BLE', 'mac': 'aa:bb:cc:dd:ee:ff', 'rssi': -50, 'name': 'tag'}
+RFID = {'type': 'RFID', 'uid': '0A0B0C0D', 'uid_len': 4, 'protocol': 'EM4100'}
+
+def _corrupt(frame, index, value):
+    frame = bytearray(frame)
+    frame[index] = value
+    return bytes(frame)
+
+def _feed_all(decoder, data, step=None):
+    out = []
+    step = step or len(data)
+    for i in range(0, len(data), step):
+        out += decoder.feed(data[i:i + step])
+    return out
+
+@pytest.mark.parametrize('record', [BLE, RFID, {'status': 'ready'}, {'error': 'no PN532'}])
+def test_round_trip(record):
+    assert FrameDecoder().feed(encode_record(record)) == [record]
+
+def test_short_payloads_are_counted_not_raised():
+    assert decode_payload(TYPE_BLE, b'\x01\x02') is None
+    assert decode_payload(TYPE_RFID, b'\x09ab') is None
+    assert decode_payload(TYPE_RFID, b'') is None
+
+def test_bad_crc_resyncs_to_next_magic():
+    bad = _corrupt(encode_record(BLE), 6, 0x0A) # Newline inside a frame whose CRC no longer matches
+    decoder = FrameDecoder()
+    out = _feed_all(decoder, bad + b'Z\x04\t' + encode_record(BLE), step=3)
+    assert out == [BLE]
+    assert decoder.crc_errors == 1 and decoder.mode == 'binary'
+
+def test_corrupted_magic_is_discarded_on_binary_link():
+    frame = encode_record(BLE)
+    hit = _corrupt(_corrupt(frame, 1, 0x5B), 8, 0x0A)
+    decoder = FrameDecoder()
+    out = decoder.feed(frame + hit + frame)
+    assert out == [BLE, BLE]
+    assert decoder.lines == 0 and decoder.mode == 'binary'
+    assert decoder.discarded > 0
+
+def test_json_lines_containing_magic_bytes():
+    line = json.dumps({'type': 'BLE', 'name': '¥Z'}, ensure_ascii=False).encode() + b'\n'
+    decoder = FrameDecoder()
+    assert _feed_all(decoder, b'{"status": "ready"}\n' + line * 3, step=5) == \
+        [b'{"status": "ready"}'] + [line.rstrip(b'\n')] * 3
+    assert decoder.mode == 'json'
+
+def test_mixed_traffic_resumes_at_frame_after_bad_crc():
+    decoder = FrameDecoder()
+    decoder.feed(b'{"status": "ready"}\n')
+    bad = _corrupt(encode_record(BLE), -1, 0)
+    out = decoder.feed(bad + encode_record(RFID) + encode_record(BLE) + b'{"status": "x"}\n')
+    assert out == [RFID, BLE, b'{"status": "x"}']
+    assert decoder.crc_errors == 1
+
+def test_fuzzed_binary_stream_never_raises_or_emits_noise():
+    rng = random.Random(4)
+    records = [dict(BLE, rssi=-(i % 100)) for i in range(200)]
+    stream = bytearray()
+    for record in records:
+        frame = bytearray(encode_record(record))
+        if rng.random() < 0.2:
+            frame[rng.randrange(len(frame))] = rng.choice([0x0A, 0xA5, 0x5A, rng.randrange(256)])
+        stream += frame
+    decoder = FrameDecoder()
+    decoder.feed(encode_record(BLE))
+    out = _feed_all(decoder, bytes(stream), step=7)
+    assert all(isinstance(item, dict) for item in out)
+    assert decoder.mode == 'binary'
+    assert len(out) >= 0.6 * len(records)
+
+def test_json_mode_resumes_at_next_line_after_bad_crc():
+    decoder = FrameDecoder()
+    decoder.feed(b'{"status": "ready"}\n')
+    bad = _corrupt(encode_record(BLE), -1, 0)
+    out = _feed_all(decoder, bad[:-3] + b'\n' + b'{"status": "x"}\n', step=4)
+    assert out == [b'{"status": "x"}']
@@ -0,0 +1,172 @@
+import os
+import json
+import select
+import time
+
+import pytest
+
+import hw_sim
+import cc1101_sniffer as cc
+import nrf24_sniffer
+from esp32_wire import FrameDecoder
+
+class _Clock:
+    """Stands in for the time module inside hw_sim, so the fakes' FIFOs fill on a simulated clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(hw_sim, 'time', clock)
+    return clock
+
+def _payload(i):
+    return bytes([i]) * hw_sim.NRF24_PAYLOAD
+
+def _ring_payloads(ring):
+    return [(channel, payload) for _, channel, _, _, payload in nrf24_sniffer.RECORD.iter_unpack(ring.take(0))]
+
+# --- nRF24: FIFO drain ---
+def test_drain_reads_whole_fifo_and_counts_overflow(clock):
+    traffic = [(0.0, hw_sim.NRF24_CHANNEL, 1, _payload(i)) for i in range(5)]
+    radio = hw_sim.FakeRF24(schedule=hw_sim.Schedule(traffic))
+    radio.startListening()
+    ring, stats = nrf24_sniffer.PacketRing(16), nrf24_sniffer.RxStats()
+
+    assert nrf24_sniffer.drain_fifo(radio, ring, hw_sim.NRF24_CHANNEL, stats) == 3
+    assert stats.fifo_full == 1 and stats.packets == 3
+    assert radio.stats['fifo_overflows'] == 2 and radio.stats['delivered'] == 3
+    assert _ring_payloads(ring) == [(hw_sim.NRF24_CHANNEL, _payload(i)) for i in range(3)]
+    assert nrf24_sniffer.drain_fifo(radio, ring, hw_sim.NRF24_CHANNEL, stats) == 0
+
+def test_drain_keeps_up_when_polled_faster_than_fifo_fills(clock):
+    traffic = [(i * 0.001, hw_sim.NRF24_CHANNEL, 1, _payload(i)) for i in range(20)]
+    radio = hw_sim.FakeRF24(schedule=hw_sim.Schedule(traffic))
+    radio.startListening()
+    ring, stats = nrf24_sniffer.PacketRing(32), nrf24_sniffer.RxStats()
+    total = 0
+    while not radio.schedule.done:
+        total += nrf24_sniffer.drain_fifo(radio, ring, hw_sim.NRF24_CHANNEL, stats)
+        clock.sleep(0.002) # Two packets per poll: never three
+    total += nrf24_sniffer.drain_fifo(radio, ring, hw_sim.NRF24_CHANNEL, stats)
+    assert total == 20 and stats.fifo_full == 0
+    assert radio.stats['fifo_overflows'] == 0
+    assert [payload for _, payload in _ring_payloads(ring)] == [_payload(i) for i in range(20)]
+
+# --- nRF24: sweep scheduler ---
+def test_sweeper_dwells_longer_on_busy_channel(clock):
+    busy = 40
+    traffic = [(i * 0.002, busy, 1, _payload(i % 256)) for i in range(2000)]
+    radio = hw_sim.FakeRF24(schedule=hw_sim.Schedule(traffic))
+    radio.startListening()
+    ring, stats = nrf24_sniffer.PacketRing(4096), nrf24_sniffer.RxStats()
+    rates = [hw_sim.rf24_datarate.RF24_1MBPS, hw_sim.rf24_datarate.RF24_2MBPS]
+    sweeper = nrf24_sniffer.ChannelSweeper(radio, ring, stats, channels=[10, busy, 80], data_rates=rates,
+                                           base_dwell=0.005, max_dwell=0.05, clock=clock.monotonic,
+                                           sleep=clock.sleep)
+    received = sum(sweeper.sweep() for _ in range(10))
+
+    assert sweeper.sweeps == 10
+    assert all(entry['visits'] == 10 for entry in sweeper.histogram.values()) # Coverage never stalls
+    for rate in rates:
+        assert sweeper.histogram[(rate, busy)]['packets'] > 0
+        assert sweeper.histogram[(rate, 10)]['packets'] == 0
+        assert sweeper.dwell_for((rate, busy)) > sweeper.dwell_for((rate, 10)) == 0.005
+        assert sweeper.histogram[(rate, busy)]['dwell'] > sweeper.histogram[(rate, 80)]['dwell']
+    # Every packet offered is read, missed while tuned elsewhere, or lost to a full FIFO
+    assert received == radio.stats['delivered'] == stats.packets
+    assert radio.stats['offered'] == received + radio.stats['off_channel'] + radio.stats['fifo_overflows']
+    assert {channel for channel, _ in _ring_payloads(ring)} == {busy}
+    report = sweeper.report()
+    assert {slot['data_rate'] for slot in report['slots']} == {'RF24_1MBPS', 'RF24_2MBPS'}
+
+# --- CC1101: burst reads and overflow recovery ---
+FRAME_LEN = cc.PACKET_LEN + 2
+BYTE_TIME = 8 / cc.data_rate()
+AIR_TIME = FRAME_LEN * BYTE_TIME
+
+def _cc1101(traffic):
+    spi = hw_sim.FakeSpiDev(schedule=hw_sim.Schedule(traffic))
+    radio = cc.CC1101(spi)
+    radio.configure(cc.config_image())
+    receiver = cc.PacketReceiver(radio, cc.RxStats())
+    receiver.start()
+    return spi, receiver
+
+def _service_every(clock, receiver, interval, until):
+    packets = []
+    while clock.now < until:
+        clock.sleep(interval)
+        packets += receiver.service()
+    return packets
+
+def test_receiver_assembles_frames_from_burst_reads(clock):
+    traffic = [(i * AIR_TIME * 1.5, cc.FREQ_MHZ, bytes([i + 1]) * cc.PACKET_LEN, -60.0 + i, 20 + i) for i in range(3)]
+    spi, receiver = _cc1101(traffic)
+    # 40 bytes arrive between services: well inside the 64-byte FIFO, but a frame takes several reads
+    packets = _service_every(clock, receiver, 40 * BYTE_TIME, clock.now + 5 * AIR_TIME)
+
+    assert packets == [(bytes([i + 1]) * cc.PACKET_LEN, -60.0 + i, 20 + i) for i in range(3)]
+    assert receiver.stats.overflows == 0 and spi.stats['fifo_overflows'] == 0
+    assert receiver.stats.reads > 3 * FRAME_LEN // 64
+    assert receiver.stats.bytes == 3 * FRAME_LEN
+    assert spi.stats['delivered'] == 3
+
+def test_receiver_holds_last_byte_mid_packet(clock):
+    spi, receiver = _cc1101([(0.0, cc.FREQ_MHZ, b'\x55' * cc.PACKET_LEN, -70.0, 30)])
+    clock.sleep(10.5 * BYTE_TIME)
+    assert receiver.service() == []
+    assert len(receiver.partial) == 9 and receiver.holding
+    assert len(spi.fifo) == 1
+
+def test_receiver_recovers_from_overflow(clock):
+    traffic = [(0.0, cc.FREQ_MHZ, b'\x11' * cc.PACKET_LEN, -50.0, 10),
+               (AIR_TIME * 2, cc.FREQ_MHZ, b'\x22' * cc.PACKET_LEN, -55.0, 12)]
+    spi, receiver = _cc1101(traffic)
+    clock.sleep(100 * BYTE_TIME) # More than the FIFO holds before the first service
+    assert receiver.service() == []
+    assert receiver.stats.overflows == 1 and spi.stats['fifo_overflows'] == 1
+    assert receiver.stats.dropped_bytes == hw_sim.CC1101_FIFO_SIZE
+    assert not spi.overflow and spi.state == 0x0D # SFRX/SRX put the radio straight back in RX
+    assert not receiver.partial and not receiver.holding
+
+    packets = _service_every(clock, receiver, 40 * BYTE_TIME, clock.now + 3 * AIR_TIME)
+    assert packets == [(b'\x22' * cc.PACKET_LEN, -55.0, 12)]
+    assert receiver.stats.overflows == 1
+
+# --- ESP32: FrameDecoder on the UART link ---
+@pytest.mark.parametrize('wire', ['binary', 'json'])
+def test_frame_decoder_reads_esp32_link(wire):
+    traffic = list(hw_sim.synthetic_esp32(2000, 100, seed=7))
+    link = hw_sim.Esp32Link(hw_sim.Schedule(traffic), wire=wire)
+    decoder = FrameDecoder()
+    out = []
+    try:
+        link.start()
+        deadline = time.monotonic() + 10
+        while len(out) < len(traffic) and time.monotonic() < deadline:
+            if select.select([link.slave], [], [], 0.1)[0]:
+                out += decoder.feed(os.read(link.slave, 4096))
+    finally:
+        link.close()
+
+    if wire == 'json':
+        assert [json.loads(line) for line in out] == [message for _, message in traffic]
+        assert decoder.lines == len(traffic) and decoder.frames == 0
+    else:
+        assert out == [message for _, message in traffic]
+        assert decoder.frames == len(traffic) and decoder.lines == 0
+    assert decoder.mode == wire
+    assert decoder.crc_errors == decoder.discarded == 0
+    assert link.stats['overruns'] == 0
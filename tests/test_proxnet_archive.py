@@ -0,0 +1,59 @@
+import proxnet_archive
+import proxnet_db
+
+DAY_US = 86400 * 1_000_000
+
+def _archived(tmp_path, rows=3000):
+    db_file = tmp_path / "proxnet_log.db"
+    proxnet_db.setup_database(db_file)
+    conn = proxnet_db.connect(db_file)
+    start = proxnet_db.now_us() - 30 * DAY_US
+    step = 10 * DAY_US // rows
+    with conn:
+        conn.executemany(proxnet_db.INSERT_SCAN_SQL, [
+            (ts, proxnet_db.format_ts(ts), ('BLE', 'RFID')[i % 2], None, f"U{i % 7}", 4, None, None, -50 - i % 40,
+             1, ts, None, None, None)
+            for i, ts in enumerate(start + (i // 3) * step for i in range(rows))]) # Three rows per timestamp
+    expected = [dict(row) for row in conn.execute(
+        f"SELECT {', '.join(proxnet_archive.ARCHIVE_TABLES['scans'])} FROM scans ORDER BY ts_us, id")]
+    archiver = proxnet_archive.Archiver(db_file, tmp_path / "archive", csv_file=tmp_path / "proxnet_log.csv")
+    archiver.run_once()
+    # A late row for an archived day lands in a second part file overlapping the first
+    late = expected[len(expected) // 2]['ts_us']
+    with conn:
+        conn.execute(proxnet_db.INSERT_SCAN_SQL, (late, proxnet_db.format_ts(late), 'BLE', None, "LATE", 4, None, None,
+                                                  -40, 1, late, None, None, None))
+    expected.append(dict(conn.execute(f"SELECT {', '.join(proxnet_archive.ARCHIVE_TABLES['scans'])} FROM scans "
+                                      "WHERE uid = 'LATE'").fetchone()))
+    archiver.run_once()
+    archiver.close()
+    assert conn.execute("SELECT COUNT(*) FROM scans").fetchone()[0] == 0
+    conn.close()
+    expected.sort(key=lambda row: (row['ts_us'], row['id']))
+    return tmp_path / "archive", expected
+
+def test_reader_streams_both_orders_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(proxnet_archive, 'SCAN_CHUNK_ROWS', 100)
+    archive_dir, expected = _archived(tmp_path)
+    for newest_first in (False, True):
+        reader = proxnet_archive.ArchiveScanReader({}, archive_dir=archive_dir, newest_first=newest_first)
+        rows = []
+        for row in reader:
+            assert len(reader.buffer) < 100
+            rows.append(row)
+        assert rows == (expected[::-1] if newest_first else expected)
+        assert not reader.archives # Every file is closed once read
+
+def test_reader_filters_and_cursor(tmp_path):
+    archive_dir, expected = _archived(tmp_path)
+    cursor = (expected[1500]['ts_us'], expected[1500]['id'])
+    filters = {'module_type': ['RFID'], 'min_rssi': -70}
+    reader = proxnet_archive.ArchiveScanReader(filters, cursor=cursor, archive_dir=archive_dir)
+    wanted = [row for row in expected[:1500] if row['module_type'] == 'RFID' and row['rssi'] >= -70]
+    assert list(reader) == wanted[::-1]
+
+def test_merge_drops_rows_in_both(tmp_path):
+    archive_dir, expected = _archived(tmp_path, rows=300)
+    hot = iter(expected[-50:]) # Archived but not yet deleted
+    reader = proxnet_archive.ArchiveScanReader({}, archive_dir=archive_dir, newest_first=False)
+    assert list(proxnet_archive.merge_scans(hot, reader)) == expected
@@ -0,0 +1,31 @@
+import threading
+import time
+
+import proxnet_bus
+import proxnet_db
+
+def test_non_object_scan_records_are_counted_not_fatal(tmp_path):
+    db_file = tmp_path / "proxnet_log.db"
+    daemon = proxnet_bus.BusDaemon(tmp_path / "bus.sock", tmp_path / "events.sock", db_file, write_csv=False)
+    stop = threading.Event()
+    thread = threading.Thread(target=daemon.run, args=(stop,))
+    thread.start()
+    try:
+        publisher = proxnet_bus.BusPublisher('esp32', path=tmp_path / "bus.sock")
+        ts_us = proxnet_db.now_us()
+        for payload in (b'[]', b'1', b'"x"'):
+            publisher.publish(proxnet_bus.KIND_SCAN, ts_us, payload)
+        publisher.publish_scan(ts_us, {'type': 'RFID', 'uid': '0A0B0C0D', 'uid_len': 4})
+        publisher.close()
+        deadline = time.monotonic() + 5
+        while daemon.records + daemon.bad_datagrams < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert thread.is_alive()
+    finally:
+        stop.set()
+        thread.join()
+        daemon.close()
+    assert daemon.bad_datagrams == 3 and daemon.records == 1
+    conn = proxnet_db.connect(db_file)
+    assert [tuple(row) for row in conn.execute("SELECT module_type, uid FROM scans")] == [('RFID', '0A0B0C0D')]
+    conn.close()
@@ -0,0 +1,23 @@
+import sys
+import time
+
+import supervisor
+
+def _spec(code, **extra):
+    return {'log': "test.log", 'label': "test", 'command': [sys.executable, '-c', code], 'modes': {'default': []},
+            **extra}
+
+def test_autostart_processes_start_with_the_supervisor(tmp_path):
+    processes = {'housekeeping': _spec("import time; time.sleep(30)", autostart=True),
+                 'scanner': _spec("import time; time.sleep(30)")}
+    sv = supervisor.Supervisor(processes, log_dir=tmp_path)
+    try:
+        deadline = time.monotonic() + 5
+        while not sv.status('housekeeping')['state'] == 'running' and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert sv.is_running('housekeeping') and not sv.is_running('scanner')
+    finally:
+        sv.shutdown()
+    manual = supervisor.Supervisor(processes, log_dir=tmp_path, autostart=False)
+    assert not manual.is_running('housekeeping')
+    manual.shutdown()
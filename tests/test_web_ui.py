@@ -0,0 +1,81 @@
+import pytest
+
+import proxnet_db
+import web_ui
+
+def _scan_db(path, rows=5000):
+    proxnet_db.setup_database(path)
+    conn = proxnet_db.connect(path)
+    with conn:
+        conn.executemany(proxnet_db.INSERT_SCAN_SQL, [
+            (ts, proxnet_db.format_ts(ts), 'BLE', None, None, None, f"AA:BB:CC:00:00:{i % 50:02X}", None, -60,
+             1, ts, -60, -60, -60.0)
+            for i, ts in enumerate(range(1_000_000, 1_000_000 + rows * 1000, 1000))])
+    return conn
+
+class _Recorder:
+    """Connection stand-in that remembers the statements it runs."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = []
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, list(params)))
+        return self.conn.execute(sql, params)
+
+def test_deep_page_uses_index_range(tmp_path):
+    conn = _scan_db(tmp_path / "scans.db")
+    recorder = _Recorder(conn)
+    cursor = (1_000_000 + 100 * 1000, 101)
+    rows = list(web_ui.iter_scan_rows(recorder, "", [], cursor=cursor, limit=10))
+    assert [row['id'] for row in rows] == list(range(100, 90, -1))
+    sql, params = recorder.statements[0]
+    # Bound parameters, as in the app: with literals inlined SQLite plans even the OR form as a range
+    plan = " ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+    assert "SEARCH" in plan and "ts_us<" in plan.replace(" ", ""), plan
+
+def test_cursor_pages_cover_every_row_once(tmp_path):
+    conn = _scan_db(tmp_path / "scans.db", rows=1000)
+    with conn: # Equal timestamps: the id breaks the tie
+        conn.execute("UPDATE scans SET ts_us = 42 WHERE id % 3 = 0")
+    for newest_first in (True, False):
+        seen, cursor = [], None
+        while True:
+            page = list(web_ui.iter_scan_rows(conn, "", [], cursor=cursor, limit=64, newest_first=newest_first))
+            if not page:
+                break
+            seen += [row['id'] for row in page]
+            cursor = (page[-1]['ts_us'], page[-1]['id'])
+        expected = [row[0] for row in conn.execute(
+            "SELECT id FROM scans ORDER BY ts_us {0}, id {0}".format("DESC" if newest_first else "ASC"))]
+        assert seen == expected
+
+@pytest.mark.parametrize('url', [
+    '/api/scans?since=inf', '/api/scans?until=1e400', '/api/scans?since=nan',
+    '/api/scans?cursor=' + web_ui.encode_cursor(10**30, 1),
+    '/api/export?until=-1e300', '/api/rssi/AA:BB:CC:00:00:01?since=inf', '/api/pcap/segments?until=inf',
+])
+def test_out_of_range_query_values_are_bad_requests(url):
+    assert web_ui.app.test_client().get(url).status_code == 400
+
+def test_huge_min_rssi_is_clamped(tmp_path, monkeypatch):
+    _scan_db(tmp_path / "scans.db", rows=10).close()
+    monkeypatch.setattr(web_ui, 'DB_FILE', tmp_path / "scans.db")
+    response = web_ui.app.test_client().get('/api/scans?archive=0&min_rssi=-' + '9' * 30)
+    assert response.status_code == 200 and response.get_json()['count'] == 10
+
+def test_stream_poller_keeps_up_past_one_page_per_tick(tmp_path, monkeypatch):
+    conn = _scan_db(tmp_path / "scans.db", rows=1)
+    monkeypatch.setattr(web_ui, 'DB_FILE', tmp_path / "scans.db")
+    monkeypatch.setattr(web_ui, 'get_process_status', lambda: {})
+    monkeypatch.setattr(web_ui, 'STREAM_POLL_INTERVAL', 1.0)
+    broadcaster = web_ui.ScanBroadcaster()
+    burst = 4 * web_ui.STREAM_BACKLOG + 7 # More than one page arriving within one poll interval
+    with conn:
+        conn.executemany(proxnet_db.INSERT_SCAN_SQL, [
+            (ts, proxnet_db.format_ts(ts), 'RFID', None, f"U{ts}", 4, None, None, None, 1, ts, None, None, None)
+            for ts in range(2_000_000, 2_000_000 + burst)])
+    last_id = conn.execute("SELECT MAX(id) FROM scans").fetchone()[0]
+    rows, _, _ = broadcaster.wait(last_id - 1, 0, timeout=2.5) # One poll, not one per page
+    assert broadcaster.last_id == last_id and [row['id'] for row in rows] == [last_id]